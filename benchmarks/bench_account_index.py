@@ -0,0 +1,72 @@
+# bench_account_index.py - Time a user-list refresh against synthetic passwd files
+#
+# Usage: python3 benchmarks/bench_account_index.py [sizes...]
+#
+# Builds <tmp>/etc/passwd and <tmp>/etc/group with the requested number of
+# accounts, then times AccountIndex.load() + regular_users(). The old
+# refresh_users path forked `id -u` once per passwd line, so its cost is
+# estimated from a sample of forks and scaled to the full size.
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+from account_index import AccountIndex
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+FORK_SAMPLE = 200
+
+
+def build_tree(root, count):
+    etc = os.path.join(root, "etc")
+    os.makedirs(etc, exist_ok=True)
+    with open(os.path.join(etc, "passwd"), "w") as f:
+        f.write("root:x:0:0:root:/root:/bin/bash\n")
+        for i in range(count):
+            uid = 1000 + i
+            f.write(f"user{i:06d}:x:{uid}:{uid}:User {i}:/home/user{i:06d}:/bin/bash\n")
+    with open(os.path.join(etc, "group"), "w") as f:
+        f.write("root:x:0:\n")
+        students = ",".join(f"user{i:06d}" for i in range(0, count, 2))
+        f.write(f"student:x:900:{students}\n")
+        for i in range(count):
+            uid = 1000 + i
+            f.write(f"user{i:06d}:x:{uid}:\n")
+
+
+def time_index(root, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index = AccountIndex.load(root)
+        users = index.regular_users()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(users)
+
+
+def fork_cost():
+    start = time.perf_counter()
+    for _ in range(FORK_SAMPLE):
+        subprocess.run(["id", "-u", "root"], capture_output=True, text=True)
+    return (time.perf_counter() - start) / FORK_SAMPLE
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    per_fork = fork_cost()
+    print(f"{'accounts':>10} {'index (s)':>12} {'id -u est. (s)':>16} {'speedup':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            build_tree(root, size)
+            elapsed, found = time_index(root)
+        legacy = per_fork * (size + 1)
+        print(f"{found:>10} {elapsed:>12.4f} {legacy:>16.2f} {legacy / elapsed:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_audit.py - Wall time of a full audit report: script vs audit_engine
+#
+# Usage: python3 benchmarks/bench_audit.py [runs]
+#
+# Generates the full five-section report `runs` times with
+# generate_audit.sh (what the GUI used to run) and with audit_engine
+# in-process (what userctrld now does). Reports and logs go to a scratch
+# directory.
+
+import atexit
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(PACKAGE, "gui"))
+
+# Journal records and archived reports go to a scratch directory, not the
+# repo's logs/ and archive/
+SCRATCH = tempfile.mkdtemp(prefix="bench_logs_")
+os.environ["USERCTRL_LOG_DIR"] = os.path.join(SCRATCH, "logs")
+os.environ["USERCTRL_ARCHIVE_DIR"] = os.path.join(SCRATCH, "archive")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+
+import audit_engine
+
+SCRIPT = os.path.join(PACKAGE, "scripts", "generate_audit.sh")
+
+
+def time_runs(func, count):
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<24} median {statistics.median(ms):8.1f} ms   max {max(ms):8.1f} ms")
+    return statistics.median(ms)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    workdir = tempfile.mkdtemp(prefix="bench_audit_")
+    rundir = os.path.join(workdir, "run")
+    os.makedirs(rundir)
+    os.chdir(rundir)
+    try:
+        script = report("generate_audit.sh", time_runs(
+            lambda i: subprocess.run(["bash", SCRIPT, "-o", f"script_{i}.txt"], capture_output=True, check=True),
+            count))
+        engine = report("audit_engine", time_runs(
+            lambda i: audit_engine.generate(output=f"engine_{i}.txt"), count))
+        print(f"audit_engine is {script / engine:.1f}x faster")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
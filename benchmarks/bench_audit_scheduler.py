@@ -0,0 +1,106 @@
+# bench_audit_scheduler.py - Cron matching, and overlapping scheduled audits
+#
+# Usage: python3 benchmarks/bench_audit_scheduler.py [triggers...]
+#
+# Times next_time() for a few cron expressions. Then, with a stand-in audit
+# that takes AUDIT_SECONDS, fires the requested number of triggers at one
+# schedule while its first run is in progress and counts the audits: they
+# should all merge into that run, where running each trigger (an overlap
+# from cron firing the script again) would audit once per trigger. Last it
+# checks that two schedulers sharing the database run a due schedule once,
+# and that a week of missed runs collapses into one.
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+# Journal records go to a scratch directory, not the repo's logs/
+LOG_DIR = tempfile.mkdtemp(prefix="bench_logs_")
+os.environ["USERCTRL_LOG_DIR"] = LOG_DIR
+atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+
+import audit_scheduler
+
+DEFAULT_SIZES = [10, 100]
+AUDIT_SECONDS = 0.5
+CRON_ROUNDS = 10000
+EXPRESSIONS = ["*/15 * * * *", "30 2 * * 1-5", "0 0 13 * 5", "@monthly", "30 4 29 2 *"]
+
+
+class StandInAudit:
+    def __init__(self):
+        self.audits = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, sections, diff, archive):
+        with self.lock:
+            self.audits += 1
+        time.sleep(AUDIT_SECONDS)
+        return {"report": "audit_report_20261018_120000.txt.gz",
+                "timings": {"CPU Information": 0.02, "Disk Usage": 0.4, "Open Ports": None}}
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    start_time = datetime(2026, 10, 18, 12, 34, 56)
+    print(f"{'cron':>14} {'next_time (us)':>15}  next")
+    for text in EXPRESSIONS:
+        cron = audit_scheduler.Cron(text)
+        start = time.perf_counter()
+        for _ in range(CRON_ROUNDS):
+            following = cron.next_time(start_time)
+        took = (time.perf_counter() - start) / CRON_ROUNDS * 1e6
+        print(f"{text:>14} {took:>15.1f}  {following:%Y-%m-%d %H:%M}")
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"\n{'triggers':>9} {'audits':>7} {'coalesced':>10} {'took (s)':>9} {'unmerged (s)':>13}")
+        for size in sizes:
+            audit = StandInAudit()
+            scheduler = audit_scheduler.AuditScheduler(os.path.join(root, f"schedule{size}.db"),
+                                                       os.path.join(root, f"locks{size}"), run_audit=audit)
+            scheduler.add("nightly", "0 2 * * *", ["system", "security"])
+            start = time.perf_counter()
+            first = threading.Thread(target=scheduler.trigger, args=("nightly",))
+            first.start()
+            time.sleep(AUDIT_SECONDS / 10)
+            others = [threading.Thread(target=scheduler.trigger, args=("nightly",)) for _ in range(size - 1)]
+            for thread in others:
+                thread.start()
+            for thread in [first] + others:
+                thread.join()
+            took = time.perf_counter() - start
+            run = scheduler.runs(1)[0]
+            assert audit.audits == 1 and run["coalesced"] == size - 1, (audit.audits, run)
+            print(f"{size:>9} {audit.audits:>7} {run['coalesced']:>10} {took:>9.2f} {size * AUDIT_SECONDS:>13.2f}")
+            scheduler.close()
+
+        # A GUI and a headless scheduler on one host, a week behind
+        audit = StandInAudit()
+        path, locks = os.path.join(root, "shared.db"), os.path.join(root, "shared")
+        schedulers = [audit_scheduler.AuditScheduler(path, locks, run_audit=audit) for _ in range(2)]
+        schedulers[0].add("hourly", "@hourly", jitter=60)
+        schedulers[0].db.execute("UPDATE schedules SET next_run = ?", (time.time() - 7 * 86400,))
+        schedulers[0].db.commit()
+        started = [scheduler.dispatch_due() for scheduler in schedulers]
+        for scheduler in schedulers:
+            scheduler.close()
+        shared = audit_scheduler.AuditScheduler(path, locks)
+        row = shared.schedules()[0]
+        assert sum(len(names) for names in started) == 1 and audit.audits == 1
+        assert len(shared.runs()) == 1 and row["next_run"] > time.time()
+        print(f"\nWeek of missed hourly runs, two schedulers: {audit.audits} audit, "
+              f"next {audit_scheduler.when(row['next_run'])}")
+        for collector in shared.slow_collectors():
+            print(f"  {collector['collector']}: average {collector['average']}, {collector['timeouts']} timed out")
+        shared.close()
+
+
+if __name__ == "__main__":
+    main()
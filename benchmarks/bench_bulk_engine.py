@@ -0,0 +1,85 @@
+# bench_bulk_engine.py - Users per second for bulk provisioning
+#
+# Usage: sudo python3 benchmarks/bench_bulk_engine.py [rows] [legacy_sample]
+#
+# Copies this host's account databases into a scratch --root tree, then
+# provisions `rows` synthetic users with bulk_engine. The per-row path that
+# bulk_add.sh takes (useradd, chpasswd, usermod for every row) is timed on
+# `legacy_sample` rows in a second tree for comparison.
+
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+# Journal records go to a scratch directory, not the repo's logs/
+LOG_DIR = tempfile.mkdtemp(prefix="bench_logs_")
+os.environ["USERCTRL_LOG_DIR"] = LOG_DIR
+atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+
+import bulk_engine
+
+ETC_FILES = ("passwd", "group", "shadow", "gshadow", "login.defs")
+
+
+def build_tree(root):
+    os.makedirs(os.path.join(root, "etc", "skel"))
+    os.makedirs(os.path.join(root, "home"))
+    for name in ETC_FILES:
+        shutil.copy(os.path.join("/etc", name), os.path.join(root, "etc", name))
+
+
+def write_csv(path, count, prefix):
+    with open(path, "w") as f:
+        f.write("username,fullname,password,shell,role\n")
+        roles = ("student", "guest", "admin")
+        for i in range(count):
+            f.write(f"{prefix}{i:06d},Bench User {i},Pass{i}word,/bin/bash,{roles[i % 3]}\n")
+
+
+def bench_engine(count):
+    with tempfile.TemporaryDirectory() as root:
+        build_tree(root)
+        csv_path = os.path.join(root, "users.csv")
+        write_csv(csv_path, count, "bu")
+        start = time.perf_counter()
+        success, failed = bulk_engine.run(csv_path, root=root, out=lambda line: None)
+        elapsed = time.perf_counter() - start
+    return success, elapsed
+
+
+def bench_legacy(count):
+    with tempfile.TemporaryDirectory() as root:
+        build_tree(root)
+        start = time.perf_counter()
+        for i in range(count):
+            name = f"lu{i:06d}"
+            subprocess.run(["useradd", "--root", root, "-m", "-s", "/bin/bash", name], capture_output=True)
+            subprocess.run(["chpasswd", "--root", root, "-c", "SHA512"], input=f"{name}:Pass{i}word\n",
+                           capture_output=True, text=True)
+            subprocess.run(["usermod", "--root", root, "-aG", "users", name], capture_output=True)
+        elapsed = time.perf_counter() - start
+    return count, elapsed
+
+
+def main():
+    if os.geteuid() != 0:
+        print("This benchmark needs root to run the shadow-utils tools")
+        return 1
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    created, elapsed = bench_engine(rows)
+    print(f"bulk_engine: {created} users in {elapsed:.2f}s ({created / elapsed:.0f} users/s)")
+    created, elapsed = bench_legacy(sample)
+    print(f"per-row tools: {created} users in {elapsed:.2f}s ({created / elapsed:.1f} users/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
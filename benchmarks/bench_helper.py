@@ -0,0 +1,111 @@
+# bench_helper.py - Latency of userctrld requests vs one script per call
+#
+# Usage: sudo python3 benchmarks/bench_helper.py [ops]
+#
+# Creates a scratch account (ucbench) on this host, then locks and unlocks
+# it `ops` times through lock_user.sh (what the GUI used to run) and through
+# the userctrld helper, one request at a time and as one pipelined batch.
+# The account is deleted afterwards. Logs go to a scratch directory.
+
+import atexit
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(PACKAGE, "gui"))
+
+# Journal records and archived reports go to a scratch directory, not the
+# repo's logs/ and archive/
+SCRATCH = tempfile.mkdtemp(prefix="bench_logs_")
+os.environ["USERCTRL_LOG_DIR"] = os.path.join(SCRATCH, "logs")
+os.environ["USERCTRL_ARCHIVE_DIR"] = os.path.join(SCRATCH, "archive")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+
+from userctrl_client import HelperClient
+
+USER = "ucbench"
+SCRIPT = os.path.join(PACKAGE, "scripts", "lock_user.sh")
+
+
+def script_call(unlock):
+    args = ["bash", SCRIPT] + (["-u"] if unlock else [])
+    result = subprocess.run(args, input=f"{USER}\nbenchmark\n", capture_output=True, text=True)
+    if "successfully" not in result.stdout:
+        raise RuntimeError(result.stdout + result.stderr)
+
+
+def helper_request(i):
+    if i % 2:
+        return "unlock_user", {"username": USER}
+    return "lock_user", {"username": USER, "reason": "benchmark"}
+
+
+def helper_call(client, i):
+    op, args = helper_request(i)
+    client.call(op, **args)
+
+
+def time_each(func, count):
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<28} median {statistics.median(ms):7.2f} ms   "
+          f"p95 {sorted(ms)[int(len(ms) * 0.95) - 1]:7.2f} ms   total {sum(ms) / 1000:6.2f} s")
+
+
+def main():
+    if os.geteuid() != 0:
+        print("This benchmark needs root to run the shadow-utils tools")
+        return 1
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+    workdir = tempfile.mkdtemp(prefix="bench_helper_")
+    rundir = os.path.join(workdir, "run")
+    os.makedirs(rundir)
+    os.chdir(rundir)
+    subprocess.run(["useradd", USER], check=True)
+    client = HelperClient(path=os.path.join(workdir, "userctrld.sock"))
+    daemon_pid = None
+    try:
+        report("script per call", time_each(lambda i: script_call(i % 2), count))
+
+        # Start the daemon outside the timings
+        daemon_pid = client.call("ping")["pid"]
+        report("helper, one request each", time_each(lambda i: helper_call(client, i), count))
+
+        start = time.perf_counter()
+        for i in range(count):
+            script_call(i % 2)
+        scripts = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = client.call_many([helper_request(i) for i in range(count)])
+        pipelined = time.perf_counter() - start
+        if not all(ok for ok, _ in results):
+            raise RuntimeError([r for ok, r in results if not ok][:3])
+        print(f"batch of {count}: scripts {scripts:.2f} s, helper pipelined {pipelined:.2f} s "
+              f"({scripts / pipelined:.1f}x)")
+    finally:
+        client.close()
+        if daemon_pid:
+            os.kill(daemon_pid, signal.SIGTERM)
+        subprocess.run(["userdel", USER])
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# bench_history.py - Time history queries over a synthetic year of journal records
+#
+# Usage: python3 benchmarks/bench_history.py [records...]
+#
+# Writes a year of journal files (mostly bulk_add records from busy import
+# days, plus lock/modify/delete operations on 20000 users), then times the
+# initial index build, an update after 1000 more records, the first and a
+# late page of one user's history and of one operation, and the same user
+# query answered by scanning every file the way grep would.
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+from history_index import HistoryIndex
+
+DEFAULT_SIZES = [100000, 1000000]
+USERS = 20000
+OPS = ["bulk_add"] * 8 + ["lock_user", "modify_user", "unlock_user", "delete_user"]
+
+
+def write_journal(directory, count, start=0, days=365):
+    # One file per day, like the daily rotation
+    begin = datetime(2025, 10, 18)
+    per_day = max(1, count // days)
+    for day in range(0, count, per_day):
+        when = begin + timedelta(days=(start + day) // per_day)
+        name = "journal.jsonl" if day + per_day >= count else f"journal-{when:%Y%m%d}-235959.jsonl"
+        with open(os.path.join(directory, name), "a") as f:
+            for i in range(day, min(count, day + per_day)):
+                op = random.choice(OPS)
+                f.write(json.dumps({"time": (when + timedelta(seconds=i % 86400)).isoformat(timespec="milliseconds"),
+                                    "source": "userctrld", "actor": random.choice(["alice", "bob", "carol"]),
+                                    "pid": 4121, "op": op, "target": f"user{random.randrange(USERS)}",
+                                    "result": "ok", "duration_ms": 12.5, "message": f"{op} done"},
+                                   separators=(",", ":")) + "\n")
+
+
+def grep(directory, user):
+    found = []
+    needle = f'"target":"{user}"'
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(directory, name)) as f:
+                found.extend(json.loads(line) for line in f if needle in line)
+    return found
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    random.seed(1)
+    print(f"{'records':>10} {'build (s)':>10} {'update (ms)':>12} {'user (ms)':>10} {'page 5 (ms)':>12} "
+          f"{'op (ms)':>8} {'grep (ms)':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            logs = os.path.join(root, "logs")
+            os.makedirs(logs)
+            write_journal(logs, size)
+            index = HistoryIndex(os.path.join(root, "history.db"), logs)
+            build, _ = timed(index.update)
+            with open(os.path.join(logs, "journal.jsonl"), "a") as f:
+                for i in range(1000):
+                    f.write(json.dumps({"time": "2026-10-18T12:00:00.000", "op": "lock_user",
+                                        "target": f"user{i}", "result": "ok", "message": ""},
+                                       separators=(",", ":")) + "\n")
+            update, added = timed(index.update)
+            assert added == 1000
+
+            user, rows = timed(lambda: index.page(target="user42", limit=50))
+
+            def late_page():
+                after = None
+                for _ in range(5):
+                    page = index.page(op="lock_user", after=after, limit=50)
+                    after = page[-1]
+                return page
+            page5, _ = timed(late_page)
+            op, _ = timed(lambda: index.page(op="delete_user", date_from="2026-03-01", date_to="2026-03-31",
+                                             limit=50))
+            scan, expected = timed(lambda: grep(logs, "user42"))
+            assert [r["time"] for r in rows] == sorted((r["time"] for r in expected), reverse=True)[:50]
+            index.close()
+        print(f"{size:>10} {build:>10.2f} {update * 1000:>12.1f} {user * 1000:>10.2f} {page5 * 1000 / 5:>12.2f} "
+              f"{op * 1000:>8.2f} {scan * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench_journal.py - Time journal writes against the old open-append-close log_message
+#
+# Usage: python3 benchmarks/bench_journal.py [records...]
+#
+# Times queued records (what bulk imports and log() write), durable
+# records from 8 threads at once (what the helper writes, one per
+# operation; concurrent ones share an fdatasync), and the old log_message,
+# which opened, appended to and closed a dated log file per line. Durable
+# records from a single thread are timed on a tenth of the records and
+# scaled up.
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+from journal import Journal
+
+DEFAULT_SIZES = [10000, 100000]
+THREADS = 8
+
+
+def old_log_message(directory, message):
+    with open(os.path.join(directory, f"user_management_{datetime.now():%Y%m%d}.log"), "a") as f:
+        f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S} - {message}\n")
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'records':>10} {'queued (s)':>11} {'durable x1 (s)':>15} {f'durable x{THREADS} (s)':>15} "
+          f"{'old (s)':>9}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            journal = Journal(os.path.join(root, "queued"))
+
+            def queued():
+                for i in range(size):
+                    journal.record("bulk_add", f"user{i}", message="SUCCESS: User created", line=i)
+                journal.flush()
+            queued_time = timed(queued)
+            journal.close()
+
+            journal = Journal(os.path.join(root, "single"))
+            single = size // 10
+            single_time = timed(lambda: [journal.record("lock_user", f"user{i}", sync=True) for i in range(single)])
+            journal.close()
+
+            journal = Journal(os.path.join(root, "threads"))
+
+            def worker(n):
+                for i in range(n, size, THREADS):
+                    journal.record("lock_user", f"user{i}", sync=True)
+
+            def durable():
+                threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            durable_time = timed(durable)
+            journal.close()
+
+            os.makedirs(os.path.join(root, "old"))
+            old_time = timed(lambda: [old_log_message(os.path.join(root, "old"), f"SUCCESS: User user{i} created")
+                                      for i in range(size)])
+        print(f"{size:>10} {queued_time:>11.3f} {single_time * 10:>15.3f} {durable_time:>15.3f} {old_time:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
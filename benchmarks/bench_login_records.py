@@ -0,0 +1,71 @@
+# bench_login_records.py - Time the per-user last-login index on synthetic wtmp files
+#
+# Usage: python3 benchmarks/bench_login_records.py [records...]
+#
+# Writes a wtmp with the requested number of records (half of them logins
+# by 5000 users), then times a full LoginIndex scan, a refresh after 1000
+# more records are appended, and the same answer built by unpacking every
+# record into a Login the way read_records() does.
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+from login_records import DEAD_PROCESS, USER_PROCESS, UTMP_RECORD, LoginIndex, read_records
+
+DEFAULT_SIZES = [100000, 1000000]
+USERS = 5000
+
+
+def write_records(path, count, start):
+    now = int(time.time())
+    with open(path, "ab") as f:
+        batch = []
+        for i in range(start, start + count):
+            kind = USER_PROCESS if i % 2 == 0 else DEAD_PROCESS
+            user = f"user{random.randrange(USERS)}".encode() if kind == USER_PROCESS else b""
+            batch.append(UTMP_RECORD.pack(kind, 1000 + i % 30000, b"pts/1", b"ts/1", user, b"10.0.0.1",
+                                          0, 0, 0, now - 400 * 86400 + i, 0, b"\0" * 16, b"\0" * 20))
+            if len(batch) == 100000:
+                f.write(b"".join(batch))
+                batch = []
+        f.write(b"".join(batch))
+
+
+def naive(path):
+    last = {}
+    for record in read_records(path):
+        if record.type == USER_PROCESS and record.user:
+            last[record.user] = record.time
+    return last
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    random.seed(1)
+    print(f"{'records':>10} {'scan (s)':>10} {'refresh (s)':>12} {'per-record (s)':>15} {'speedup':>8}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            wtmp = os.path.join(root, "wtmp")
+            write_records(wtmp, size, 0)
+            index = LoginIndex(wtmp, os.path.join(root, "btmp"), os.path.join(root, "lastlog"))
+            start = time.perf_counter()
+            index.refresh()
+            scan = time.perf_counter() - start
+            write_records(wtmp, 1000, size)
+            start = time.perf_counter()
+            index.refresh()
+            refresh = time.perf_counter() - start
+            start = time.perf_counter()
+            expected = naive(wtmp)
+            legacy = time.perf_counter() - start
+            assert expected == {name: seconds for name, (seconds, _) in index.last.items()}
+        print(f"{size:>10} {scan:>10.3f} {refresh:>12.4f} {legacy:>15.3f} {legacy / scan:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# bench_mail_queue.py - Send queued reports to a local SMTP stand-in
+#
+# Usage: python3 benchmarks/bench_mail_queue.py [messages...]
+#
+# Starts a minimal SMTP server on localhost that answers like a real one,
+# with GREETING_DELAY before its greeting to stand in for the TCP/TLS
+# setup of a remote server. Then it queues the requested number of
+# messages, each sending the same report to RECIPIENTS people, and drains
+# the queue over one session. It compares that with one session per
+# recipient and message, which is what forking mutt per recipient cost.
+# Finally it checks that a server refusing with 421 leaves the message
+# queued for a retry, without using up one of its attempts.
+
+import atexit
+import os
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "gui"))
+
+# Journal records go to a scratch directory, not the repo's logs/
+LOG_DIR = tempfile.mkdtemp(prefix="bench_logs_")
+os.environ["USERCTRL_LOG_DIR"] = LOG_DIR
+atexit.register(shutil.rmtree, LOG_DIR, ignore_errors=True)
+
+import mail_queue
+
+DEFAULT_SIZES = [10, 30]
+RECIPIENTS = 10
+GREETING_DELAY = 0.02
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.refuse = False
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        time.sleep(GREETING_DELAY)
+        if server.refuse:
+            self.reply("421 Service not available, try again later")
+            return
+        self.reply("220 localhost ESMTP stand-in")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                    size += len(data)
+                server.messages.append((recipients, size))
+                self.reply("250 OK queued")
+            elif verb == "RSET" or verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or DEFAULT_SIZES
+    server = SMTPStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as root:
+        config = os.path.join(root, "mail.conf")
+        with open(config, "w") as f:
+            f.write(f"[smtp]\nhost = 127.0.0.1\nport = {server.server_address[1]}\nsender = audit@localhost\n")
+        report = os.path.join(root, "audit_report_20261018_120000.txt")
+        with open(report, "w") as f:
+            f.write("SYSTEM AUDIT REPORT\n" + "x" * 79 + "\n" * 2000)
+        recipients = ",".join(f"admin{i}@example.com" for i in range(RECIPIENTS))
+
+        print(f"{'messages':>9} {'queued (s)':>11} {'connections':>12} {'per-recipient (s)':>18} {'connections':>12}")
+        for size in sizes:
+            queue = mail_queue.MailQueue(os.path.join(root, f"spool{size}"), config)
+            server.connections = 0
+            server.messages = []
+            start = time.perf_counter()
+            for _ in range(size):
+                queue.enqueue(recipients, "System Audit Report", [report])
+            sent, failed = queue.drain()
+            queued = time.perf_counter() - start
+            assert (sent, failed) == (size, 0) and len(server.messages) == size
+            assert len(os.listdir(queue.blob_dir)) == 1
+            connections = server.connections
+            queue.close()
+
+            # One session per recipient per message
+            server.connections = 0
+            smtp_config = mail_queue.load_config(config)
+            legacy = mail_queue.MailQueue(os.path.join(root, f"legacy{size}"), config)
+            message_id = legacy.enqueue(recipients, "System Audit Report", [report])
+            row = legacy.db.execute("SELECT * FROM messages WHERE id = ?", (message_id,)).fetchone()
+            start = time.perf_counter()
+            for _ in range(size):
+                for recipient in recipients.split(","):
+                    message = legacy.compose(legacy.db, row, smtp_config["sender"], {})
+                    smtp = legacy.open_connection(smtp_config)
+                    smtp.send_message(message, to_addrs=[recipient])
+                    smtp.quit()
+            per_recipient = time.perf_counter() - start
+            legacy.close()
+            print(f"{size:>9} {queued:>11.3f} {connections:>12} {per_recipient:>18.3f} {server.connections:>12}")
+
+        # A server that is down: the message stays queued with a backoff
+        queue = mail_queue.MailQueue(os.path.join(root, "retry"), config)
+        server.refuse = True
+        message_id = queue.enqueue("admin@example.com", "Retry", [report])
+        assert queue.drain() == (0, 0)
+        row = queue.db.execute("SELECT state, attempts, next_attempt FROM messages WHERE id = ?",
+                               (message_id,)).fetchone()
+        assert row["state"] == "queued" and row["attempts"] == 0 and row["next_attempt"] > time.time()
+        server.refuse = False
+        queue.db.execute("UPDATE messages SET next_attempt = 0")
+        queue.db.commit()
+        assert queue.drain() == (1, 0)
+        print(mail_queue.describe(queue.status()))
+        queue.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
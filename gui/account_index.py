@@ -0,0 +1,181 @@
+# account_index.py - In-process index of the passwd and group databases
+# Built from a single enumeration of each database so the GUI never has to
+# start one `id` process per account just to learn what passwd already says.
+
+import grp
+import os
+import pwd
+from collections import namedtuple
+
+# One passwd entry plus the names of every group the account belongs to
+# (primary group first, then supplementary groups in /etc/group order)
+Account = namedtuple("Account", ["name", "uid", "gid", "gecos", "home", "shell", "groups"])
+
+# Accounts at or above this UID are shown as regular users, the same rule
+# refresh_users has always applied
+MIN_REGULAR_UID = 1000
+
+# Groups that make up each role, as assigned by add_user.sh and modify_user.sh
+ROLE_GROUPS = {
+    "admin": ("sudo", "admin"),
+    "student": ("student",),
+    "guest": ("guest",),
+}
+
+# Every group that belongs to some role
+ALL_ROLE_GROUPS = sorted({group for groups in ROLE_GROUPS.values() for group in groups})
+
+SORT_KEYS = {
+    "name": lambda a: a.name,
+    "uid": lambda a: a.uid,
+    "gid": lambda a: a.gid,
+    "home": lambda a: a.home,
+    "shell": lambda a: a.shell,
+}
+
+
+def parse_passwd(path):
+    # Yield (name, uid, gid, gecos, home, shell) tuples from a passwd file,
+    # skipping comments, NIS compat lines and malformed entries
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line or line[0] in "#+-\n":
+                continue
+            fields = line.rstrip("\n").split(":")
+            if len(fields) < 7:
+                continue
+            try:
+                uid = int(fields[2])
+                gid = int(fields[3])
+            except ValueError:
+                continue
+            yield fields[0], uid, gid, fields[4], fields[5], fields[6]
+
+
+def parse_group(path):
+    # Yield (name, gid, members) tuples from a group file
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line or line[0] in "#+-\n":
+                continue
+            fields = line.rstrip("\n").split(":")
+            if len(fields) < 4:
+                continue
+            try:
+                gid = int(fields[2])
+            except ValueError:
+                continue
+            members = [m for m in fields[3].split(",") if m]
+            yield fields[0], gid, members
+
+
+def is_regular(account):
+    return account.uid >= MIN_REGULAR_UID and not account.name.startswith("_")
+
+
+def has_role(account, role):
+    return any(group in account.groups for group in ROLE_GROUPS.get(role, ()))
+
+
+class AccountIndex:
+    def __init__(self, passwd_entries, group_entries):
+        self.groups = {}
+        self.group_names = {}
+        member_of = {}
+        for name, gid, members in group_entries:
+            self.groups[name] = (gid, members)
+            self.group_names.setdefault(gid, name)
+            for member in members:
+                member_of.setdefault(member, []).append(name)
+
+        self.accounts = {}
+        self.uids = {}
+        for name, uid, gid, gecos, home, shell in passwd_entries:
+            if name in self.accounts:
+                # First entry wins, like getpwnam()
+                continue
+            primary = self.group_names.get(gid, str(gid))
+            groups = [primary] + [g for g in member_of.get(name, ()) if g != primary]
+            account = Account(name, uid, gid, gecos, home, shell, tuple(groups))
+            self.accounts[name] = account
+            self.uids.setdefault(uid, account)
+
+    @classmethod
+    def load(cls, root=None):
+        # Without a root, enumerate through NSS (files, sssd, ldap...) exactly
+        # once per database. With a root, read <root>/etc/passwd and group.
+        if root is None:
+            passwd_entries = [
+                (p.pw_name, p.pw_uid, p.pw_gid, p.pw_gecos, p.pw_dir, p.pw_shell)
+                for p in pwd.getpwall()
+            ]
+            group_entries = [(g.gr_name, g.gr_gid, g.gr_mem) for g in grp.getgrall()]
+            return cls(passwd_entries, group_entries)
+
+        group_path = os.path.join(root, "etc", "group")
+        group_entries = list(parse_group(group_path)) if os.path.exists(group_path) else []
+        return cls(parse_passwd(os.path.join(root, "etc", "passwd")), group_entries)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def __contains__(self, name):
+        return name in self.accounts
+
+    def __iter__(self):
+        return iter(self.accounts.values())
+
+    # Lookups
+    def get(self, name):
+        return self.accounts.get(name)
+
+    def by_uid(self, uid):
+        return self.uids.get(uid)
+
+    def has_group(self, name):
+        return name in self.groups
+
+    def group_members(self, name):
+        entry = self.groups.get(name)
+        return list(entry[1]) if entry else []
+
+    def id_string(self, name):
+        # Same layout as `id <user>`
+        account = self.accounts.get(name)
+        if account is None:
+            return None
+        parts = []
+        for group in account.groups:
+            entry = self.groups.get(group)
+            parts.append(f"{entry[0]}({group})" if entry else group)
+        primary = self.group_names.get(account.gid, str(account.gid))
+        return (f"uid={account.uid}({account.name}) gid={account.gid}({primary}) "
+                f"groups={','.join(parts)}")
+
+    # Filtering and sorting
+    def filter(self, min_uid=None, max_uid=None, shell=None, group=None, regular=None, predicate=None):
+        result = []
+        for account in self.accounts.values():
+            if min_uid is not None and account.uid < min_uid:
+                continue
+            if max_uid is not None and account.uid > max_uid:
+                continue
+            if shell is not None and account.shell != shell:
+                continue
+            if group is not None and group not in account.groups:
+                continue
+            if regular is not None and is_regular(account) != regular:
+                continue
+            if predicate is not None and not predicate(account):
+                continue
+            result.append(account)
+        return result
+
+    def sort(self, accounts=None, key="name", reverse=False):
+        if accounts is None:
+            accounts = self.accounts.values()
+        return sorted(accounts, key=SORT_KEYS[key], reverse=reverse)
+
+    def regular_users(self):
+        # Sorted usernames for the "Current Users" list
+        return sorted(a.name for a in self.accounts.values() if is_regular(a))
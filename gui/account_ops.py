@@ -0,0 +1,126 @@
+# account_ops.py - Single-account operations in Python
+# The same steps as add_user.sh, delete_user.sh, lock_user.sh and
+# modify_user.sh, but with existence checks against an AccountIndex the
+# caller keeps warm instead of an `id` process, and with failures raised
+# as ToolError. Each function returns the message the script would print;
+# the caller (userctrld's Helper.handle) journals it.
+
+import os
+from datetime import date, timedelta
+
+from account_index import ALL_ROLE_GROUPS, ROLE_GROUPS
+from roster_validator import MAX_USERNAME, USERNAME_RE
+from shadow_tools import (ROLE_GROUP, ToolError, add_group_member, add_groups, change_passwords,
+                          delete_user as userdel, login_defs, modify_user as usermod,
+                          remove_group_member, run_tool)
+
+
+def fail(message):
+    raise ToolError(message)
+
+
+def require_user(accounts, username):
+    if not username:
+        fail("Username is required")
+    if username not in accounts:
+        fail(f"User {username} does not exist")
+
+
+def add_user(accounts, username, password, role="", shell="/bin/bash", fullname="", root=None):
+    if not username:
+        fail("Username is required")
+    if len(username) > MAX_USERNAME or not USERNAME_RE.match(username):
+        fail(f"Invalid username {username}")
+    if not password:
+        fail("Password is required")
+    if username in accounts:
+        fail(f"User {username} already exists")
+    if role and role not in ROLE_GROUP:
+        fail(f"Invalid role {role}")
+
+    args = ["useradd", "-m", "-s", shell or "/bin/bash"]
+    if fullname:
+        args.extend(["-c", fullname])
+    run_tool(args + [username], root=root)
+    # PAM can't run inside a --root tree, so hash there like bulk_engine does
+    method = login_defs("ENCRYPT_METHOD", "SHA512", root=root) if root else None
+    change_passwords([(username, password)], root=root, crypt_method=method)
+
+    group = ROLE_GROUP.get(role)
+    if group:
+        if not accounts.has_group(group):
+            add_groups([group], root=root)
+        add_group_member(username, group, root=root)
+
+    home = os.path.join(root or "/", "home", username)
+    if os.path.isdir(home):
+        os.chmod(home, 0o750)
+    return f"User {username} successfully created with role {role}"
+
+
+def delete_user(accounts, username, remove_home=True, root=None):
+    require_user(accounts, username)
+    userdel(username, remove_home=remove_home, root=root)
+    if remove_home:
+        return f"User {username} successfully deleted (including home directory)"
+    return f"User {username} successfully deleted (home directory preserved)"
+
+
+def lock_user(accounts, username, reason="", expire_days=0, root=None):
+    require_user(accounts, username)
+    expire_days = int(expire_days or 0)
+    options = ["-L"]
+    expire_date = None
+    if expire_days > 0:
+        expire_date = f"{date.today() + timedelta(days=expire_days):%Y-%m-%d}"
+        options.extend(["-e", expire_date])
+    usermod(username, options, root=root)
+    if expire_date:
+        return f"User {username} locked successfully until {expire_date}"
+    return f"User {username} locked successfully"
+
+
+def unlock_user(accounts, username, root=None):
+    require_user(accounts, username)
+    usermod(username, ["-U", "-e", ""], root=root)
+    return f"User {username} unlocked successfully"
+
+
+def modify_user(accounts, username, new_username="", shell="", home="", move_home=False,
+                groups="", append_groups=True, role="", root=None):
+    require_user(accounts, username)
+    if not any([new_username, shell, home, groups, role]):
+        fail(f"No modifications specified for user {username}")
+    if role and role not in ROLE_GROUPS:
+        fail(f"Invalid role {role}")
+
+    options = []
+    if new_username:
+        options.extend(["-l", new_username])
+    if shell:
+        options.extend(["-s", shell])
+    if home:
+        options.extend(["-d", home])
+        if move_home:
+            options.append("-m")
+    if groups:
+        options.extend(["-a", "-G", groups] if append_groups else ["-G", groups])
+    if options:
+        usermod(username, options, root=root)
+
+    if role:
+        # Drop the old role groups, then join the new role's groups
+        name = new_username or username
+        member_of = accounts.get(username).groups
+        for group in ALL_ROLE_GROUPS:
+            if group in member_of and group not in ROLE_GROUPS[role]:
+                remove_group_member(name, group, root=root)
+        for group in ROLE_GROUPS[role]:
+            if not accounts.has_group(group):
+                add_groups([group], root=root)
+            if group not in member_of:
+                add_group_member(name, group, root=root)
+
+    if new_username:
+        return f"User {username} successfully modified (now {new_username})"
+    return f"User {username} successfully modified"
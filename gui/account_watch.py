@@ -0,0 +1,130 @@
+# account_watch.py - Change detection for the account databases
+# Tells the GUI when /etc/passwd or /etc/group changed (inotify where the
+# kernel offers it, stat polling otherwise) and computes what changed
+# between two AccountIndex snapshots so only those rows are touched.
+
+import ctypes
+import ctypes.util
+import os
+import struct
+
+from account_index import is_regular
+
+WATCHED_FILES = ("passwd", "group", "shadow", "gshadow")
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class AccountWatcher:
+    def __init__(self, root=None, use_inotify=True):
+        self.etc_dir = os.path.join(root or "/", "etc")
+        self.paths = [os.path.join(self.etc_dir, name) for name in WATCHED_FILES]
+        self.signatures = self.snapshot()
+        self.fd = None
+        if use_inotify:
+            self.fd = self._open_inotify()
+
+    def _open_inotify(self):
+        libc = _load_inotify()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        # shadow-utils replaces the files by rename, so watch the directory
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(self.etc_dir), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def snapshot(self):
+        return [file_signature(path) for path in self.paths]
+
+    def _drain_events(self):
+        # True if any queued inotify event names one of the watched files
+        hit = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return hit
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                if name in WATCHED_FILES:
+                    hit = True
+
+    def changed(self):
+        # Cheap enough to call from an after() loop every second
+        if self.fd is not None and not self._drain_events():
+            return False
+        signatures = self.snapshot()
+        if signatures == self.signatures:
+            return False
+        self.signatures = signatures
+        return True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def diff_users(old_index, new_index):
+    # Compare the regular users of two snapshots. A removed and an added
+    # name that share a UID are reported as a rename (usermod -l); a name
+    # in both whose account differs (usermod -s, -u, -G) as changed.
+    old = {a.name: a for a in old_index if is_regular(a)} if old_index else {}
+    new = {a.name: a for a in new_index if is_regular(a)}
+
+    removed = [name for name in old if name not in new]
+    added = [name for name in new if name not in old]
+    changed = [name for name, account in new.items() if name in old and old[name] != account]
+
+    added_by_uid = {}
+    for name in added:
+        added_by_uid.setdefault(new[name].uid, []).append(name)
+
+    renamed = []
+    for name in removed:
+        candidates = added_by_uid.get(old[name].uid)
+        if candidates:
+            renamed.append((name, candidates.pop(0)))
+
+    if renamed:
+        old_names = {old_name for old_name, _ in renamed}
+        new_names = {new_name for _, new_name in renamed}
+        removed = [name for name in removed if name not in old_names]
+        added = [name for name in added if name not in new_names]
+
+    return added, removed, renamed, changed
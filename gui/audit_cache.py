@@ -0,0 +1,105 @@
+# audit_cache.py - On-disk cache for audit collector output
+# A collector declares the inputs its output depends on: files (fingerprinted
+# by inode, size, mtime and ctime, never read) and cheap probes such as the
+# boot ID. Output is stored under a hash of those fingerprints, so a block is
+# reused until one of its inputs changes. The least recently used entries
+# are removed once the cache grows past MAX_CACHE_BYTES.
+
+import hashlib
+import os
+import tempfile
+
+from report_archive import ARCHIVE_ROOT
+
+CACHE_DIR = os.path.join(ARCHIVE_ROOT, "cache", "audit")
+MAX_CACHE_BYTES = 8 * 1024 * 1024
+
+# Bump when the report format changes, so old entries stop matching
+CACHE_VERSION = "1"
+
+
+def boot_id():
+    with open("/proc/sys/kernel/random/boot_id", "r") as f:
+        return f.read().strip()
+
+
+def file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{st.st_ctime_ns}"
+
+
+def fingerprint(name, inputs):
+    # inputs: file paths and/or zero-argument callables returning a string
+    digest = hashlib.sha256(f"{CACHE_VERSION}\0{name}".encode())
+    for source in inputs:
+        state = source() if callable(source) else file_state(source)
+        digest.update(b"\0" + state.encode(errors="replace"))
+    return f"{name}-{digest.hexdigest()[:32]}"
+
+
+class AuditCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".txt")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "r") as f:
+                text = f.read()
+        except OSError:
+            return None
+        # The mtime doubles as the last-used time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key, text):
+        # Reports include sudoers and sshd_config, so keep the cache private
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def evict(self):
+        # Drop the least recently used entries until the cache fits
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        entries = []
+        total = 0
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,749 @@
+# audit_engine.py - Audit report generation without a process per line
+# Produces the same report as generate_audit.sh, but the collectors run at
+# once on a shared pool of threads with a timeout, most of them read /proc,
+# /sys and /etc directly instead of forking lscpu/free/df/ss/who/last, and
+# the report is written in one pass at the end. A collector that hangs (df
+# on a dead NFS mount, a wedged firewall tool) only costs its own block of
+# the report, and is not started again while it is still stuck.
+#
+# Blocks whose inputs rarely change (os-release, sshd_config, /etc/group)
+# are served from audit_cache until one of those inputs does.
+#
+# Each run also saves a structured snapshot (audit_snapshot); --diff writes
+# only what changed since the previous one. Reports are stored compressed in
+# the archive (report_archive); -o also writes a plain copy.
+#
+# Usage: python3 gui/audit_engine.py [-i system,memory,...] [-o FILE] [--refresh] [--diff]
+
+import argparse
+import fcntl
+import ipaddress
+import os
+import queue
+import socket
+import sqlite3
+import struct
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import audit_snapshot
+import authlog
+import report_archive
+import report_catalog
+from account_index import AccountIndex, parse_passwd
+from audit_cache import AuditCache, boot_id, fingerprint
+from journal import log_message
+from login_records import (LASTLOG_PATH, UTMP_PATH, USER_PROCESS, WTMP_PATH, LoginIndex, current_logins,
+                           format_time, read_records_reversed)
+
+SECTION_NAMES = ("system", "memory", "network", "users", "security")
+ARCHIVE_DIR = report_archive.ARCHIVE_DIR
+AUTH_LOG = authlog.AUTH_LOG
+
+# Seconds each collector may take before its block reads "timed out"
+COLLECTOR_TIMEOUT = 5.0
+
+# Held for the whole of an audit
+AUDIT_LOCK = os.path.join(report_archive.ARCHIVE_ROOT, "audit.lock")
+
+# Regular accounts without a login for this many days are reported
+INACTIVE_DAYS = 90
+
+RULE = "=" * 55
+SECTION_RULE = "-" * 55
+
+
+class CollectorTimeout(Exception):
+    pass
+
+
+def run_command(args, timeout=COLLECTOR_TIMEOUT):
+    # For the few things with no /proc equivalent. A child that won't die
+    # (uninterruptible I/O) is abandoned rather than waited for.
+    try:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return None
+    try:
+        stdout, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        raise CollectorTimeout(f"{args[0]} did not finish within {timeout:.0f}s")
+    return stdout if process.returncode == 0 else None
+
+
+def read_text(path):
+    try:
+        with open(path, "r", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def config_lines(path):
+    # Non-comment, non-blank lines, like `grep -v "^#" | grep -v "^$"`
+    content = read_text(path)
+    if content is None:
+        return None
+    return "".join(line + "\n" for line in content.splitlines() if line and not line.startswith("#"))
+
+
+def human(size):
+    # Sizes in the style of `free -h` / `df -h`
+    for unit in ("B", "K", "M", "G", "T"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}P"
+
+
+def table(rows):
+    widths = [max(len(str(row[i])) for row in rows if i < len(row)) for i in range(len(rows[0]))]
+    return "".join("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)).rstrip() + "\n"
+                   for row in rows)
+
+
+# System
+def os_release():
+    return read_text("/etc/os-release") or read_text("/usr/lib/os-release")
+
+
+def kernel_info():
+    u = os.uname()
+    return f"{u.sysname} {u.nodename} {u.release} {u.version} {u.machine}\n"
+
+
+def uptime():
+    seconds = float(read_text("/proc/uptime").split()[0])
+    days, rest = divmod(int(seconds), 86400)
+    hours, minutes = rest // 3600, rest % 3600 // 60
+    up = f"{days} day{'s' if days != 1 else ''}, " if days else ""
+    up += f"{hours}:{minutes:02d}" if hours else f"{minutes} min"
+    users = len(current_logins())
+    load = ", ".join(read_text("/proc/loadavg").split()[:3])
+    return (f" {datetime.now():%H:%M:%S} up {up},  {users} user{'s' if users != 1 else ''},  "
+            f"load average: {load}\n")
+
+
+def last_boot():
+    for line in read_text("/proc/stat").splitlines():
+        if line.startswith("btime "):
+            return f"         system boot  {format_time(int(line.split()[1]))}\n"
+    return None
+
+
+def cpu_info():
+    model = None
+    sockets = set()
+    cores = siblings = 1
+    for line in read_text("/proc/cpuinfo").splitlines():
+        key, _, value = line.partition(":")
+        key, value = key.strip(), value.strip()
+        if key == "model name" and model is None:
+            model = value
+        elif key == "physical id":
+            sockets.add(value)
+        elif key == "cpu cores":
+            cores = int(value)
+        elif key == "siblings":
+            siblings = int(value)
+    return (f"Model name:            {model or 'unknown'}\n"
+            f"Thread(s) per core:    {max(1, siblings // max(cores, 1))}\n"
+            f"Core(s) per socket:    {cores}\n"
+            f"Socket(s):             {max(1, len(sockets))}\n")
+
+
+# Memory
+def meminfo():
+    values = {}
+    for line in read_text("/proc/meminfo").splitlines():
+        key, _, rest = line.partition(":")
+        fields = rest.split()
+        if len(fields) == 2 and fields[1] == "kB":
+            values[key] = int(fields[0]) * 1024
+    return values
+
+
+def memory_usage():
+    m = meminfo()
+    cache = m.get("Buffers", 0) + m.get("Cached", 0) + m.get("SReclaimable", 0)
+    used = m["MemTotal"] - m["MemFree"] - cache
+    swap_used = m.get("SwapTotal", 0) - m.get("SwapFree", 0)
+    return table([
+        ["", "total", "used", "free", "shared", "buff/cache", "available"],
+        ["Mem:", human(m["MemTotal"]), human(used), human(m["MemFree"]), human(m.get("Shmem", 0)),
+         human(cache), human(m.get("MemAvailable", m["MemFree"]))],
+        ["Swap:", human(m.get("SwapTotal", 0)), human(swap_used), human(m.get("SwapFree", 0))],
+    ])
+
+
+def swap_usage():
+    lines = read_text("/proc/swaps").splitlines()[1:]
+    if not lines:
+        return "No swap information available\n"
+    rows = [["NAME", "TYPE", "SIZE", "USED", "PRIO"]]
+    for line in lines:
+        name, kind, size, used, prio = line.split()[:5]
+        rows.append([name, kind, human(int(size) * 1024), human(int(used) * 1024), prio])
+    return table(rows)
+
+
+# Pseudo filesystems df leaves out by default
+PSEUDO_FS = {"proc", "sysfs", "devpts", "cgroup", "cgroup2", "securityfs", "pstore", "debugfs", "tracefs",
+             "mqueue", "hugetlbfs", "configfs", "fusectl", "bpf", "autofs", "binfmt_misc", "rpc_pipefs",
+             "nsfs", "efivarfs", "selinuxfs"}
+
+
+def disk_usage():
+    rows = [["Filesystem", "Size", "Used", "Avail", "Use%", "Mounted on"]]
+    seen = set()
+    for line in read_text("/proc/self/mounts").splitlines():
+        device, mount, fstype = line.split()[:3]
+        mount = mount.replace("\\040", " ")
+        if fstype in PSEUDO_FS or mount in seen:
+            continue
+        seen.add(mount)
+        try:
+            st = os.statvfs(mount)
+        except OSError:
+            continue
+        if not st.f_blocks:
+            continue
+        size = st.f_blocks * st.f_frsize
+        avail = st.f_bavail * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        percent = -(-used * 100 // (used + avail)) if used + avail else 0
+        rows.append([device, human(size), human(used), human(avail), f"{percent}%", mount])
+    return table(rows)
+
+
+# Network
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891B
+
+
+def ipv4_address(sock, name):
+    request = struct.pack("256s", name.encode()[:15])
+    try:
+        address = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)[20:24]
+        netmask = fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, request)[20:24]
+    except OSError:
+        return None
+    prefix = bin(int.from_bytes(netmask, "big")).count("1")
+    return f"{socket.inet_ntoa(address)}/{prefix}"
+
+
+def network_interfaces():
+    ipv6 = {}
+    for line in (read_text("/proc/net/if_inet6") or "").splitlines():
+        address, _, prefix, _, _, name = line.split()
+        ipv6.setdefault(name, []).append(f"{ipaddress.IPv6Address(bytes.fromhex(address))}/{int(prefix, 16)}")
+
+    out = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for index, name in sorted((int(read_text(f"/sys/class/net/{n}/ifindex") or 0), n)
+                                  for n in os.listdir("/sys/class/net")):
+            base = f"/sys/class/net/{name}"
+            state = (read_text(f"{base}/operstate") or "unknown").strip().upper()
+            mtu = (read_text(f"{base}/mtu") or "").strip()
+            mac = (read_text(f"{base}/address") or "").strip()
+            out.append(f"{index}: {name}: mtu {mtu} state {state}\n")
+            if mac:
+                out.append(f"    link {mac}\n")
+            address = ipv4_address(sock, name)
+            if address:
+                out.append(f"    inet {address}\n")
+            for address in ipv6.get(name, ()):
+                out.append(f"    inet6 {address}\n")
+    finally:
+        sock.close()
+    return "".join(out)
+
+
+def hex_ipv4(value):
+    return socket.inet_ntoa(struct.pack("<I", int(value, 16)))
+
+
+def routing_table():
+    out = []
+    for line in read_text("/proc/net/route").splitlines()[1:]:
+        fields = line.split()
+        iface, destination, gateway, flags, metric, mask = fields[0], fields[1], fields[2], fields[3], fields[6], fields[7]
+        prefix = bin(int(mask, 16)).count("1")
+        target = "default" if destination == "00000000" and prefix == 0 else f"{hex_ipv4(destination)}/{prefix}"
+        text = target
+        if int(flags, 16) & 0x2:
+            text += f" via {hex_ipv4(gateway)}"
+        text += f" dev {iface}"
+        if metric != "0":
+            text += f" metric {metric}"
+        out.append(text + "\n")
+    return "".join(out)
+
+
+def socket_address(value, v6):
+    address, port = value.split(":")
+    if v6:
+        raw = bytes.fromhex(address)
+        raw = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+        host = f"[{ipaddress.IPv6Address(raw)}]"
+    else:
+        host = hex_ipv4(address)
+    return f"{host}:{int(port, 16)}"
+
+
+def open_ports():
+    # Listening TCP sockets (state 0A) and bound UDP sockets (state 07)
+    rows = [["Netid", "State", "Local Address:Port"]]
+    for netid, path, state, label in (("tcp", "/proc/net/tcp", "0A", "LISTEN"),
+                                      ("tcp", "/proc/net/tcp6", "0A", "LISTEN"),
+                                      ("udp", "/proc/net/udp", "07", "UNCONN"),
+                                      ("udp", "/proc/net/udp6", "07", "UNCONN")):
+        for line in (read_text(path) or "").splitlines()[1:]:
+            fields = line.split()
+            if fields[3] == state:
+                rows.append([netid, label, socket_address(fields[1], path.endswith("6"))])
+    return table(rows)
+
+
+# Users
+def logged_in_users():
+    out = []
+    for login in current_logins():
+        line = f"{login.user:<8} {login.line:<12} {format_time(login.time)}"
+        if login.host:
+            line += f" ({login.host})"
+        out.append(line + "\n")
+    return "".join(out)
+
+
+def last_logins(count=10):
+    out = []
+    for login in read_records_reversed():
+        if login.type != USER_PROCESS or not login.user:
+            continue
+        out.append(f"{login.user:<8} {login.line:<12} {login.host:<16} {format_time(login.time, '%a %b %d %H:%M')}\n")
+        if len(out) >= count:
+            break
+    return "".join(out)
+
+
+def user_accounts():
+    names = sorted(name for name, uid, _, _, _, _ in parse_passwd("/etc/passwd")
+                   if uid >= 1000 and name != "nobody")
+    return "".join(f"{name}\n" for name in names)
+
+
+# Kept between audits so the daemon only reads what wtmp gained since
+login_index = LoginIndex()
+login_index_lock = threading.Lock()
+
+
+def inactive_accounts(days=INACTIVE_DAYS):
+    with login_index_lock:
+        login_index.refresh()
+        accounts = AccountIndex.load().filter(regular=True, predicate=lambda a: a.name != "nobody")
+        found = login_index.inactive(accounts, days)
+    if not found:
+        return f"No accounts inactive for {days} days\n"
+    now = time.time()
+    rows = [("USER", "UID", "LAST LOGIN", "DAYS")]
+    for account, seconds in found:
+        if seconds is None:
+            rows.append((account.name, account.uid, "never", ""))
+        else:
+            rows.append((account.name, account.uid, format_time(seconds), int((now - seconds) // 86400)))
+    return table(rows)
+
+
+def user_groups():
+    lines = read_text("/etc/group").splitlines()
+    return "".join(f"{line}\n" for line in sorted(l for l in lines if l and not l.startswith("#")))
+
+
+# Security
+def tail_matching(path, needle, count, block=1 << 16):
+    # The last `count` lines containing `needle`, reading backwards
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    needle = needle.encode()
+    found = []
+    with f:
+        end = os.fstat(f.fileno()).st_size
+        carry = b""
+        while end > 0 and len(found) < count:
+            start = max(0, end - block)
+            f.seek(start)
+            data = f.read(end - start) + carry
+            lines = data.split(b"\n")
+            carry = lines.pop(0) if start > 0 else b""
+            for line in reversed(lines):
+                if needle in line:
+                    found.append(line.decode(errors="replace"))
+                    if len(found) >= count:
+                        break
+            end = start
+        if carry and needle in carry and len(found) < count:
+            found.append(carry.decode(errors="replace"))
+    return "".join(f"{line}\n" for line in reversed(found))
+
+
+def auth_store_query(query):
+    # query(store) after reading what the auth log gained since the last
+    # audit; None when the log or the store can't be used
+    if not os.access(AUTH_LOG, os.R_OK):
+        return None
+    try:
+        store = authlog.AuthLogStore()
+        try:
+            store.update(AUTH_LOG)
+            return query(store)
+        finally:
+            store.close()
+    except (OSError, sqlite3.Error) as e:
+        log_message(f"Auth log store unavailable: {e}", log="audit")
+        return None
+
+
+def failed_logins():
+    result = auth_store_query(lambda store: "".join(f"{line}\n" for line in store.recent()))
+    if result is None:
+        result = tail_matching(AUTH_LOG, "Failed password", 10)
+    return result if result is not None else "No failed login information available\n"
+
+
+def failed_login_sources():
+    rows = auth_store_query(lambda store: store.top_sources())
+    if rows is None:
+        return "No failed login information available\n"
+    if not rows:
+        return "No failed logins recorded\n"
+    return table([("SOURCE", "FAILURES", "USERS", "LAST SEEN")] + rows)
+
+
+def ssh_config():
+    return config_lines("/etc/ssh/sshd_config") or "No SSH configuration available\n"
+
+
+def firewall_status():
+    return (run_command(["ufw", "status"]) or run_command(["iptables", "-L"])
+            or "No firewall information available\n")
+
+
+def sudo_users():
+    return config_lines("/etc/sudoers") or "No sudo information available\n"
+
+
+def dns_config():
+    return read_text("/etc/resolv.conf")
+
+
+def interface_state():
+    # Link state, MAC and MTU per interface plus the IPv6 and route tables;
+    # an IPv4 address change shows up as a changed connected route
+    parts = []
+    for name in sorted(os.listdir("/sys/class/net")):
+        base = f"/sys/class/net/{name}"
+        parts.append(name)
+        parts.extend((read_text(f"{base}/{attr}") or "").strip() for attr in ("operstate", "address", "mtu"))
+    parts.append(read_text("/proc/net/if_inet6") or "")
+    parts.append(read_text("/proc/net/route") or "")
+    return "\0".join(parts)
+
+
+def hostname():
+    return socket.gethostname()
+
+
+def today():
+    # For blocks that count days: a cached one is good until midnight
+    return f"{datetime.now():%Y-%m-%d}"
+
+
+# (title, collector, inputs) per block. Inputs are the files and probes
+# the output depends on; None means the block is always collected.
+SECTIONS = {
+    "system": ("SYSTEM INFORMATION", [
+        ("Operating System", os_release, ("/etc/os-release", "/usr/lib/os-release")),
+        ("Kernel Information", kernel_info, (boot_id, hostname)),
+        ("System Uptime", uptime, None),
+        ("Last Boot", last_boot, (boot_id,)),
+        ("CPU Information", cpu_info, (boot_id, "/sys/devices/system/cpu/online")),
+    ]),
+    "memory": ("MEMORY INFORMATION", [
+        ("Memory Usage", memory_usage, None),
+        ("Swap Usage", swap_usage, None),
+        ("Disk Usage", disk_usage, None),
+    ]),
+    "network": ("NETWORK INFORMATION", [
+        ("Network Interfaces", network_interfaces, (interface_state,)),
+        ("Routing Table", routing_table, None),
+        ("Open Ports", open_ports, None),
+        ("DNS Configuration", dns_config, ("/etc/resolv.conf",)),
+    ]),
+    "users": ("USER INFORMATION", [
+        ("Currently Logged In Users", logged_in_users, (UTMP_PATH,)),
+        ("Last Logins", last_logins, (WTMP_PATH,)),
+        ("User Accounts (UID >= 1000)", user_accounts, ("/etc/passwd",)),
+        ("User Groups", user_groups, ("/etc/group",)),
+        (f"Inactive Accounts ({INACTIVE_DAYS}+ days)", inactive_accounts,
+         (WTMP_PATH, LASTLOG_PATH, "/etc/passwd", today)),
+    ]),
+    "security": ("SECURITY INFORMATION", [
+        ("Failed Login Attempts", failed_logins, (AUTH_LOG,)),
+        ("Failed Logins by Source", failed_login_sources, (AUTH_LOG,)),
+        ("SSH Configuration", ssh_config, ("/etc/ssh/sshd_config",)),
+        ("Firewall Status", firewall_status, None),
+        ("Sudo Users", sudo_users, ("/etc/sudoers",)),
+    ]),
+}
+
+
+# Collector threads kept by the process: one per block is enough for every
+# block of an audit to run at once
+POOL_SIZE = sum(len(blocks) for _, blocks in SECTIONS.values())
+
+
+class Collector:
+    # One run of a collector; CollectorPool runs it and `done` is set when
+    # it has finished
+    def __init__(self, func, inputs=None, cache=None, refresh=False):
+        self.func = func
+        self.inputs = inputs
+        self.cache = cache
+        self.refresh = refresh
+        self.result = None
+        self.error = None
+        self.cached = False
+        self.duration = None
+        self.done = threading.Event()
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            key = None
+            if self.cache is not None and self.inputs is not None:
+                key = fingerprint(self.func.__name__, self.inputs)
+                if not self.refresh:
+                    self.result = self.cache.get(key)
+                    self.cached = self.result is not None
+            if not self.cached:
+                self.result = self.func()
+                if key is not None and self.result is not None:
+                    self.cache.put(key, self.result)
+        except CollectorTimeout as e:
+            self.error = str(e)
+        except Exception as e:
+            self.error = f"unavailable ({e})"
+        self.duration = time.monotonic() - start
+        self.done.set()
+
+    def outcome(self, deadline, timeout):
+        # (text, error) once finished or the deadline has passed
+        if not self.done.wait(max(0, deadline - time.monotonic())):
+            return "", f"timed out after {timeout:g}s"
+        if self.error:
+            return "", self.error
+        return self.result or "", None
+
+
+class CollectorPool:
+    # Daemon threads shared by every audit in the process (userctrld runs
+    # audits for as long as it lives), so a hung collector can't keep the
+    # process alive after the report is written. A collector still running
+    # from an earlier audit, stuck on a dead NFS mount or /proc read, is not
+    # started again: the new audit waits on that same run, so hung reads
+    # never hold more than one thread per block.
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self.tasks = queue.Queue()
+        self.lock = threading.Lock()
+        self.workers = 0
+        self.idle = 0
+        self.queued = 0
+        self.running = {}
+
+    def submit(self, func, inputs=None, cache=None, refresh=False):
+        with self.lock:
+            collector = self.running.get(func)
+            if collector is not None:
+                return collector
+            collector = Collector(func, inputs, cache, refresh)
+            self.running[func] = collector
+            self.queued += 1
+            if self.queued > self.idle and self.workers < self.size:
+                self.workers += 1
+                threading.Thread(target=self.work, name="collector", daemon=True).start()
+        self.tasks.put(collector)
+        return collector
+
+    def work(self):
+        while True:
+            with self.lock:
+                self.idle += 1
+            collector = self.tasks.get()
+            with self.lock:
+                self.idle -= 1
+                self.queued -= 1
+            collector.run()
+            with self.lock:
+                del self.running[collector.func]
+
+
+pool = CollectorPool()
+
+
+def collect(sections, timeout=COLLECTOR_TIMEOUT, cache=None, refresh=False, timings=None):
+    # Start every selected collector at once, then gather them in report
+    # order as [(section, title, text, error)]. `timings`, when given, gets
+    # each block's seconds (None if it timed out).
+    started = time.monotonic()
+    running = [(key, [(title, pool.submit(func, inputs, cache, refresh)) for title, func, inputs in SECTIONS[key][1]])
+               for key in SECTION_NAMES if key in sections]
+    deadline = started + timeout
+
+    blocks = []
+    for key, collectors in running:
+        for title, collector in collectors:
+            blocks.append((key, title) + collector.outcome(deadline, timeout))
+            if timings is not None:
+                timings[title] = collector.duration
+        log_message(f"Added {SECTIONS[key][0].split()[0].lower()} information section to report", log="audit")
+    if cache is not None:
+        reused = sum(c.cached for _, collectors in running for _, c in collectors)
+        log_message(f"Reused {reused} of {len(blocks)} report blocks from the cache", log="audit")
+        cache.evict()
+    return blocks
+
+
+def render(blocks, hostname, started):
+    parts = [f"{RULE}\n           SYSTEM AUDIT REPORT\n{RULE}\n"
+             f"Date: {started:%Y-%m-%d %H:%M:%S}\nHostname: {hostname}\n{RULE}\n"]
+    section = None
+    for key, title, text, error in blocks:
+        if key != section:
+            section = key
+            parts.append(f"\n\n{SECTION_RULE}\n  {SECTIONS[key][0]}\n{SECTION_RULE}\n")
+        parts.append(f"\n-- {title} --\n")
+        parts.append(f"({error})\n" if error else text)
+    parts.append(f"\n{RULE}\n           END OF REPORT\n{RULE}\n"
+                 f"Generated by: UserCTRL Pro\nDate: {datetime.now():%Y-%m-%d %H:%M:%S}\n{RULE}\n")
+    return "".join(parts)
+
+
+def summarize(blocks):
+    # One line for the report catalog
+    counts = {title: len([l for l in text.splitlines() if l.strip()]) for _, title, text, error in blocks
+              if not error}
+    parts = []
+    if "User Accounts (UID >= 1000)" in counts:
+        parts.append(f"{counts['User Accounts (UID >= 1000)']} accounts")
+    if "Open Ports" in counts:
+        parts.append(f"{max(0, counts['Open Ports'] - 1)} open ports")
+    if "Failed Login Attempts" in counts:
+        failed = next(text for _, title, text, error in blocks if title == "Failed Login Attempts")
+        parts.append(f"{0 if failed.startswith('No failed') else counts['Failed Login Attempts']} failed logins")
+    errors = sum(1 for block in blocks if block[3])
+    if errors:
+        parts.append(f"{errors} blocks unavailable")
+    return ", ".join(parts)
+
+
+def catalog_report(path, archive_dir, started, hostname, sections, kind, summary):
+    # The report is already archived; a catalog problem is logged, and the
+    # next sync picks the report up
+    try:
+        catalog = report_catalog.ReportCatalog(archive_dir=archive_dir)
+        try:
+            catalog.add(path, started, hostname, sections, kind, summary)
+        finally:
+            catalog.close()
+    except (OSError, report_catalog.sqlite3.Error) as e:
+        log_message(f"Could not catalog {path}: {e}", log="audit")
+
+
+def generate(sections=None, output=None, archive_dir=ARCHIVE_DIR, timeout=COLLECTOR_TIMEOUT,
+             refresh=False, use_cache=True, diff=False, baseline=None,
+             snapshot_dir=audit_snapshot.SNAPSHOT_DIR, timings=None):
+    # Archives the report (compressed; plus a plain copy at `output` when
+    # given), saves a snapshot and returns the report's path. refresh recollects every block and updates
+    # the cache. diff writes only what changed since `baseline` (default:
+    # the previous snapshot); with nothing to compare it writes a full report.
+    # Audits run one at a time across processes (GUI, helper, scheduler, CLI),
+    # so two never share a snapshot baseline or a report name.
+    os.makedirs(os.path.dirname(AUDIT_LOCK), exist_ok=True)
+    with open(AUDIT_LOCK, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        sections = [s for s in (sections or SECTION_NAMES) if s in SECTIONS]
+        started = datetime.now()
+        hostname = socket.gethostname()
+        log_message(f"Generating audit report with sections: {','.join(sections)}", log="audit")
+        if diff:
+            baseline = baseline or audit_snapshot.previous_snapshot(snapshot_dir)
+            old = audit_snapshot.load(baseline) if baseline else None
+
+        blocks = collect(sections, timeout, AuditCache() if use_cache else None, refresh, timings)
+        headings = {key: SECTIONS[key][0] for key in SECTIONS}
+        if diff and old is not None:
+            name = f"audit_report_{started:%Y%m%d_%H%M%S}_diff.txt"
+            new = audit_snapshot.make_snapshot(blocks, hostname, headings, started)
+            changes = audit_snapshot.diff(old, new)
+            report = audit_snapshot.format_diff(old, new, changes)
+            kind = "diff"
+            summary = (f"{len(changes)} changed blocks, +{sum(len(c[2]) for c in changes)} "
+                       f"-{sum(len(c[3]) for c in changes)} items") if changes else "no changes"
+            log_message(f"Compared with {baseline}: {len(changes)} changed blocks", log="audit")
+        else:
+            if diff:
+                log_message("No earlier snapshot to compare with; writing a full report", log="audit")
+            name = f"audit_report_{started:%Y%m%d_%H%M%S}.txt"
+            report = render(blocks, hostname, started)
+            kind = "full"
+            summary = summarize(blocks)
+
+        if output or not archive_dir:
+            output = output or name
+            with open(output, "w") as f:
+                f.write(report)
+        path = output
+        if archive_dir:
+            path = report_archive.store_text(report, os.path.basename(output or name), started, archive_dir)
+            catalog_report(path, archive_dir, started, hostname, sections, kind, summary)
+        if snapshot_dir:
+            snapshot = audit_snapshot.make_snapshot(blocks, hostname, headings, started, os.path.basename(path))
+            audit_snapshot.save(snapshot, snapshot_dir)
+        log_message(f"Audit report generated: {path}", log="audit")
+        return os.path.abspath(output or path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a system audit report")
+    parser.add_argument("-i", "--include", default=",".join(SECTION_NAMES),
+                        help="comma-separated sections: " + ",".join(SECTION_NAMES))
+    parser.add_argument("-o", "--output", help="also write the report, uncompressed, to this file")
+    parser.add_argument("--timeout", type=float, default=COLLECTOR_TIMEOUT, help="seconds per collector")
+    parser.add_argument("--refresh", action="store_true", help="recollect cached blocks")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor update the cache")
+    parser.add_argument("--diff", action="store_true", help="report only what changed since the last snapshot")
+    parser.add_argument("--baseline", help="snapshot to compare with instead of the last one")
+    args = parser.parse_args(argv)
+
+    print("Generating audit report...")
+    try:
+        path = generate(args.include.split(","), args.output, timeout=args.timeout, refresh=args.refresh,
+                        use_cache=not args.no_cache, diff=args.diff or bool(args.baseline), baseline=args.baseline)
+    except audit_snapshot.SnapshotError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Audit report generated: {os.path.relpath(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,481 @@
+# audit_scheduler.py - Cron-style schedules for audit reports
+# Schedules live in archive/schedule.db and are run by a background thread
+# in the GUI, or headless with `serve`. Each names the audit sections, a
+# five-field cron expression (or @hourly, @daily, @weekly, @monthly) and up
+# to `jitter` seconds of random delay, so hosts sharing a schedule don't
+# all audit at the same moment. Runs missed while no scheduler was up
+# collapse into one.
+#
+# A run holds its schedule's flock, so the GUI and a headless scheduler
+# never both run it. A trigger that arrives while it runs (its time comes
+# round again, or Run Now) is merged into that run and counted as coalesced
+# rather than starting another audit.
+#
+# Finished reports can be mailed through mail_queue, and archive retention
+# applied after the run. Each run's duration and every collector's time are
+# kept, so `slow` shows which collectors hold the audits up.
+#
+# Usage: python3 gui/audit_scheduler.py add NAME CRON [-i system,...] [--jitter S] [--send-to EMAILS] [--archive] [--diff]
+#        python3 gui/audit_scheduler.py remove|enable|disable|run NAME
+#        python3 gui/audit_scheduler.py list|runs|slow|serve
+
+import argparse
+import fcntl
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import audit_engine
+import journal
+import report_archive
+
+SCHEDULE_PATH = os.path.join(report_archive.ARCHIVE_ROOT, "schedule.db")
+LOCK_DIR = os.path.join(report_archive.ARCHIVE_ROOT, "schedules")
+
+# The scheduler also looks for schedules added by other processes this often
+POLL_SECONDS = 60
+# Runs are forgotten after this many days
+KEEP_DAYS = 90
+
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# minute, hour, day of month, month, day of week (0 and 7 are Sunday)
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    name TEXT PRIMARY KEY,
+    cron TEXT NOT NULL,
+    sections TEXT,
+    jitter INTEGER NOT NULL DEFAULT 0,
+    send_to TEXT,
+    archive INTEGER NOT NULL DEFAULT 0,
+    diff INTEGER NOT NULL DEFAULT 0,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    next_run REAL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    schedule TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL,
+    status TEXT NOT NULL DEFAULT 'running',
+    report TEXT,
+    error TEXT,
+    coalesced INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_schedule ON runs (schedule, id);
+CREATE TABLE IF NOT EXISTS run_timings (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    collector TEXT NOT NULL,
+    seconds REAL
+);
+CREATE INDEX IF NOT EXISTS run_timings_run ON run_timings (run_id);
+"""
+
+
+class SchedulerError(Exception):
+    pass
+
+
+def parse_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        spec, slash, step = part.partition("/")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(v) for v in spec.split("-", 1))
+        else:
+            # "5/15" runs from 5 to the end of the range
+            start = int(spec)
+            end = high if slash else start
+        step = int(step) if slash else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(part)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    def __init__(self, text):
+        self.text = text.strip()
+        fields = ALIASES.get(self.text, self.text).split()
+        if len(fields) != 5:
+            raise SchedulerError(f"{text!r} is not a five-field cron expression")
+        try:
+            self.minutes, self.hours, self.days, self.months, weekdays = (
+                sorted(parse_field(field, low, high)) for field, (low, high) in zip(fields, FIELD_RANGES))
+        except ValueError as e:
+            raise SchedulerError(f"Invalid cron field {e} in {text!r}")
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron: when both day fields are restricted either may match
+        self.either_day = fields[2] != "*" and fields[4] != "*"
+
+    def day_matches(self, when):
+        day = when.day in self.days
+        weekday = when.isoweekday() % 7 in self.weekdays
+        return day or weekday if self.either_day else day and weekday
+
+    def next_time(self, after):
+        # The first matching minute strictly after `after`
+        when = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = when.year + 8
+        while when.year <= limit:
+            if when.month not in self.months:
+                when = (when.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(when):
+                when = when.replace(hour=0, minute=0) + timedelta(days=1)
+            elif when.hour not in self.hours:
+                when = when.replace(minute=0) + timedelta(hours=1)
+            else:
+                minute = next((m for m in self.minutes if m >= when.minute), None)
+                if minute is not None:
+                    return when.replace(minute=minute)
+                when = when.replace(minute=0) + timedelta(hours=1)
+        raise SchedulerError(f"{self.text!r} never runs")
+
+
+def next_run(cron, jitter, now=None):
+    # Epoch seconds of the next run after `now`, delayed by up to `jitter`
+    now = now or time.time()
+    when = Cron(cron).next_time(datetime.fromtimestamp(now)).timestamp()
+    return when + (random.uniform(0, jitter) if jitter else 0)
+
+
+def local_audit(sections, diff=False, archive=False):
+    # Run the audit in this process (headless scheduler, CLI)
+    import report_archive
+
+    timings = {}
+    report = audit_engine.generate(sections, diff=diff, timings=timings)
+    if archive:
+        report_archive.prune_archive(log=lambda m: journal.log(m, channel="audit"))
+    return {"report": report, "timings": timings}
+
+
+class AuditScheduler:
+    def __init__(self, path=SCHEDULE_PATH, lock_dir=LOCK_DIR, run_audit=local_audit, mail=None):
+        # run_audit(sections, diff, archive) -> {"report", "timings"}; the
+        # GUI passes one that goes through the helper. mail is a MailQueue
+        # for schedules with recipients.
+        self.path = path
+        self.lock_dir = lock_dir
+        self.run_audit = run_audit
+        self.mail = mail
+        os.makedirs(lock_dir, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.closing = False
+        self.workers = []
+
+    def close(self):
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(10)
+        for worker in self.workers:
+            worker.join(10)
+        self.db.close()
+
+    # Schedules
+    def add(self, name, cron, sections=None, jitter=0, send_to=None, archive=False, diff=False):
+        # Add or replace a schedule; returns its first run time
+        import mail_queue
+
+        if not name or "/" in name or name.startswith("."):
+            raise SchedulerError(f"{name!r} is not a usable schedule name")
+        sections = list(sections or audit_engine.SECTION_NAMES)
+        unknown = [s for s in sections if s not in audit_engine.SECTION_NAMES]
+        if unknown:
+            raise SchedulerError(f"Unknown audit sections: {', '.join(unknown)}")
+        if jitter < 0:
+            raise SchedulerError("Jitter cannot be negative")
+        if send_to:
+            try:
+                send_to = ",".join(mail_queue.split_recipients(send_to))
+            except mail_queue.MailError as e:
+                raise SchedulerError(str(e))
+        first = next_run(cron, jitter)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO schedules (name, cron, sections, jitter, send_to, archive, diff, "
+                            "enabled, next_run) VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                            (name, Cron(cron).text, ",".join(sections), int(jitter), send_to or None,
+                             int(bool(archive)), int(bool(diff)), first))
+        self.wake()
+        return first
+
+    def remove(self, name):
+        with self.lock, self.db:
+            if not self.db.execute("DELETE FROM schedules WHERE name = ?", (name,)).rowcount:
+                raise SchedulerError(f"No schedule named {name}")
+
+    def set_enabled(self, name, enabled):
+        row = self.schedule(name)
+        with self.lock, self.db:
+            self.db.execute("UPDATE schedules SET enabled = ?, next_run = ? WHERE name = ?",
+                            (int(enabled), next_run(row["cron"], row["jitter"]), name))
+        self.wake()
+
+    def schedule(self, name):
+        with self.lock:
+            row = self.db.execute("SELECT * FROM schedules WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise SchedulerError(f"No schedule named {name}")
+        return row
+
+    def schedules(self):
+        # Each schedule with its latest run's started, duration, status and error
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT s.*, r.started, r.duration, r.status, r.error, r.coalesced FROM schedules s "
+                "LEFT JOIN runs r ON r.id = (SELECT MAX(id) FROM runs WHERE schedule = s.name) "
+                "ORDER BY s.name").fetchall()
+        return [dict(row) for row in rows]
+
+    def runs(self, limit=50, name=None):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM runs" + (" WHERE schedule = ?" if name else "") + " ORDER BY id DESC LIMIT ?",
+                ((name, limit) if name else (limit,))).fetchall()
+        return [dict(row) for row in rows]
+
+    def slow_collectors(self, days=7, limit=10):
+        # Collectors by average time over recent runs; a timed-out block
+        # counts in `timeouts` rather than the averages
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT t.collector, COUNT(*) AS runs, AVG(t.seconds) AS average, MAX(t.seconds) AS slowest, "
+                "SUM(t.seconds IS NULL) AS timeouts FROM run_timings t JOIN runs r ON r.id = t.run_id "
+                "WHERE r.started >= ? GROUP BY t.collector ORDER BY timeouts DESC, average DESC LIMIT ?",
+                (time.time() - days * 86400, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    # Running
+    def trigger(self, name):
+        # Run the schedule now and return the run's id, or None when a run
+        # already in progress (here or in another process) absorbed it
+        row = self.schedule(name)
+        with open(os.path.join(self.lock_dir, name + ".lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                with self.lock, self.db:
+                    self.db.execute("UPDATE runs SET coalesced = coalesced + 1 WHERE id = "
+                                    "(SELECT MAX(id) FROM runs WHERE schedule = ? AND status = 'running')", (name,))
+                return None
+            return self.execute(row)
+
+    def execute(self, row):
+        # Called holding the schedule's lock, so any run still marked
+        # running belongs to a scheduler that died
+        name = row["name"]
+        sections = row["sections"].split(",") if row["sections"] else None
+        with self.lock, self.db:
+            self.db.execute("UPDATE runs SET status = 'interrupted' WHERE schedule = ? AND status = 'running'",
+                            (name,))
+            run_id = self.db.execute("INSERT INTO runs (schedule, started) VALUES (?, ?)",
+                                     (name, time.time())).lastrowid
+        start = time.monotonic()
+        report, timings, error = None, {}, None
+        try:
+            result = self.run_audit(sections, bool(row["diff"]), bool(row["archive"]))
+            report, timings = result["report"], result.get("timings") or {}
+            if row["send_to"]:
+                if self.mail is None:
+                    raise SchedulerError("no mail queue to send the report with")
+                self.mail.enqueue(row["send_to"].split(","), f"System Audit Report ({name})", [report])
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        duration = time.monotonic() - start
+        with self.lock, self.db:
+            self.db.execute("UPDATE runs SET duration = ?, status = ?, report = ?, error = ? WHERE id = ?",
+                            (duration, "failed" if error else "ok", report, error, run_id))
+            self.db.executemany("INSERT INTO run_timings (run_id, collector, seconds) VALUES (?, ?, ?)",
+                                [(run_id, collector, seconds) for collector, seconds in timings.items()])
+            coalesced = self.db.execute("SELECT coalesced FROM runs WHERE id = ?", (run_id,)).fetchone()[0]
+        slowest = max(((s, c) for c, s in timings.items() if s is not None), default=(None, None))[1]
+        journal.record("scheduled_audit", name, "failed" if error else "ok",
+                       error or f"Scheduled audit {name}: {os.path.basename(report)}", duration,
+                       report=report, sections=row["sections"], coalesced=coalesced, slowest=slowest,
+                       channel="audit")
+        return run_id
+
+    def start(self):
+        # Check the schedules in a background thread until close()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+            self.thread.start()
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def run(self):
+        while True:
+            try:
+                self.dispatch_due()
+            except (OSError, sqlite3.Error, SchedulerError) as e:
+                journal.log(f"Audit scheduler: {e}", channel="audit")
+            with self.cond:
+                if self.closing:
+                    return
+                self.cond.wait(self.next_wakeup())
+                if self.closing:
+                    return
+
+    def dispatch_due(self, now=None):
+        # Start every due schedule on its own thread; returns their names.
+        # Claiming moves next_run on only if nobody else has, so of several
+        # schedulers on one host a single one runs each due time.
+        now = now or time.time()
+        with self.lock:
+            due = self.db.execute("SELECT * FROM schedules WHERE enabled = 1 AND next_run <= ?",
+                                  (now,)).fetchall()
+        started = []
+        for row in due:
+            try:
+                following = next_run(row["cron"], row["jitter"], now)
+            except SchedulerError:
+                following = None
+            with self.lock, self.db:
+                claimed = self.db.execute("UPDATE schedules SET next_run = ? WHERE name = ? AND next_run = ?",
+                                          (following, row["name"], row["next_run"])).rowcount
+            if claimed:
+                worker = threading.Thread(target=self.trigger_logged, args=(row["name"],),
+                                          name=f"schedule {row['name']}", daemon=True)
+                worker.start()
+                self.workers = [w for w in self.workers if w.is_alive()] + [worker]
+                started.append(row["name"])
+        if started:
+            self.clean()
+        return started
+
+    def trigger_logged(self, name):
+        try:
+            self.trigger(name)
+        except (OSError, sqlite3.Error, SchedulerError) as e:
+            journal.log(f"Scheduled audit {name} not run: {e}", channel="audit")
+
+    def next_wakeup(self):
+        with self.lock:
+            row = self.db.execute("SELECT MIN(next_run) FROM schedules WHERE enabled = 1").fetchone()
+        timeout = POLL_SECONDS
+        if row[0] is not None:
+            timeout = min(timeout, row[0] - time.time())
+        return max(1.0, timeout)
+
+    def clean(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM runs WHERE started < ? AND status != 'running'",
+                            (time.time() - KEEP_DAYS * 86400,))
+
+
+def when(timestamp):
+    return f"{datetime.fromtimestamp(timestamp):%Y-%m-%d %H:%M}" if timestamp else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scheduled audit reports")
+    parser.add_argument("--db", default=SCHEDULE_PATH)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    p = commands.add_parser("add", help="add or replace a schedule")
+    p.add_argument("name")
+    p.add_argument("cron", help='five cron fields, e.g. "30 2 * * 1-5", or @daily')
+    p.add_argument("-i", "--include", help="sections to audit, comma-separated (default: all)")
+    p.add_argument("--jitter", type=int, default=0, help="random delay of up to this many seconds")
+    p.add_argument("--send-to", help="mail each report to these addresses")
+    p.add_argument("--archive", action="store_true", help="apply archive retention after each run")
+    p.add_argument("--diff", action="store_true", help="report only changes since the last audit")
+    for command, text in (("remove", "delete a schedule"), ("enable", "resume a schedule"),
+                          ("disable", "pause a schedule"), ("run", "run a schedule now")):
+        commands.add_parser(command, help=text).add_argument("name")
+    commands.add_parser("list", help="show the schedules")
+    p = commands.add_parser("runs", help="show recent runs")
+    p.add_argument("-n", type=int, default=20)
+    p = commands.add_parser("slow", help="show the slowest collectors")
+    p.add_argument("--days", type=int, default=7)
+    commands.add_parser("serve", help="run schedules until interrupted")
+    args = parser.parse_args(argv)
+
+    import mail_queue
+
+    mail = mail_queue.MailQueue() if args.command in ("run", "serve") else None
+    scheduler = AuditScheduler(args.db, os.path.join(os.path.dirname(args.db) or ".", "schedules"), mail=mail)
+    try:
+        if args.command == "add":
+            first = scheduler.add(args.name, args.cron, args.include.split(",") if args.include else None,
+                                  args.jitter, args.send_to, args.archive, args.diff)
+            print(f"Schedule {args.name} added; first run {when(first)}")
+        elif args.command == "remove":
+            scheduler.remove(args.name)
+            print(f"Schedule {args.name} removed")
+        elif args.command in ("enable", "disable"):
+            scheduler.set_enabled(args.name, args.command == "enable")
+            print(f"Schedule {args.name} {args.command}d")
+        elif args.command == "run":
+            run_id = scheduler.trigger(args.name)
+            if run_id is None:
+                print(f"Schedule {args.name} is already running; merged into that run")
+                return 0
+            run = scheduler.runs(1, args.name)[0]
+            if run["status"] != "ok":
+                print(f"Error: {run['error']}")
+                return 1
+            mail.drain()
+            print(f"Audit report generated: {run['report']} ({run['duration']:.1f}s)")
+        elif args.command == "list":
+            for s in scheduler.schedules():
+                state = "" if s["enabled"] else " (disabled)"
+                last = f"{when(s['started'])} {s['status']}" if s["status"] else "never"
+                print(f"{s['name']}{state}: {s['cron']} [{s['sections']}] next {when(s['next_run'])}, last {last}")
+        elif args.command == "runs":
+            for run in scheduler.runs(args.n):
+                took = f"{run['duration']:.1f}s" if run["duration"] is not None else "-"
+                merged = f", {run['coalesced']} merged" if run["coalesced"] else ""
+                print(f"{when(run['started'])} {run['schedule']}: {run['status']} in {took}{merged}"
+                      + (f" - {run['error']}" if run["error"] else ""))
+        elif args.command == "slow":
+            for row in scheduler.slow_collectors(args.days):
+                average = f"{row['average']:.2f}s" if row["average"] is not None else "-"
+                slowest = f"{row['slowest']:.2f}s" if row["slowest"] is not None else "-"
+                print(f"{row['collector']}: average {average}, slowest {slowest} over {row['runs']} runs"
+                      + (f", {row['timeouts']} timed out" if row["timeouts"] else ""))
+        elif args.command == "serve":
+            mail.start()
+            scheduler.start()
+            print(f"Running {len(scheduler.schedules())} schedules; Ctrl-C to stop")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+    except SchedulerError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        scheduler.close()
+        if mail is not None:
+            mail.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
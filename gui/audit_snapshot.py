@@ -0,0 +1,208 @@
+# audit_snapshot.py - Structured audit snapshots and what changed between them
+# Every audit also saves its blocks as gzip-compressed JSON next to the text
+# report. Two snapshots can then be compared item by item (a line of the
+# block, or a key derived from it), which is what differential reports show:
+# new accounts, new listening ports, sudoers or sshd_config edits.
+#
+# Usage: python3 gui/audit_snapshot.py list
+#        python3 gui/audit_snapshot.py diff [BASELINE [CURRENT]]
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from report_archive import SNAPSHOT_DIR
+
+SNAPSHOT_VERSION = 1
+
+# Blocks that differ on every run and say nothing about configuration
+IGNORED_BLOCKS = {"System Uptime", "Memory Usage", "Swap Usage"}
+
+
+def disk_item(line):
+    # Usage figures change constantly; a mount appearing or going is news
+    fields = line.split()
+    return f"{fields[0]} on {fields[-1]}" if len(fields) >= 6 else line
+
+
+def first_field(line):
+    # Counts beside the key grow every run; a new key is the news
+    fields = line.split()
+    return fields[0] if fields else line
+
+
+# How a block's lines become comparable items; the default is the line
+ITEM_KEYS = {
+    "Disk Usage": disk_item,
+    "Failed Logins by Source": first_field,
+    "Inactive Accounts (90+ days)": first_field,
+}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_name(when):
+    # Microseconds, so audits in the same second (a scheduled run and a
+    # manual one) keep a snapshot each; the names still sort by time
+    return f"audit_{when:%Y%m%d_%H%M%S_%f}.json.gz"
+
+
+def make_snapshot(blocks, hostname, headings, when, report=None):
+    # blocks: [(section, title, text, error)] in report order;
+    # headings: section -> report heading ("USER INFORMATION")
+    return {
+        "version": SNAPSHOT_VERSION,
+        "time": when.isoformat(timespec="microseconds"),
+        "hostname": hostname,
+        "report": report,
+        "headings": {section: headings[section] for section, _, _, _ in blocks},
+        "blocks": [{"section": section, "title": title, "text": text, "error": error}
+                   for section, title, text, error in blocks],
+    }
+
+
+def save(snapshot, directory=SNAPSHOT_DIR):
+    # The finished file is linked into place, which fails rather than
+    # replacing a snapshot that already has the name
+    when = datetime.fromisoformat(snapshot["time"])
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        while True:
+            path = os.path.join(directory, snapshot_name(when))
+            try:
+                os.link(tmp, path)
+                break
+            except FileExistsError:
+                when += timedelta(microseconds=1)
+    finally:
+        os.unlink(tmp)
+    return path
+
+
+def load(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot read snapshot {path}: {e}")
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot {path} has unsupported version {snapshot.get('version')}")
+    return snapshot
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    # Oldest first; the timestamped names sort chronologically
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return [os.path.join(directory, n) for n in sorted(names) if n.startswith("audit_") and n.endswith(".json.gz")]
+
+
+def previous_snapshot(directory=SNAPSHOT_DIR, before=None):
+    # The newest snapshot, or the newest one older than `before`
+    snapshots = list_snapshots(directory)
+    if before is not None:
+        snapshots = [p for p in snapshots if os.path.basename(p) < os.path.basename(before)]
+    return snapshots[-1] if snapshots else None
+
+
+def items(title, text):
+    key = ITEM_KEYS.get(title)
+    result = {}
+    for line in (text or "").splitlines():
+        if line.strip():
+            result.setdefault(key(line) if key else line, line)
+    return result
+
+
+def diff(baseline, current):
+    # [(section, title, added lines, removed lines, note)] for changed blocks.
+    # Only blocks present in both snapshots are compared.
+    old = {(b["section"], b["title"]): b for b in baseline["blocks"]}
+    changes = []
+    for block in current["blocks"]:
+        key = (block["section"], block["title"])
+        if block["title"] in IGNORED_BLOCKS or key not in old:
+            continue
+        before = old[key]
+        if block["error"] or before["error"]:
+            if block["error"] != before["error"]:
+                note = f"now: {block['error']}" if block["error"] else f"recovered from: {before['error']}"
+                changes.append((block["section"], block["title"], [], [], note))
+            continue
+        old_items = items(before["title"], before["text"])
+        new_items = items(block["title"], block["text"])
+        added = [line for k, line in new_items.items() if k not in old_items]
+        removed = [line for k, line in old_items.items() if k not in new_items]
+        if added or removed:
+            changes.append((block["section"], block["title"], added, removed, None))
+    return changes
+
+
+def format_diff(baseline, current, changes):
+    # Text in the report's own layout, holding only the changed blocks
+    rule = "=" * 55
+    lines = [rule, "        SYSTEM AUDIT REPORT - CHANGES", rule,
+             f"Date: {current['time'].replace('T', ' ')[:19]}",
+             f"Hostname: {current['hostname']}",
+             f"Compared with: {baseline['time'].replace('T', ' ')[:19]}",
+             rule]
+    if not changes:
+        lines.append("\nNo changes.")
+    section = None
+    for block_section, title, added, removed, note in changes:
+        if block_section != section:
+            section = block_section
+            lines.extend(["", "-" * 55, f"  {current.get('headings', {}).get(section, section.upper())}", "-" * 55])
+        lines.append(f"\n-- {title} --")
+        if note:
+            lines.append(f"  {note}")
+        lines.extend(f"+ {line}" for line in added)
+        lines.extend(f"- {line}" for line in removed)
+    lines.extend(["", rule, "           END OF CHANGES", rule])
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List and compare audit snapshots")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="snapshot directory")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    commands.add_parser("list", help="list snapshots, oldest first")
+    p = commands.add_parser("diff", help="show what changed between two snapshots")
+    p.add_argument("baseline", nargs="?", help="default: the snapshot before CURRENT")
+    p.add_argument("current", nargs="?", help="default: the newest snapshot")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for path in list_snapshots(args.dir):
+            print(path)
+        return 0
+
+    current = args.current or previous_snapshot(args.dir)
+    baseline = args.baseline or (current and previous_snapshot(args.dir, before=current))
+    if not current or not baseline:
+        print("Error: need two snapshots to compare")
+        return 1
+    try:
+        old, new = load(baseline), load(current)
+    except SnapshotError as e:
+        print(f"Error: {e}")
+        return 1
+    sys.stdout.write(format_diff(old, new, diff(old, new)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+# authlog.py - Incremental analyzer for the sshd lines of the auth log
+# Each update reads only what was appended since the last one: the store
+# remembers the log's device/inode, the byte offset read up to and the log's
+# first line. When the log has been rotated, the rotated copy (auth.log.1,
+# auth.log.2.gz, ...) with that first line is finished from the saved offset
+# before the new log is read from the start. The first update reads the
+# rotated logs too, oldest first.
+#
+# Failures are folded into running totals per source address, per user and
+# per hour in a small SQLite store, committed together with the checkpoint,
+# so the audit's security section and the suspects view are a few indexed
+# queries however large the log grows.
+#
+# Usage: python3 gui/authlog.py update [--log PATH]
+#        python3 gui/authlog.py summary
+#        python3 gui/authlog.py suspects [--min-failures N] [--since YYYY-MM-DD]
+
+import argparse
+import collections
+import fcntl
+import glob
+import gzip
+import lzma
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from report_archive import ARCHIVE_ROOT
+
+AUTH_LOG = "/var/log/auth.log"
+STORE_PATH = os.path.join(ARCHIVE_ROOT, "authlog.db")
+
+# Failed lines kept verbatim for the report, as the script's `tail -n 10`
+RECENT_LINES = 10
+# Hourly totals older than this are dropped
+HOURS_KEPT_DAYS = 90
+# A source with this many failures is a brute-force suspect
+SUSPECT_FAILURES = 20
+# Checkpoint and totals are committed every this many bytes read, so a big
+# first update can be interrupted without starting over
+COMMIT_BYTES = 64 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    log TEXT PRIMARY KEY,
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    head BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS by_source (
+    source TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    first TEXT NOT NULL,
+    last TEXT NOT NULL,
+    accepted INTEGER NOT NULL DEFAULT 0,
+    last_accepted TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS by_source_failures ON by_source (failures);
+CREATE TABLE IF NOT EXISTS by_user (
+    user TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    first TEXT NOT NULL,
+    last TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS by_user_failures ON by_user (failures);
+CREATE TABLE IF NOT EXISTS by_hour (
+    hour TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS source_users (
+    source TEXT NOT NULL,
+    user TEXT NOT NULL,
+    PRIMARY KEY (source, user)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recent (
+    id INTEGER PRIMARY KEY,
+    line TEXT NOT NULL
+);
+"""
+
+FAILED_RE = re.compile(rb"Failed (?:password|publickey|keyboard-interactive/pam|none) for "
+                       rb"(?:invalid user )?(.*?) from (\S+) port")
+ACCEPTED_RE = re.compile(rb"Accepted \S+ for (\S+) from (\S+) port")
+# rsyslog folds identical lines into one of these
+REPEATED_RE = re.compile(rb"message repeated (\d+) times: \[")
+MONTHS = {m.encode(): i for i, m in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+OPENERS = {".gz": gzip.open, ".xz": lzma.open}
+
+# One update at a time within the process; flock covers other processes
+update_lock = threading.Lock()
+
+
+def open_log(path):
+    return OPENERS.get(os.path.splitext(path)[1], open)(path, "rb")
+
+
+def log_head(path):
+    # The log's first line identifies it wherever rotation moves it
+    try:
+        with open_log(path) as f:
+            line = f.readline(256)
+    except (OSError, EOFError):
+        return None
+    return line if line.endswith(b"\n") else b""
+
+
+def rotated_logs(path):
+    # Rotated copies, newest first: auth.log.1, auth.log.2.gz, ... or the
+    # dateext names (auth.log-20261018.gz)
+    found = []
+    n = 1
+    while True:
+        names = [f"{path}.{n}{suffix}" for suffix in ("", ".gz", ".xz") if os.path.exists(f"{path}.{n}{suffix}")]
+        if not names:
+            break
+        found.extend(names)
+        n += 1
+    found.extend(sorted(glob.glob(glob.escape(path) + "-[0-9]*"), reverse=True))
+    return found
+
+
+def timestamp(line, modified):
+    # "YYYY-MM-DD HH:MM:SS" from a syslog line, either RFC 3339 or the
+    # classic "Oct 18 12:00:01", which leaves out the year: take it from
+    # the file's modification time
+    if line[:4].isdigit() and line[4:5] == b"-":
+        return line[:19].decode(errors="replace").replace("T", " ")
+    month = MONTHS.get(line[:3])
+    if month is None:
+        return None
+    try:
+        day = int(line[4:6])
+        clock = line[7:15].decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+    # A December line in a file last written in January is from last year
+    return f"{modified.year - (month > modified.month):04d}-{month:02d}-{day:02d} {clock}"
+
+
+class Totals:
+    # Aggregates of the lines read since the last commit
+    def __init__(self):
+        self.sources = {}
+        self.users = {}
+        self.hours = collections.Counter()
+        self.source_users = set()
+        self.accepted = {}
+        self.recent = collections.deque(maxlen=RECENT_LINES)
+        self.failures = 0
+
+    def add_failure(self, when, user, source, count, line):
+        self.failures += count
+        for table, key in ((self.sources, source), (self.users, user)):
+            entry = table.get(key)
+            if entry is None:
+                table[key] = [count, when, when]
+            else:
+                entry[0] += count
+                entry[1] = min(entry[1], when)
+                entry[2] = max(entry[2], when)
+        self.hours[when[:13]] += count
+        self.source_users.add((source, user))
+        self.recent.append(line)
+
+    def add_accepted(self, when, source):
+        entry = self.accepted.setdefault(source, [0, when])
+        entry[0] += 1
+        entry[1] = max(entry[1], when)
+
+    def feed(self, line, modified):
+        if b"Failed " in line:
+            match = FAILED_RE.search(line)
+            if match:
+                when = timestamp(line, modified)
+                if when:
+                    repeated = REPEATED_RE.search(line, 0, match.start())
+                    count = int(repeated.group(1)) if repeated else 1
+                    self.add_failure(when, match.group(1).decode(errors="replace"),
+                                     match.group(2).decode(errors="replace"), count,
+                                     line.rstrip(b"\n").decode(errors="replace"))
+        elif b"Accepted " in line:
+            match = ACCEPTED_RE.search(line)
+            if match:
+                when = timestamp(line, modified)
+                if when:
+                    self.add_accepted(when, match.group(2).decode(errors="replace"))
+
+
+class AuthLogStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def pending(self, log):
+        # [(path, offset)] still to read, oldest first
+        row = self.db.execute("SELECT dev, inode, offset, head FROM checkpoint WHERE log = ?", (log,)).fetchone()
+        try:
+            st = os.stat(log)
+        except OSError:
+            st = None
+        if row is None:
+            files = [(path, 0) for path in reversed(rotated_logs(log))]
+            return files + ([(log, 0)] if st else [])
+        dev, inode, offset, head = row
+        if st and (st.st_dev, st.st_ino) == (dev, inode) and (not head or log_head(log) == head):
+            # Same file; shorter than the offset means it was truncated
+            return [(log, offset if st.st_size >= offset else 0)]
+        # Rotated since: finish the old file wherever it went, then read
+        # everything newer
+        newer = []
+        for path in rotated_logs(log):
+            if head and log_head(path) == head:
+                return [(path, offset)] + list(reversed(newer)) + ([(log, 0)] if st else [])
+            newer.append((path, 0))
+        # Lost track of it (the checkpoint predates every rotated copy)
+        return [(log, 0)] if st else []
+
+    def update(self, log=AUTH_LOG):
+        # Read what was appended since the last update; returns the number
+        # of failures found
+        with update_lock, open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            found = 0
+            for path, offset in self.pending(log):
+                found += self.read(log, path, offset)
+            self.db.execute("DELETE FROM by_hour WHERE hour < ?",
+                            (f"{datetime.now() - timedelta(days=HOURS_KEPT_DAYS):%Y-%m-%d %H}",))
+            self.db.commit()
+            return found
+
+    def read(self, log, path, offset):
+        try:
+            f = open_log(path)
+        except OSError:
+            return 0
+        with f:
+            if path == log:
+                st = os.fstat(f.fileno())
+                ident = (st.st_dev, st.st_ino)
+            else:
+                # Once the current log has been read this checkpoint is
+                # replaced; until then it keeps naming the rotated file's head
+                ident = None
+            modified = datetime.fromtimestamp(os.path.getmtime(path))
+            head = log_head(path) or b""
+            f.seek(offset)
+            totals = Totals()
+            found = 0
+            since_commit = 0
+            for line in f:
+                offset += len(line)
+                since_commit += len(line)
+                if not line.endswith(b"\n"):
+                    # Half-written last line: read it whole next time
+                    offset -= len(line)
+                    break
+                totals.feed(line, modified)
+                if since_commit >= COMMIT_BYTES:
+                    found += totals.failures
+                    self.commit(log, ident, offset, head, totals)
+                    totals = Totals()
+                    since_commit = 0
+            found += totals.failures
+            self.commit(log, ident, offset, head, totals)
+            return found
+
+    def commit(self, log, ident, offset, head, totals):
+        # Totals and the checkpoint in one transaction: an update that dies
+        # halfway neither loses nor double-counts lines
+        with self.db:
+            db = self.db
+            db.executemany(
+                "INSERT INTO by_source (source, failures, first, last) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET failures = failures + excluded.failures, "
+                "first = min(first, excluded.first), last = max(last, excluded.last)",
+                [(source, *entry) for source, entry in totals.sources.items()])
+            db.executemany(
+                "INSERT INTO by_user (user, failures, first, last) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user) DO UPDATE SET failures = failures + excluded.failures, "
+                "first = min(first, excluded.first), last = max(last, excluded.last)",
+                [(user, *entry) for user, entry in totals.users.items()])
+            db.executemany(
+                "INSERT INTO by_hour (hour, failures) VALUES (?, ?) "
+                "ON CONFLICT (hour) DO UPDATE SET failures = failures + excluded.failures",
+                totals.hours.items())
+            db.executemany("INSERT OR IGNORE INTO source_users (source, user) VALUES (?, ?)",
+                           totals.source_users)
+            # Only sources that also failed are of interest
+            db.executemany(
+                "UPDATE by_source SET accepted = accepted + ?, "
+                "last_accepted = max(coalesce(last_accepted, ''), ?) WHERE source = ?",
+                [(count, when, source) for source, (count, when) in totals.accepted.items()])
+            if totals.recent:
+                db.executemany("INSERT INTO recent (line) VALUES (?)", [(line,) for line in totals.recent])
+                db.execute("DELETE FROM recent WHERE id <= (SELECT max(id) FROM recent) - ?", (RECENT_LINES,))
+            if ident is not None:
+                db.execute("INSERT OR REPLACE INTO checkpoint (log, dev, inode, offset, head) VALUES (?, ?, ?, ?, ?)",
+                           (log, ident[0], ident[1], offset, head))
+            else:
+                # A rotated file: keep its head so a crash resumes inside it
+                db.execute("INSERT OR REPLACE INTO checkpoint (log, dev, inode, offset, head) VALUES (?, -1, -1, ?, ?)",
+                           (log, offset, head))
+
+    def recent(self):
+        return [row[0] for row in self.db.execute("SELECT line FROM recent ORDER BY id")]
+
+    def top_sources(self, limit=10):
+        return self.db.execute(
+            "SELECT source, failures, (SELECT count(*) FROM source_users u WHERE u.source = s.source), last "
+            "FROM by_source s ORDER BY failures DESC LIMIT ?", (limit,)).fetchall()
+
+    def top_users(self, limit=10):
+        return self.db.execute("SELECT user, failures, last FROM by_user ORDER BY failures DESC LIMIT ?",
+                               (limit,)).fetchall()
+
+    def hourly(self, hours=24):
+        since = f"{datetime.now() - timedelta(hours=hours):%Y-%m-%d %H}"
+        return self.db.execute("SELECT hour, failures FROM by_hour WHERE hour >= ? ORDER BY hour",
+                               (since,)).fetchall()
+
+    def suspects(self, min_failures=SUSPECT_FAILURES, since=None, limit=500):
+        # Sources with at least min_failures failures (last seen on or
+        # after `since`), worst first, as dicts
+        sql = ("SELECT source, failures, (SELECT count(*) FROM source_users u WHERE u.source = s.source), "
+               "first, last, accepted, last_accepted FROM by_source s WHERE failures >= ?")
+        params = [min_failures]
+        if since:
+            sql += " AND last >= ?"
+            params.append(since)
+        sql += " ORDER BY failures DESC LIMIT ?"
+        params.append(limit)
+        keys = ("source", "failures", "users", "first", "last", "accepted", "last_accepted")
+        rows = [dict(zip(keys, row)) for row in self.db.execute(sql, params)]
+        for row in rows:
+            # A login from a source after it had been failing
+            row["compromised"] = bool(row["accepted"] and row["last_accepted"] > row["first"])
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental auth log analyzer")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--log", default=AUTH_LOG)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    commands.add_parser("update", help="read what was logged since the last update")
+    commands.add_parser("recent", help="update, then print the last failed logins")
+    commands.add_parser("summary", help="update, then print totals by source, user and hour")
+    p = commands.add_parser("suspects", help="update, then list brute-force suspects")
+    p.add_argument("--min-failures", type=int, default=SUSPECT_FAILURES)
+    p.add_argument("--since", help="last seen on or after YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    store = AuthLogStore(args.store)
+    try:
+        found = store.update(args.log)
+        if args.command == "update":
+            print(f"{found} new failed logins")
+        elif args.command == "recent":
+            for line in store.recent():
+                print(line)
+        elif args.command == "summary":
+            print(f"{'SOURCE':<40} {'FAILURES':>8} {'USERS':>5}  LAST")
+            for source, failures, users, last in store.top_sources():
+                print(f"{source:<40} {failures:>8} {users:>5}  {last}")
+            print(f"\n{'USER':<32} {'FAILURES':>8}  LAST")
+            for user, failures, last in store.top_users():
+                print(f"{user:<32} {failures:>8}  {last}")
+            print()
+            for hour, failures in store.hourly():
+                print(f"{hour}:00  {failures}")
+        else:
+            for row in store.suspects(args.min_failures, args.since):
+                flag = "  LOGGED IN" if row["compromised"] else ""
+                print(f"{row['source']:<40} {row['failures']:>8} {row['users']:>5}  "
+                      f"{row['first']} .. {row['last']}{flag}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+# batch_ops.py - Mixed account operations from a CSV or JSONL file
+# Rows can lock, unlock, delete or modify accounts. All rows for the same
+# user are merged into one change, so each account gets at most one
+# usermod or userdel, and group memberships (explicit groups and roles)
+# are applied as each affected group's added and removed members, with
+# one gpasswd per group. The plan is printed before anything is applied.
+#
+# CSV columns (header required, any order, blanks ignored):
+#   action,username,reason,expire_days,keep_home,shell,home,move_home,groups,append_groups,role
+# JSONL: one object per line with the same keys.
+#
+# Usage: python3 gui/batch_ops.py -f ops.csv [-d] [--root DIR]
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from account_index import ALL_ROLE_GROUPS, ROLE_GROUPS, AccountIndex
+import journal
+from bulk_engine import PROGRESS_INTERVAL
+from journal import log_message
+from roster_validator import load_shells
+from shadow_tools import ToolError, add_groups, delete_user, modify_user, update_group_members
+
+ACTIONS = ("lock", "unlock", "delete", "modify")
+MODIFY_FIELDS = ("shell", "home", "groups", "append_groups", "role")
+TRUE_VALUES = ("y", "yes", "true", "1")
+
+
+def flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def split_groups(value):
+    if isinstance(value, list):
+        return [str(g).strip() for g in value if str(g).strip()]
+    return [g.strip() for g in str(value or "").split(",") if g.strip()]
+
+
+def read_operations(path):
+    # Yield (line, fields) with every value a stripped string (lists kept)
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        first = f.read(1)
+        f.seek(0)
+        if path.endswith((".jsonl", ".json")) or first == "{":
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    fields = json.loads(text)
+                except ValueError as e:
+                    yield line, {"_error": f"Invalid JSON: {e}"}
+                    continue
+                if not isinstance(fields, dict):
+                    yield line, {"_error": "Expected a JSON object"}
+                    continue
+                yield line, {k.strip().lower(): v if isinstance(v, (list, bool)) else str(v).strip()
+                             for k, v in fields.items() if v is not None}
+            return
+        reader = csv.DictReader(f)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for fields in reader:
+            if not "".join(v for v in fields.values() if isinstance(v, str)).strip():
+                continue
+            yield reader.line_num, {k: v.strip() for k, v in fields.items()
+                                    if k and isinstance(v, str) and v.strip()}
+
+
+class UserChange:
+    # Everything the batch does to one account, merged in file order
+    def __init__(self, name):
+        self.name = name
+        self.lines = []
+        self.delete = False
+        self.remove_home = False
+        self.lock = None
+        self.reason = ""
+        self.expire = None
+        self.shell = None
+        self.home = None
+        self.move_home = False
+        self.groups = None
+        self.append_groups = []
+        self.role = None
+
+    def usermod_options(self):
+        options = []
+        if self.lock is True:
+            options.append("-L")
+        elif self.lock is False:
+            options.append("-U")
+        if self.expire is not None:
+            options.extend(["-e", self.expire])
+        if self.shell:
+            options.extend(["-s", self.shell])
+        if self.home:
+            options.extend(["-d", self.home])
+            if self.move_home:
+                options.append("-m")
+        return options
+
+    def describe(self):
+        if self.delete:
+            return "delete (remove home)" if self.remove_home else "delete (keep home)"
+        parts = []
+        if self.lock is True:
+            text = "lock"
+            if self.expire:
+                text += f" until {self.expire}"
+            if self.reason:
+                text += f" (reason: {self.reason})"
+            parts.append(text)
+        elif self.lock is False:
+            parts.append("unlock")
+        if self.shell:
+            parts.append(f"shell {self.shell}")
+        if self.home:
+            parts.append(f"home {self.home}" + (" (move contents)" if self.move_home else ""))
+        if self.groups is not None:
+            parts.append(f"groups = {','.join(self.groups) or '(none)'}")
+        if self.append_groups:
+            parts.append(f"groups += {','.join(self.append_groups)}")
+        if self.role:
+            parts.append(f"role {self.role}")
+        return "; ".join(parts)
+
+
+class BatchPlan:
+    def __init__(self, accounts, shells=None):
+        self.accounts = accounts
+        self.shells = shells
+        self.changes = {}
+        self.errors = []
+        self.rows = 0
+
+    def add(self, line, fields):
+        # Merge one row into its user's change; invalid rows are recorded
+        self.rows += 1
+        error = self.check(fields)
+        if error:
+            self.errors.append((line, fields.get("username", ""), error))
+            return
+        name = fields["username"]
+        change = self.changes.get(name)
+        if change is None:
+            change = self.changes[name] = UserChange(name)
+        change.lines.append(line)
+        action = fields["action"].lower()
+
+        if action == "delete":
+            change.delete = True
+            change.remove_home = not flag(fields.get("keep_home"))
+        elif action == "lock":
+            change.lock = True
+            change.reason = fields.get("reason", "")
+            days = int(fields.get("expire_days") or 0)
+            change.expire = f"{date.today() + timedelta(days=days):%Y-%m-%d}" if days else None
+        elif action == "unlock":
+            change.lock = False
+            change.reason = ""
+            change.expire = ""
+        else:
+            if fields.get("shell"):
+                change.shell = fields["shell"]
+            if fields.get("home"):
+                change.home = fields["home"]
+                change.move_home = flag(fields.get("move_home"))
+            if fields.get("groups"):
+                groups = split_groups(fields["groups"])
+                if flag(fields.get("append_groups")):
+                    change.append_groups.extend(g for g in groups if g not in change.append_groups)
+                else:
+                    change.groups = groups
+                    change.append_groups = []
+            if fields.get("role"):
+                change.role = fields["role"]
+
+    def check(self, fields):
+        if "_error" in fields:
+            return fields["_error"]
+        action = fields.get("action", "").lower()
+        name = fields.get("username")
+        if action not in ACTIONS:
+            return f"Unknown action {action or '(blank)'}"
+        if not name:
+            return "Username is required"
+        if name not in self.accounts:
+            return f"User {name} does not exist"
+        if action == "lock":
+            try:
+                if int(fields.get("expire_days") or 0) < 0:
+                    raise ValueError
+            except ValueError:
+                return f"Invalid expire_days {fields.get('expire_days')}"
+        if action == "modify":
+            if not any(fields.get(key) for key in MODIFY_FIELDS):
+                return f"No modifications specified for {name}"
+            shell = fields.get("shell")
+            if shell and self.shells is not None and shell not in self.shells:
+                return f"Shell {shell} is not listed in /etc/shells"
+            home = fields.get("home")
+            if home and not home.startswith("/"):
+                return f"Home directory {home} must be an absolute path"
+            missing = [g for g in split_groups(fields.get("groups")) if not self.accounts.has_group(g)]
+            if missing:
+                return f"Unknown groups {','.join(missing)}"
+            role = fields.get("role")
+            if role and role not in ROLE_GROUPS:
+                return f"Unknown role {role}"
+        return None
+
+    def deletes(self):
+        return [c for c in self.changes.values() if c.delete]
+
+    def updates(self):
+        return [c for c in self.changes.values() if not c.delete and c.usermod_options()]
+
+    def group_changes(self):
+        # {group: ([users joining], [users leaving])}
+        # Explicit groups and roles become per-group additions and removals,
+        # so each group is rewritten once however many users it gains or
+        # loses. Deleted users are left to userdel.
+        wanted = {}
+        for change in self.changes.values():
+            if change.delete or (change.groups is None and not change.append_groups and not change.role):
+                continue
+            account = self.accounts.get(change.name)
+            groups = set(account.groups[1:])
+            if change.groups is not None:
+                groups = set(change.groups)
+            groups.update(change.append_groups)
+            if change.role:
+                groups.difference_update(ALL_ROLE_GROUPS)
+                groups.update(ROLE_GROUPS[change.role])
+            groups.discard(account.groups[0])
+            wanted[change.name] = (set(account.groups[1:]), groups)
+
+        result = {}
+        for name, (before, after) in wanted.items():
+            for group in before ^ after:
+                joining, leaving = result.setdefault(group, ([], []))
+                (joining if group in after else leaving).append(name)
+        return dict(sorted(result.items()))
+
+    def lines(self):
+        deletes = self.deletes()
+        updates = self.updates()
+        groups = self.group_changes()
+        yield f"Rows read: {self.rows}"
+        yield f"Users affected: {len(self.changes)}"
+        yield f"Rows with errors: {len(self.errors)}"
+        if self.errors:
+            yield ""
+            yield "Rows that will be skipped:"
+            for line, name, error in self.errors:
+                yield f"  line {line}: {error}"
+        if self.changes:
+            yield ""
+            yield "Changes per user:"
+            for change in self.changes.values():
+                lines = ",".join(str(n) for n in change.lines)
+                yield f"  {change.name}: {change.describe()}  [lines {lines}]"
+        yield ""
+        yield "Passes over the account databases:"
+        yield f"  userdel: {len(deletes)} accounts"
+        yield f"  usermod: {len(updates)} accounts (one call each)"
+        new_groups = [g for g in groups if not self.accounts.has_group(g)]
+        if new_groups:
+            yield f"  groupadd: {', '.join(new_groups)}"
+        yield f"  group members: {len(groups)} groups" + (f" ({', '.join(groups)})" if groups else "")
+
+
+def build_plan(path, root=None):
+    plan = BatchPlan(AccountIndex.load(root), load_shells(root))
+    for line, fields in read_operations(path):
+        plan.add(line, fields)
+    return plan
+
+
+def apply(plan, root=None, on_progress=None, cancelled=None):
+    # Deletes first, then one usermod per account, then the group rewrites.
+    # Returns {username: error message} for the accounts that failed; once
+    # `cancelled()` turns true the remaining accounts are left untouched.
+    failures = {}
+    total = len(plan.changes)
+    done = 0
+    last_progress = 0
+
+    def progress(force=False):
+        nonlocal last_progress
+        now = time.monotonic()
+        if on_progress and (force or now - last_progress >= PROGRESS_INTERVAL):
+            last_progress = now
+            counts = {"SUCCESS": done - len(failures), "SKIPPED": len(plan.errors), "FAILED": len(failures)}
+            on_progress(done, total, counts)
+
+    def stopped():
+        return cancelled is not None and cancelled()
+
+    groups = plan.group_changes()
+    for change in plan.deletes():
+        if stopped():
+            failures[change.name] = "Cancelled"
+            continue
+        try:
+            with journal.operation("batch_delete", change.name, sync=False,
+                                   remove_home=change.remove_home) as entry:
+                delete_user(change.name, change.remove_home, root=root)
+                entry["message"] = (f"Deleted user {change.name} "
+                                    f"({'including' if change.remove_home else 'keeping'} home directory)")
+        except ToolError as e:
+            failures[change.name] = str(e)
+        done += 1
+        progress()
+
+    for change in plan.updates():
+        if stopped():
+            failures[change.name] = "Cancelled"
+            continue
+        try:
+            with journal.operation("batch_modify", change.name, sync=False) as entry:
+                modify_user(change.name, change.usermod_options(), root=root)
+                entry["message"] = f"Modified user {change.name}: {change.describe()}"
+                if change.lock:
+                    entry.update(locked=True, expire=change.expire, reason=change.reason)
+        except ToolError as e:
+            failures[change.name] = str(e)
+        done += 1
+        progress()
+
+    try:
+        if stopped():
+            raise ToolError("Cancelled")
+        add_groups([g for g in groups if not plan.accounts.has_group(g)], root=root)
+    except ToolError as e:
+        for group, (joining, leaving) in groups.items():
+            for name in joining + leaving:
+                failures.setdefault(name, str(e))
+        groups = {}
+    for group, (joining, leaving) in groups.items():
+        try:
+            with journal.operation("batch_group", group, sync=False, users=len(joining) + len(leaving)) as entry:
+                update_group_members({group: (joining, leaving)}, root=root)
+                entry["message"] = f"Group {group}: {len(joining)} added, {len(leaving)} removed"
+        except (ToolError, OSError) as e:
+            for name in joining + leaving:
+                failures.setdefault(name, str(e))
+
+    # One fdatasync for the whole batch rather than one per account
+    journal.flush()
+    done = total
+    progress(force=True)
+    return failures
+
+
+def run(path, dry_run=False, root=None, out=print, on_progress=None, cancelled=None):
+    # Same contract as bulk_engine.run: report lines go to `out`,
+    # returns (accounts changed, rows skipped or failed)
+    out("BATCH PLAN - No changes will be made" if dry_run else "BATCH MODE - Changes will be applied")
+    out("----------------------------------------")
+    out(f"Reading operations from: {path}")
+    out("----------------------------------------")
+    log_message(f"Starting batch {'plan' if dry_run else 'operations'} from {path}")
+
+    plan = build_plan(path, root=root)
+    for line in plan.lines():
+        out(line)
+    out("----------------------------------------")
+    if dry_run:
+        if on_progress:
+            on_progress(plan.rows, plan.rows, {"SUCCESS": len(plan.changes), "SKIPPED": len(plan.errors),
+                                               "FAILED": 0})
+        log_message(f"Batch plan completed: {len(plan.changes)} users affected, {len(plan.errors)} rows skipped")
+        return len(plan.changes), len(plan.errors)
+
+    failures = apply(plan, root=root, on_progress=on_progress, cancelled=cancelled)
+    for line, name, error in plan.errors:
+        out(f"Processing line {line}: {name or '-'}")
+        out(f"  - SKIPPED: {error}")
+    for change in plan.changes.values():
+        out(f"Processing user: {change.name}")
+        if change.name in failures:
+            out(f"  - FAILED: {failures[change.name]}")
+        else:
+            out(f"  - SUCCESS: {change.describe()}")
+
+    success = len(plan.changes) - len(failures)
+    failed = len(plan.errors) + len(failures)
+    out("----------------------------------------")
+    out("SUMMARY:")
+    out(f"  Users changed: {success}")
+    out(f"  Skipped rows: {len(plan.errors)}")
+    out(f"  Failed users: {len(failures)}")
+    out("----------------------------------------")
+    log_message(f"Batch operations completed: {success} users changed, {failed} failed")
+    return success, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lock, unlock, delete or modify accounts in bulk")
+    parser.add_argument("-f", "--file", required=True, help="CSV or JSONL file of operations")
+    parser.add_argument("-d", "--dry-run", action="store_true", help="print the plan only, make no changes")
+    parser.add_argument("--root", help="operate on the account databases under this directory")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.file):
+        print(f"Error: operations file {args.file} does not exist")
+        return 1
+    success, failed = run(args.file, dry_run=args.dry_run, root=args.root)
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# bulk_checkpoint.py - Checkpoint journal for resumable bulk imports
+# One append-only text file per input file (named after its SHA-256):
+#
+#   H {"path": ..., "sha256": ..., "size": ..., "uids": [...]}   header
+#   B <start> <end>                                 chunk about to be committed
+#   A <offset> <line> <username>                    row the chunk will create
+#   R <offset> <line> <status> <username>           outcome of one row
+#   E <offset> <line>                               chunk fully committed
+#   D                                               import finished
+#
+# Offsets are byte positions just past a row, so a resumed import seeks
+# straight to the last E record instead of re-checking finished rows. The
+# header lists the UIDs in use when the import started, so no account that
+# existed before it is ever taken for one it created.
+
+import hashlib
+import json
+import os
+
+from journal import JOURNAL_DIR
+
+CHECKPOINT_DIR = os.path.join(JOURNAL_DIR, "bulk_checkpoints")
+TAIL_BYTES = 256 * 1024
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class ResumePoint:
+    def __init__(self, offset=0, line=1, pending=None, finished=False):
+        # `pending` is the (start, end) byte range of a chunk that was being
+        # committed when the import stopped. `attempted` maps the usernames
+        # that chunk was creating to their row offsets: those accounts may
+        # already exist. `known_uids` were in use before the import started.
+        self.offset = offset
+        self.line = line
+        self.pending = pending
+        self.finished = finished
+        self.attempted = {}
+        self.known_uids = set()
+
+    def created_by_import(self, row, account):
+        # An existing account the interrupted chunk created, not one that
+        # was already there (those rows were SKIPPED and never attempted)
+        return (account is not None and self.attempted.get(row.username) == row.offset
+                and account.uid not in self.known_uids)
+
+
+class Checkpoint:
+    def __init__(self, input_path, directory=CHECKPOINT_DIR):
+        self.input_path = os.path.abspath(input_path)
+        self.digest = file_digest(input_path)
+        self.size = os.path.getsize(input_path)
+        self.path = os.path.join(directory, f"{self.digest[:32]}.journal")
+        self.directory = directory
+        self.file = None
+
+    def resume_point(self):
+        # Where a resumed run should start, read from the journal's tail
+        if not os.path.exists(self.path):
+            return ResumePoint()
+        with open(self.path, "rb") as f:
+            header = f.readline().decode()
+            if not header.startswith("H "):
+                raise CheckpointError(f"Checkpoint {self.path} is damaged")
+            header = json.loads(header[2:])
+            if header.get("sha256") != self.digest:
+                raise CheckpointError("The CSV file changed since the checkpoint was written")
+            header_size = f.tell()
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            start = max(header_size, end - TAIL_BYTES)
+            f.seek(start)
+            tail = f.read().decode(errors="replace").splitlines()
+            if start > header_size:
+                tail = tail[1:]
+
+        point = None
+        pending = None
+        attempted = {}
+        for record in reversed(tail):
+            fields = record.split()
+            if not fields:
+                continue
+            if fields[0] == "D":
+                return ResumePoint(finished=True)
+            if fields[0] == "A" and pending is None and len(fields) == 4:
+                attempted[fields[3]] = int(fields[1])
+            elif fields[0] == "B" and pending is None:
+                pending = (int(fields[1]), int(fields[2]))
+            elif fields[0] == "E":
+                point = ResumePoint(int(fields[1]), int(fields[2]))
+                break
+        if point is None:
+            if start > header_size:
+                # The tail window held no committed chunk; scan everything
+                return self.scan_resume_point(header)
+            point = ResumePoint()
+        if pending is not None and pending[0] >= point.offset:
+            point.pending = pending
+            point.attempted = attempted
+            point.known_uids = set(header.get("uids", ()))
+        return point
+
+    def scan_resume_point(self, header):
+        point = ResumePoint()
+        pending = None
+        attempted = {}
+        with open(self.path, "r", errors="replace") as f:
+            f.readline()
+            for record in f:
+                fields = record.split()
+                if not fields:
+                    continue
+                if fields[0] == "B":
+                    pending = (int(fields[1]), int(fields[2]))
+                    attempted = {}
+                elif fields[0] == "A" and len(fields) == 4:
+                    attempted[fields[3]] = int(fields[1])
+                elif fields[0] == "E":
+                    point = ResumePoint(int(fields[1]), int(fields[2]))
+                    pending = None
+                elif fields[0] == "D":
+                    return ResumePoint(finished=True)
+        if pending is not None:
+            point.pending = pending
+            point.attempted = attempted
+            point.known_uids = set(header.get("uids", ()))
+        return point
+
+    def start(self, resume, uids=()):
+        # `uids`: the UIDs in use before anything is imported
+        os.makedirs(self.directory, exist_ok=True)
+        if resume and os.path.exists(self.path):
+            self.file = open(self.path, "a")
+            return
+        self.file = open(self.path, "w")
+        header = {"path": self.input_path, "sha256": self.digest, "size": self.size, "uids": sorted(uids)}
+        self.file.write(f"H {json.dumps(header)}\n")
+        self.sync()
+
+    def begin_chunk(self, start, end, rows=()):
+        # `rows` are the ones the chunk will create or finish
+        self.file.write(f"B {start} {end}\n")
+        self.file.writelines(f"A {row.offset} {row.line} {row.username}\n" for row in rows)
+        self.sync()
+
+    def record(self, row, status):
+        self.file.write(f"R {row.offset} {row.line} {status} {row.username or '-'}\n")
+
+    def end_chunk(self, offset, line):
+        self.file.write(f"E {offset} {line}\n")
+        self.sync()
+
+    def finish(self):
+        self.file.write("D\n")
+        self.close()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
@@ -0,0 +1,306 @@
+# bulk_engine.py - Bulk user provisioning from a CSV file
+# Validates the whole file up front, then creates the accounts in chunks:
+# one newusers run per chunk, one gpasswd per role group and home skeletons
+# copied in-process, instead of ~10 processes per CSV row. Each committed
+# chunk is recorded in a checkpoint journal so an interrupted import can be
+# resumed where it stopped.
+#
+# Usage: python3 gui/bulk_engine.py -f users.csv [-d] [--resume] [--root DIR]
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from collections import namedtuple
+
+import journal
+from account_index import AccountIndex
+from bulk_checkpoint import Checkpoint, CheckpointError, ResumePoint
+from journal import log_message
+from roster_validator import RosterValidator, load_shells, read_rows, validate_file
+from shadow_tools import (ROLE_GROUP, ToolError, add_groups, change_passwords, login_defs, new_users,
+                          update_group_members)
+
+CHUNK_SIZE = 1000
+
+# Minimum seconds between progress callbacks
+PROGRESS_INTERVAL = 0.1
+
+RowResult = namedtuple("RowResult", ["line", "username", "status", "message"])
+
+
+def setup_home(path, skel, uid, gid):
+    # What useradd -m does, without a process per user
+    if os.path.isdir(skel):
+        shutil.copytree(skel, path, symlinks=True, dirs_exist_ok=True)
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in dirnames + filenames:
+                os.lchown(os.path.join(dirpath, name), uid, gid)
+    os.makedirs(path, exist_ok=True)
+    os.chown(path, uid, gid)
+    os.chmod(path, 0o750)
+
+
+def commit(rows, root=None, on_done=None, finishing=()):
+    # `finishing` names accounts an interrupted run already created; they
+    # skip newusers but still get their password, groups and home set up.
+    # Once newusers has created the accounts every row is finished:
+    # on_done(row, problem) gets what failed after that, or None.
+    if not rows:
+        return
+    prefix = root or "/"
+
+    # newusers checks every line first and writes passwd/shadow/group once.
+    # It hands the passwords to PAM afterwards, which can't run inside a
+    # --root tree, so there the passwords go through one chpasswd batch.
+    entries = [(r.username, r.password, r.fullname, f"/home/{r.username}", r.shell)
+               for r in rows if r.username not in finishing]
+    result = None
+    if entries:
+        result = new_users(entries, root=root, check=root is None)
+    accounts = AccountIndex.load(root)
+    missing = [r.username for r in rows if r.username not in accounts]
+    if missing:
+        raise ToolError(f"newusers: {(result.stderr or result.stdout).strip()}")
+
+    problems = {}
+
+    def note(names, problem):
+        for name in names:
+            problems.setdefault(name, problem)
+
+    try:
+        if root:
+            method = login_defs("ENCRYPT_METHOD", "SHA512", root=root)
+            change_passwords([(r.username, r.password) for r in rows], root=root, crypt_method=method)
+        elif finishing:
+            change_passwords([(r.username, r.password) for r in rows if r.username in finishing])
+    except (ToolError, OSError) as e:
+        note([r.username for r in rows], f"password not set: {e}")
+
+    # Role groups: only the new members are added, one gpasswd per group
+    by_group = {}
+    members = {}
+    for r in rows:
+        group = ROLE_GROUP.get(r.role)
+        if group not in members:
+            members[group] = set(accounts.group_members(group))
+        if group and r.username not in members[group]:
+            by_group.setdefault(group, []).append(r.username)
+    try:
+        add_groups([g for g in by_group if not accounts.has_group(g)], root=root)
+        update_group_members({group: (names, ()) for group, names in by_group.items()}, root=root)
+    except (ToolError, OSError) as e:
+        for names in by_group.values():
+            note(names, f"not added to its role group: {e}")
+
+    skel = os.path.join(prefix, "etc", "skel")
+    for r in rows:
+        account = accounts.get(r.username)
+        try:
+            setup_home(os.path.join(prefix, account.home.lstrip("/")), skel, account.uid, account.gid)
+        except OSError as e:
+            note([r.username], f"home directory not set up: {e}")
+        if on_done:
+            on_done(r, problems.get(r.username))
+
+
+def count_rows(path, offset=0):
+    # Data rows from `offset` on (one binary pass), used for progress and ETA
+    count = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        count += 1
+    return count if offset else max(0, count - 1)
+
+
+def dry_run_report(path, root=None, out=print, on_progress=None):
+    # Validation only: a report grouped by error type instead of per-row lines
+    log_message(f"Starting dry run for bulk user addition from {path}")
+    out("DRY RUN MODE - No changes will be made")
+    out("----------------------------------------")
+    out(f"Validating CSV file: {path}")
+    out("----------------------------------------")
+
+    total = count_rows(path)
+    progress = None
+    if on_progress:
+        progress = lambda checked: on_progress(checked, total, {"SUCCESS": 0, "SKIPPED": 0, "FAILED": 0})
+    report = validate_file(path, AccountIndex.load(root), root=root, on_progress=progress)
+    if on_progress:
+        on_progress(report.rows, report.rows, {"SUCCESS": report.valid, "SKIPPED": report.invalid, "FAILED": 0})
+
+    for line in report.lines():
+        out(line)
+    out("----------------------------------------")
+    log_message(f"Dry run completed: {report.valid} would be created, {report.invalid} would fail")
+    return report.valid, report.invalid
+
+
+def run(path, dry_run=False, root=None, out=print, on_progress=None, resume=False, cancelled=None):
+    # `out` receives report lines; `on_progress(done, total, counts)` is
+    # called at most every PROGRESS_INTERVAL seconds with the rows handled
+    # so far and the SUCCESS/SKIPPED/FAILED counters. When `cancelled()`
+    # turns true the import stops at the next chunk boundary and can be
+    # resumed later.
+    if dry_run:
+        return dry_run_report(path, root=root, out=out, on_progress=on_progress)
+
+    out("LIVE MODE - Users will be created")
+    log_message(f"Starting bulk user addition from {path}")
+    out("----------------------------------------")
+    out(f"Processing CSV file: {path}")
+    out("----------------------------------------")
+
+    checkpoint = Checkpoint(path)
+    point = ResumePoint()
+    if resume:
+        point = checkpoint.resume_point()
+        if point.finished:
+            out("This file has already been imported completely")
+            return 0, 0
+        if point.offset:
+            out(f"Resuming after line {point.line}")
+            log_message(f"Resuming bulk user addition from {path} after line {point.line}")
+    accounts = AccountIndex.load(root)
+    checkpoint.start(resume, accounts.uids)
+
+    total = count_rows(path, point.offset)
+    counts = {"SUCCESS": 0, "SKIPPED": 0, "FAILED": 0}
+    # Created, but a later step (password, group, home) failed; counted
+    # with SUCCESS since the account exists and a rerun would skip it
+    partial = 0
+    last_progress = 0
+
+    def report(result):
+        nonlocal last_progress, partial
+        if result.status == "PARTIAL":
+            partial += 1
+        counts["SUCCESS" if result.status == "PARTIAL" else result.status] += 1
+        journal.record("bulk_add", result.username, result.status.lower(), result.message,
+                       file=path, line=result.line)
+        out(f"Processing user: {result.username}")
+        out(f"  - {result.status}: {result.message}")
+        now = time.monotonic()
+        if on_progress and now - last_progress >= PROGRESS_INTERVAL:
+            last_progress = now
+            on_progress(sum(counts.values()), total, dict(counts))
+
+    # Pass 1: validate everything before touching the account databases.
+    # Only the line numbers of rejected rows are kept.
+    validator = RosterValidator(accounts, load_shells(root))
+    rejected = set()
+    finishing = set()
+    stopped = False
+    for row in read_rows(path, point.offset, point.line, track_offsets=bool(point.attempted)):
+        if cancelled and cancelled():
+            stopped = True
+            break
+        error = validator.check(row)
+        if (error and error[0] == "already_exists"
+                and point.created_by_import(row, accounts.get(row.username))):
+            # Created by the chunk that was interrupted; finish it instead
+            error = None
+            finishing.add(row.username)
+            validator.seen[row.username] = row.line
+        if error:
+            rejected.add(row.line)
+            report(RowResult(row.line, row.username, "SKIPPED", error[1]))
+    validator = None
+
+    # Pass 2: commit the valid rows chunk by chunk
+    chunk = []
+    chunk_start = point.offset
+    last = None
+
+    def flush():
+        nonlocal chunk, chunk_start
+
+        def done(r, problem=None):
+            message = f"User {r.username} created with role {r.role}"
+            if problem:
+                checkpoint.record(r, "PARTIAL")
+                report(RowResult(r.line, r.username, "PARTIAL", f"{message}, but {problem}"))
+            else:
+                checkpoint.record(r, "SUCCESS")
+                report(RowResult(r.line, r.username, "SUCCESS", message))
+
+        if chunk:
+            checkpoint.begin_chunk(chunk_start, last.offset, chunk)
+            finished = counts["SUCCESS"]
+            try:
+                commit(chunk, root=root, on_done=done, finishing=finishing)
+            except (ToolError, OSError) as e:
+                for r in chunk[counts["SUCCESS"] - finished:]:
+                    checkpoint.record(r, "FAILED")
+                    report(RowResult(r.line, r.username, "FAILED", str(e)))
+        if last is not None:
+            checkpoint.end_chunk(last.offset, last.line)
+            chunk_start = last.offset
+        chunk = []
+
+    rows = read_rows(path, point.offset, point.line) if not stopped else ()
+    for row in rows:
+        last = row
+        if row.line in rejected:
+            checkpoint.record(row, "SKIPPED")
+            continue
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            flush()
+            if cancelled and cancelled():
+                stopped = True
+                break
+    if stopped:
+        checkpoint.close()
+        out("Import cancelled; resume it to add the remaining users")
+        log_message(f"Bulk user addition from {path} cancelled")
+    else:
+        flush()
+        checkpoint.finish()
+    if on_progress:
+        on_progress(sum(counts.values()), total, dict(counts))
+
+    success = counts["SUCCESS"]
+    failed = counts["SKIPPED"] + counts["FAILED"]
+    out("----------------------------------------")
+    out("SUMMARY:")
+    out(f"  Total processed: {success + failed}")
+    out(f"  Successful: {success}")
+    if partial:
+        out(f"  Created with errors: {partial}")
+    out(f"  Skipped: {counts['SKIPPED']}")
+    out(f"  Failed: {counts['FAILED']}")
+    out("----------------------------------------")
+
+    log_message(f"Bulk add completed: {success} users created, {failed} users failed")
+    return success, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add users in bulk from a CSV file")
+    parser.add_argument("-f", "--file", required=True, help="CSV file (username,fullname,password,shell,role)")
+    parser.add_argument("-d", "--dry-run", action="store_true", help="validate only, make no changes")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted import of this file")
+    parser.add_argument("--root", help="operate on the account databases under this directory")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.file):
+        print(f"Error: CSV file {args.file} does not exist")
+        return 1
+    try:
+        success, failed = run(args.file, dry_run=args.dry_run, root=args.root, resume=args.resume)
+    except CheckpointError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+# history_index.py - Indexed operation history ("what happened to user X")
+# Copies the records of the operation journal, and of the dated text logs
+# the scripts wrote before it, into a SQLite table indexed by target user,
+# operation, actor and time. Each update reads only what the files gained
+# since the last one; files are tracked by their first line, so a rotated
+# journal is finished under its new name and never read twice. Every
+# process's journal writer updates the index as it commits records, and
+# queries update it first as well, for what the shell scripts wrote.
+#
+# Usage: python3 gui/history_index.py update
+#        python3 gui/history_index.py rebuild
+
+import argparse
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from journal import JOURNAL_DIR, journal_files
+
+HISTORY_PATH = os.path.join(JOURNAL_DIR, "history.db")
+PAGE_SIZE = 200
+
+# Records copied per transaction while catching up on a big backlog
+COMMIT_LINES = 50000
+
+# Seconds between the updates the journal writer makes; what a busy writer
+# skips is picked up by its next update or the next query
+FOLLOW_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    head BLOB PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    inode INTEGER
+);
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    op TEXT NOT NULL,
+    target TEXT,
+    actor TEXT,
+    result TEXT,
+    duration_ms REAL,
+    message TEXT NOT NULL DEFAULT '',
+    source TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS operations_time ON operations (time, id);
+CREATE INDEX IF NOT EXISTS operations_target ON operations (target, time, id);
+CREATE INDEX IF NOT EXISTS operations_op ON operations (op, time, id);
+CREATE INDEX IF NOT EXISTS operations_actor ON operations (actor, time, id);
+"""
+
+# Record fields with their own column; the rest are kept as JSON in extra
+KNOWN_FIELDS = {"time", "op", "target", "actor", "result", "duration_ms", "message", "source", "pid"}
+
+# The pre-journal logs: "2026-10-18 15:06:08 - message"
+LEGACY_RE = re.compile(r"^user_management_\d{8}\.log$|^audit_\d{8}\.log$")
+LEGACY_LINE_RE = re.compile(r"^(\d{4}-\d\d-\d\d) (\d\d:\d\d:\d\d) - (.*)$")
+
+# What the old messages said, as (pattern, op, result); an error names the
+# operation in its "verb" group
+LEGACY_MESSAGES = [
+    (re.compile(r"^User (?P<user>\S+) successfully created"), "add_user", "ok"),
+    (re.compile(r"^SUCCESS: User (?P<user>\S+) created"), "bulk_add", "ok"),
+    (re.compile(r"^SKIPPED: User (?P<user>\S+) already exists"), "bulk_add", "skipped"),
+    (re.compile(r"^FAILED: Could not (?:create|set password for) user (?P<user>\S+)"), "bulk_add", "failed"),
+    (re.compile(r"^Deleted user (?P<user>\S+)"), "delete_user", "ok"),
+    (re.compile(r"^User (?P<user>\S+) unlocked"), "unlock_user", "ok"),
+    (re.compile(r"^User (?P<user>\S+) locked"), "lock_user", "ok"),
+    (re.compile(r"^User (?P<user>\S+) successfully modified"), "modify_user", "ok"),
+    (re.compile(r"^Modified user (?P<user>[^\s:]+):"), "modify_user", "ok"),
+    (re.compile(r"^Changed role for user (?P<user>\S+)"), "modify_user", "ok"),
+    (re.compile(r"^Error: Failed to (?P<verb>delete|lock|unlock|modify|create) user (?P<user>\S+)"),
+     None, "failed"),
+    (re.compile(r"^SUCCESS: Report \S+ sent to (?P<user>\S+)"), "send_report", "ok"),
+]
+VERB_OPS = {"create": "add_user"}
+
+update_lock = threading.Lock()
+
+
+def read_head(path):
+    # The first line identifies a file across renames; None until it has one
+    try:
+        with open(path, "rb") as f:
+            line = f.readline()
+    except OSError:
+        return None
+    return line if line.endswith(b"\n") else None
+
+
+def legacy_files(directory=JOURNAL_DIR):
+    try:
+        names = sorted(n for n in os.listdir(directory) if LEGACY_RE.match(n))
+    except OSError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+
+def parse_record(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    get = record.get
+    if not get("time") or not get("op"):
+        return None
+    extra = None
+    if record.keys() - KNOWN_FIELDS:
+        extra = json.dumps({key: value for key, value in record.items() if key not in KNOWN_FIELDS})
+    return (get("time"), get("op"), get("target"), get("actor"), get("result"), get("duration_ms"),
+            get("message") or "", get("source"), extra)
+
+
+def parse_legacy(line, channel):
+    m = LEGACY_LINE_RE.match(line.decode("utf-8", errors="replace").rstrip("\n"))
+    if m is None:
+        return None
+    day, clock, message = m.groups()
+    op, target, result = "log", None, "ok"
+    for pattern, name, outcome in LEGACY_MESSAGES:
+        found = pattern.match(message)
+        if found:
+            target = found.group("user")
+            op = name or VERB_OPS.get(found.group("verb"), found.group("verb") + "_user")
+            result = outcome
+            break
+    return (f"{day}T{clock}", op, target, None, result, None, message, "legacy",
+            json.dumps({"channel": channel}))
+
+
+class HistoryIndex:
+    def __init__(self, path=HISTORY_PATH, directory=JOURNAL_DIR):
+        self.path = path
+        self.directory = directory
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # The logs are the durable copy; a lost last commit is just re-read
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # Keeping up with the logs
+    def update(self):
+        # Copy whatever the journal and legacy logs gained; returns the
+        # number of records added
+        with update_lock, open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            offsets = {}
+            finished = set()
+            for head, offset, inode in self.db.execute("SELECT head, offset, inode FROM files"):
+                offsets[head] = offset
+                finished.add((inode, offset))
+            added = 0
+            rows, files = [], {}
+            for path in legacy_files(self.directory) + journal_files(self.directory):
+                # Most files are old and fully read; skip them without opening
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if (st.st_ino, st.st_size) in finished:
+                    continue
+                head = read_head(path)
+                if head is None:
+                    continue
+                for offset, batch in self.read(path, offsets.get(head, 0)):
+                    rows += batch
+                    files[head] = (offset, st.st_ino)
+                    if len(rows) >= COMMIT_LINES:
+                        added += self.commit(files, rows)
+                        rows, files = [], {}
+            return added + self.commit(files, rows)
+
+    def read(self, path, offset):
+        # (offset, rows) for what the file gained, a batch at a time
+        name = os.path.basename(path)
+        legacy = LEGACY_RE.match(name) is not None
+        channel = name.rsplit("_", 1)[0] if legacy else None
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size <= offset:
+                return
+            f.seek(offset)
+            rows = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Half-written last line: read it whole next time
+                    break
+                offset += len(line)
+                row = parse_legacy(line, channel) if legacy else parse_record(line)
+                if row is not None:
+                    rows.append(row)
+                    if len(rows) >= COMMIT_LINES:
+                        yield offset, rows
+                        rows = []
+            yield offset, rows
+
+    def commit(self, files, rows):
+        # Records and the files' offsets in one transaction, so an update
+        # that dies halfway neither loses nor repeats records
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO operations (time, op, target, actor, result, duration_ms, message, source, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany("INSERT OR REPLACE INTO files (head, offset, inode) VALUES (?, ?, ?)",
+                                ((head, offset, inode) for head, (offset, inode) in files.items()))
+        return len(rows)
+
+    def rebuild(self):
+        with update_lock, open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with self.db:
+                self.db.execute("DELETE FROM operations")
+                self.db.execute("DELETE FROM files")
+        return self.update()
+
+    # Queries
+    def where(self, target=None, op=None, actor=None, date_from=None, date_to=None):
+        clauses, params = [], []
+        for column, value in (("target", target), ("op", op), ("actor", actor)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if date_from:
+            clauses.append("time >= ?")
+            params.append(date_from)
+        if date_to:
+            # A bare date includes the whole day
+            clauses.append("time < ?")
+            params.append(date_to + ("T99" if len(date_to) == 10 else ""))
+        return clauses, params
+
+    def count(self, **filters):
+        clauses, params = self.where(**filters)
+        sql = "SELECT COUNT(*) FROM operations" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        return self.db.execute(sql, params).fetchone()[0]
+
+    def page(self, after=None, limit=PAGE_SIZE, **filters):
+        # Newest first, one page of dicts at a time. `after` is the last row
+        # of the previous page (keyset paging).
+        clauses, params = self.where(**filters)
+        if after is not None:
+            clauses.append("(time, id) < (?, ?)")
+            params.extend([after["time"], after["id"]])
+        sql = ("SELECT * FROM operations" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+               + " ORDER BY time DESC, id DESC LIMIT ?")
+        params.append(limit)
+        return [self.record(row) for row in self.db.execute(sql, params)]
+
+    def record(self, row):
+        record = dict(row)
+        extra = record.pop("extra")
+        if extra:
+            record.update((key, value) for key, value in json.loads(extra).items() if key not in record)
+        return record
+
+    def operations(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT op FROM operations ORDER BY op")]
+
+
+def follower(directory=JOURNAL_DIR):
+    # A journal on_commit hook: update() after a group commit, at most every
+    # FOLLOW_INTERVAL, on a connection of the writer thread's own. If the
+    # index can't be written (a GUI without access to the logs) it says so
+    # once and stops trying.
+    index = None
+    failed = False
+    last = None
+
+    def follow():
+        nonlocal index, failed, last
+        now = time.monotonic()
+        if failed or (last is not None and now - last < FOLLOW_INTERVAL):
+            return
+        last = now
+        try:
+            if index is None:
+                index = HistoryIndex(os.path.join(directory, "history.db"), directory)
+            index.update()
+        except (OSError, sqlite3.Error) as e:
+            sys.stderr.write(f"history_index: cannot update the index: {e}\n")
+            failed = True
+    return follow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index of the operation journal")
+    parser.add_argument("--index", default=HISTORY_PATH)
+    parser.add_argument("--logs", default=JOURNAL_DIR)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    commands.add_parser("update", help="index what the logs gained since the last update")
+    commands.add_parser("rebuild", help="index every log from scratch")
+    args = parser.parse_args(argv)
+
+    index = HistoryIndex(args.index, args.logs)
+    try:
+        added = index.rebuild() if args.command == "rebuild" else index.update()
+        print(f"Indexed {added} records")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+# journal.py - Structured operation journal shared by every entry point
+# One JSON object per line in <repo>/logs/journal.jsonl (or
+# $USERCTRL_LOG_DIR/journal.jsonl), whatever the current directory:
+#
+#   {"time": "2026-10-18T14:03:11.204", "source": "userctrld", "actor": "alice",
+#    "pid": 4121, "op": "lock_user", "target": "jdoe", "result": "ok",
+#    "duration_ms": 38.2, "message": "User jdoe locked successfully", ...}
+#
+# Records are queued and written by one background thread per process, so
+# a caller never waits on the disk. Whatever queued up while the previous
+# batch was being synced goes out in the next single write + fdatasync
+# (group commit); callers that need their record on disk before going on
+# pass sync=True. The file is rotated when it passes MAX_BYTES or a day
+# boundary, under an flock so the GUI, helper and scripts agree.
+#
+# Usage: python3 gui/journal.py tail [-n N] [--follow]
+
+import argparse
+import atexit
+import contextlib
+import fcntl
+import json
+import os
+import pwd
+import sys
+import threading
+import time
+from datetime import datetime
+
+JOURNAL_DIR = os.environ.get("USERCTRL_LOG_DIR") or os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "logs"))
+JOURNAL_NAME = "journal.jsonl"
+
+# Rotate past this size, and keep this many rotated files
+MAX_BYTES = 32 << 20
+KEEP_FILES = 30
+
+# Arguments never written to the journal
+SECRET_FIELDS = {"password"}
+
+local = threading.local()
+
+
+def default_actor():
+    # The person behind sudo, else the user running the process
+    name = os.environ.get("SUDO_USER")
+    if name:
+        return name
+    try:
+        return pwd.getpwuid(os.getuid()).pw_name
+    except KeyError:
+        return str(os.getuid())
+
+
+def default_source():
+    name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+    return os.path.splitext(name)[0] or "python"
+
+
+def rotated_name(path, when):
+    base, ext = os.path.splitext(path)
+    return f"{base}-{when:%Y%m%d-%H%M%S}{ext}"
+
+
+class Journal:
+    def __init__(self, directory=JOURNAL_DIR, name=JOURNAL_NAME, max_bytes=MAX_BYTES, keep=KEEP_FILES):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.source = default_source()
+        self.actor = default_actor()
+        self.pending = []
+        self.queued = 0
+        self.written = 0
+        self.failed = None
+        self.closing = False
+        self.cond = threading.Condition()
+        self.thread = None
+        self.fd = None
+        self.ident = None
+        # Called by the writer thread after each group commit
+        self.on_commit = []
+
+    # Writing records
+    def record(self, op, target=None, result="ok", message="", duration=None, sync=False, **fields):
+        entry = {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "source": self.source,
+            "actor": getattr(local, "actor", None) or self.actor,
+            "pid": os.getpid(),
+            "op": op,
+            "target": target,
+            "result": result,
+            "duration_ms": round(duration * 1000, 1) if duration is not None else None,
+            "message": message,
+        }
+        for key, value in fields.items():
+            if key not in SECRET_FIELDS and key not in entry:
+                entry[key] = value
+        self.append(json.dumps(entry, separators=(",", ":"), default=str) + "\n", sync)
+
+    def append(self, line, sync=False):
+        with self.cond:
+            self.pending.append(line)
+            self.queued += 1
+            ticket = self.queued
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="journal", daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+            self.cond.notify_all()
+            if sync:
+                self.wait(ticket)
+
+    def wait(self, ticket):
+        # Called with self.cond held
+        while self.written < ticket and self.thread is not None and self.thread.is_alive():
+            self.cond.wait(1.0)
+
+    def flush(self):
+        with self.cond:
+            self.wait(self.queued)
+
+    def close(self):
+        with self.cond:
+            self.wait(self.queued)
+            self.closing = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(5)
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    @contextlib.contextmanager
+    def operation(self, op, target=None, sync=True, **fields):
+        # Times the block and records it once, as failed if it raised. The
+        # yielded dict takes the message and any extra fields.
+        entry = dict(fields)
+        start = time.monotonic()
+        try:
+            yield entry
+        except BaseException as e:
+            entry.setdefault("error", str(e))
+            message = entry.pop("message", "")
+            self.record(op, target, "failed", message or str(e), time.monotonic() - start, sync, **entry)
+            raise
+        message = entry.pop("message", "")
+        result = entry.pop("result", "ok")
+        self.record(op, target, result, message, time.monotonic() - start, sync, **entry)
+
+    # The writer thread
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closing:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                batch = self.pending
+                self.pending = []
+                ticket = self.queued
+            try:
+                self.commit("".join(batch).encode())
+                self.failed = None
+            except OSError as e:
+                # Never take the caller down with the journal; say so once
+                if self.failed is None:
+                    sys.stderr.write(f"journal: cannot write {self.path}: {e}\n")
+                self.failed = e
+            with self.cond:
+                self.written = ticket
+                self.cond.notify_all()
+            # After the waiting callers are released, so they never wait on it
+            if self.failed is None:
+                for func in self.on_commit:
+                    func()
+
+    def commit(self, data):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.open_current()
+            st = os.fstat(self.fd)
+            modified = datetime.fromtimestamp(st.st_mtime)
+            if st.st_size and (st.st_size + len(data) > self.max_bytes
+                               or modified.date() != datetime.now().date()):
+                self.rotate(modified)
+            os.write(self.fd, data)
+            os.fdatasync(self.fd)
+
+    def open_current(self):
+        # Another process may have rotated the file since our last write
+        try:
+            st = os.stat(self.path)
+            current = (st.st_dev, st.st_ino)
+        except FileNotFoundError:
+            current = None
+        if self.fd is not None and current == self.ident:
+            return
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        st = os.fstat(self.fd)
+        self.ident = (st.st_dev, st.st_ino)
+
+    def rotate(self, modified):
+        os.rename(self.path, rotated_name(self.path, modified))
+        os.close(self.fd)
+        self.fd = None
+        self.open_current()
+        old = journal_files(self.directory)[:-1]
+        for path in old[:max(0, len(old) - self.keep)]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def journal_files(directory=JOURNAL_DIR):
+    # Rotated journals oldest first, then the current one
+    base, ext = os.path.splitext(JOURNAL_NAME)
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    rotated = sorted(n for n in names if n.startswith(base + "-") and n.endswith(ext))
+    files = [os.path.join(directory, n) for n in rotated]
+    if JOURNAL_NAME in names:
+        files.append(os.path.join(directory, JOURNAL_NAME))
+    return files
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = Journal()
+            # The history index catches up as records are written, not only
+            # when it is next queried
+            import history_index
+            _journal.on_commit.append(history_index.follower(_journal.directory))
+        return _journal
+
+
+def record(op, target=None, result="ok", message="", duration=None, sync=False, **fields):
+    get_journal().record(op, target, result, message, duration, sync, **fields)
+
+
+def operation(op, target=None, sync=True, **fields):
+    return get_journal().operation(op, target, sync, **fields)
+
+
+def log(message, channel="user_management"):
+    # Free-text progress lines
+    get_journal().record("log", message=message, channel=channel)
+
+
+def log_message(message, log="user_management"):
+    # log() under the name and keyword the scripts' log_message used
+    get_journal().record("log", message=message, channel=log)
+
+
+def flush():
+    if _journal is not None:
+        _journal.flush()
+
+
+@contextlib.contextmanager
+def acting_as(actor):
+    # Records written by this thread inside the block name `actor`, e.g.
+    # the user on the other end of the helper's socket
+    previous = getattr(local, "actor", None)
+    local.actor = actor
+    try:
+        yield
+    finally:
+        local.actor = previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Operation journal")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    p = commands.add_parser("tail", help="print the last records")
+    p.add_argument("-n", type=int, default=20)
+    p.add_argument("--follow", "-f", action="store_true")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(JOURNAL_DIR, JOURNAL_NAME)
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.readlines()[-args.n:]
+            sys.stdout.writelines(lines)
+            while args.follow:
+                line = f.readline()
+                if line:
+                    sys.stdout.write(line)
+                    sys.stdout.flush()
+                else:
+                    time.sleep(0.5)
+    except FileNotFoundError:
+        print(f"No journal at {path}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# login_records.py - Readers for the utmp, wtmp, btmp and lastlog databases
+# All of them are arrays of fixed-size records, so who(1), last(1) and
+# lastb(1) can be answered by unpacking them directly instead of forking.
+# LoginIndex keeps the last login (and last failed login) of every user,
+# scanning wtmp in large chunks and, after the first scan, only the records
+# appended since.
+
+import os
+import socket
+import struct
+import time
+from collections import namedtuple
+from datetime import datetime
+
+UTMP_PATH = "/var/run/utmp"
+WTMP_PATH = "/var/log/wtmp"
+BTMP_PATH = "/var/log/btmp"
+LASTLOG_PATH = "/var/log/lastlog"
+
+# struct utmp from <utmp.h> (glibc, 64-bit): ut_type, ut_pid, ut_line[32],
+# ut_id[4], ut_user[32], ut_host[256], ut_exit, ut_session, ut_tv, ut_addr_v6
+UTMP_RECORD = struct.Struct("=hxxi32s4s32s256shhiii16s20s")
+# The same record with only ut_type, ut_user and ut_tv.tv_sec unpacked
+SUMMARY_RECORD = struct.Struct("=h42x32s264xi40x")
+
+# struct lastlog from <lastlog.h>: time, tty[32], host[256]
+LASTLOG_RECORD = struct.Struct("=I32s256s")
+
+# Records unpacked per read when scanning a whole file
+CHUNK_RECORDS = 8192
+
+# ut_type values
+RUN_LVL = 1
+BOOT_TIME = 2
+USER_PROCESS = 7
+DEAD_PROCESS = 8
+
+Login = namedtuple("Login", ["type", "pid", "line", "user", "host", "time", "address"])
+
+
+def text(field):
+    return field.split(b"\0", 1)[0].decode(errors="replace")
+
+
+def parse_record(data):
+    (kind, pid, line, _, user, host, _, _, _, seconds, _, addr, _) = UTMP_RECORD.unpack(data)
+    address = ""
+    if any(addr):
+        if any(addr[4:]):
+            address = socket.inet_ntop(socket.AF_INET6, addr)
+        else:
+            address = socket.inet_ntop(socket.AF_INET, addr[:4])
+    return Login(kind, pid, text(line), text(user), text(host), seconds, address)
+
+
+def read_records(path=UTMP_PATH):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return
+    size = UTMP_RECORD.size
+    for start in range(0, len(data) - size + 1, size):
+        yield parse_record(data[start:start + size])
+
+
+def read_records_reversed(path=WTMP_PATH, block_records=512):
+    # Newest first, reading the file backwards a block at a time, so the
+    # last few logins of a years-long wtmp cost one or two reads
+    size = UTMP_RECORD.size
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        end = os.fstat(f.fileno()).st_size // size * size
+        while end > 0:
+            start = max(0, end - block_records * size)
+            f.seek(start)
+            data = f.read(end - start)
+            for offset in range(len(data) - size, -1, -size):
+                yield parse_record(data[offset:offset + size])
+            end = start
+
+
+def current_logins(path=UTMP_PATH):
+    return [r for r in read_records(path) if r.type == USER_PROCESS and r.user]
+
+
+def boot_time(path=UTMP_PATH):
+    for record in read_records(path):
+        if record.type == BOOT_TIME:
+            return record.time
+    return None
+
+
+def format_time(seconds, fmt="%Y-%m-%d %H:%M"):
+    return datetime.fromtimestamp(seconds).strftime(fmt)
+
+
+def read_lastlog(uid, path=LASTLOG_PATH):
+    # (time, tty, host) of the uid's last login, None if never or unknown.
+    # lastlog is a sparse file indexed by UID, so one seek and read suffices.
+    try:
+        with open(path, "rb") as f:
+            f.seek(uid * LASTLOG_RECORD.size)
+            record = f.read(LASTLOG_RECORD.size)
+    except (OSError, OverflowError):
+        return None
+    if len(record) < LASTLOG_RECORD.size:
+        return None
+    when, tty, host = LASTLOG_RECORD.unpack(record)
+    return (when, text(tty), text(host)) if when else None
+
+
+class RecordScan:
+    # Per-user totals over one login file (and its rotated .1 copy): the
+    # newest USER_PROCESS record of each user and how many there were.
+    # Records appended since the last scan are all a refresh reads.
+    def __init__(self, path):
+        self.path = path
+        self.ident = None
+        self.offset = 0
+        self.latest = {}
+        self.counts = {}
+        self.keys = {}
+
+    def refresh(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self.ident = None
+            self.offset = 0
+            self.latest = {}
+            self.counts = {}
+            return
+        size = UTMP_RECORD.size
+        if (st.st_dev, st.st_ino) != self.ident or st.st_size < self.offset:
+            # New or rotated file: start over, oldest records first
+            self.ident = (st.st_dev, st.st_ino)
+            self.offset = 0
+            self.latest = {}
+            self.counts = {}
+            self.scan(self.path + ".1", 0)
+        if st.st_size // size * size > self.offset:
+            self.offset = self.scan(self.path, self.offset)
+
+    def scan(self, path, offset):
+        # Unpack whole chunks with iter_unpack; only user names are kept
+        # per record, the details of each user's newest record are read
+        # back on demand. Returns the offset read up to.
+        size = UTMP_RECORD.size
+        latest = self.latest
+        counts = self.counts
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return offset
+        with f:
+            f.seek(offset)
+            while True:
+                data = f.read(CHUNK_RECORDS * size)
+                whole = len(data) // size * size
+                if not whole:
+                    break
+                position = offset
+                for kind, user, seconds in SUMMARY_RECORD.iter_unpack(memoryview(data)[:whole]):
+                    if kind == USER_PROCESS and user[0]:
+                        latest[user] = (seconds, path, position)
+                        counts[user] = counts.get(user, 0) + 1
+                    position += size
+                offset += whole
+                if whole < len(data) or len(data) < CHUNK_RECORDS * size:
+                    break
+        return offset
+
+    def users(self):
+        # username -> (time, count). Names are decoded once per distinct
+        # ut_user field, not per record.
+        result = {}
+        self.keys = {}
+        for user, (seconds, _, _) in self.latest.items():
+            name = text(user)
+            previous = result.get(name)
+            if previous is None or seconds > previous[0]:
+                result[name] = (seconds, self.counts[user] + (previous[1] if previous else 0))
+                self.keys[name] = user
+            else:
+                result[name] = (previous[0], previous[1] + self.counts[user])
+        return result
+
+    def record(self, username):
+        # The user's newest record as a Login, or None (after users())
+        entry = self.latest.get(self.keys.get(username))
+        if entry is None:
+            return None
+        _, path, position = entry
+        try:
+            with open(path, "rb") as f:
+                f.seek(position)
+                return parse_record(f.read(UTMP_RECORD.size))
+        except (OSError, struct.error):
+            return None
+
+
+class LoginIndex:
+    # Last login per user from wtmp, falling back to lastlog for logins
+    # older than the wtmp files kept, and last failed login from btmp
+    def __init__(self, wtmp=WTMP_PATH, btmp=BTMP_PATH, lastlog=LASTLOG_PATH):
+        self.logins = RecordScan(wtmp)
+        self.failures = RecordScan(btmp)
+        self.lastlog = lastlog
+        self.last = {}
+        self.failed = {}
+
+    def refresh(self):
+        self.logins.refresh()
+        self.failures.refresh()
+        self.last = self.logins.users()
+        self.failed = self.failures.users()
+        return self
+
+    def last_login(self, name, uid=None):
+        # Seconds since the epoch of the user's last login, or None
+        seconds = self.last.get(name, (None, 0))[0]
+        if uid is not None:
+            record = read_lastlog(uid, self.lastlog)
+            if record and (seconds is None or record[0] > seconds):
+                seconds = record[0]
+        return seconds
+
+    def inactive(self, accounts, days, now=None):
+        # [(account, last login or None)] of the accounts with no login in
+        # `days` days, longest idle first
+        now = now if now is not None else time.time()
+        cutoff = now - days * 86400
+        found = []
+        for account in accounts:
+            seconds = self.last_login(account.name, account.uid)
+            if seconds is None or seconds < cutoff:
+                found.append((account, seconds))
+        return sorted(found, key=lambda item: (item[1] is not None, item[1] or 0, item[0].name))
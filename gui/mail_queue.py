@@ -0,0 +1,509 @@
+# mail_queue.py - Persistent outbound mail spool for audit reports
+# Messages are queued in archive/mail/queue.db and sent by a background
+# thread with smtplib: every message that is due goes out over one SMTP
+# session, and the connection stays open for IDLE_SECONDS in case more
+# follow. A message to several people is sent once with all of them as
+# recipients. Failures are retried with exponential backoff; a 5xx reply
+# to MAIL, RCPT or DATA, or a message out of attempts, is marked failed.
+# When the session can't be opened at all (server down, TLS or login
+# refused) nothing is wrong with the messages: the whole queue backs off
+# and keeps them without using up their attempts.
+#
+# Attachments are copied into the spool by content hash, so a report sent
+# in ten messages is stored once, and survives archive pruning until sent.
+#
+# SMTP settings come from an INI file, $USERCTRL_MAIL_CONFIG or
+# <repo>/data/mail.conf; without one, mail goes to a local MTA on port 25:
+#
+#   [smtp]
+#   host = smtp.example.com
+#   port = 587
+#   security = starttls        ; starttls, ssl or none
+#   user = reports@example.com
+#   password = app-password
+#   sender = reports@example.com
+#
+# Usage: python3 gui/mail_queue.py send [-s SUBJECT] [--wait] EMAIL[,EMAIL...] REPORT...
+#        python3 gui/mail_queue.py status|flush|retry
+
+import argparse
+import configparser
+import fcntl
+import getpass
+import hashlib
+import os
+import shutil
+import smtplib
+import socket
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+import journal
+from report_archive import ARCHIVE_ROOT, open_report, plain_name
+
+SPOOL_DIR = os.path.join(ARCHIVE_ROOT, "mail")
+MAIL_CONFIG = os.environ.get("USERCTRL_MAIL_CONFIG") or os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "mail.conf"))
+
+# Retries wait RETRY_BASE * 2**attempts seconds, at most RETRY_MAX
+MAX_ATTEMPTS = 8
+RETRY_BASE = 30
+RETRY_MAX = 3600
+
+# An open SMTP connection is closed after this long without a message
+IDLE_SECONDS = 30
+# The sender also looks for messages queued by other processes this often
+POLL_SECONDS = 60
+# Sent and failed messages are forgotten after this many days
+KEEP_DAYS = 30
+
+DEFAULT_BODY = """Hello,
+
+Please find attached the system audit report generated on {date}.
+
+This report was automatically generated by UserCTRL Pro.
+
+Regards,
+System Administrator
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    sent TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_due ON messages (state, next_attempt);
+CREATE TABLE IF NOT EXISTS attachments (
+    digest TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    stored REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS message_attachments (
+    message_id INTEGER NOT NULL REFERENCES messages (id) ON DELETE CASCADE,
+    digest TEXT NOT NULL REFERENCES attachments (digest),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (message_id, digest)
+);
+"""
+
+
+class MailError(Exception):
+    pass
+
+
+class SessionError(MailError):
+    # Connecting, STARTTLS, HELO or login failed: no message was tried
+    pass
+
+
+def load_config(path=MAIL_CONFIG):
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    smtp = parser["smtp"] if parser.has_section("smtp") else {}
+    security = smtp.get("security", "none").lower()
+    if security not in ("starttls", "ssl", "none"):
+        raise MailError(f"{path}: security must be starttls, ssl or none")
+    return {
+        "host": smtp.get("host", "localhost"),
+        "port": int(smtp.get("port", 465 if security == "ssl" else 25)),
+        "security": security,
+        "user": smtp.get("user") or None,
+        "password": smtp.get("password") or None,
+        "sender": smtp.get("sender") or f"{getpass.getuser()}@{socket.getfqdn()}",
+    }
+
+
+def split_recipients(text):
+    recipients = [r for r in text.replace(";", ",").replace(" ", ",").split(",") if r]
+    if not recipients:
+        raise MailError("At least one recipient is required")
+    for recipient in recipients:
+        if "@" not in recipient.strip("@"):
+            raise MailError(f"{recipient} is not an email address")
+    return recipients
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def permanent(error):
+    # 5xx replies to this message's MAIL, RCPT or DATA won't succeed on a
+    # retry; anything else may
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class MailQueue:
+    def __init__(self, spool_dir=SPOOL_DIR, config_path=MAIL_CONFIG):
+        self.spool_dir = spool_dir
+        self.blob_dir = os.path.join(spool_dir, "attachments")
+        self.path = os.path.join(spool_dir, "queue.db")
+        self.config_path = config_path
+        os.makedirs(self.blob_dir, exist_ok=True)
+        # Used by whichever thread queues or asks for the status; the
+        # sender has its own connection
+        self.db = self.connect()
+        self.lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.closing = False
+        self.smtp = None
+        self.last_used = 0.0
+        # Sessions that failed to open in a row, for the queue's backoff
+        self.session_failures = 0
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        db.executescript(SCHEMA)
+        return db
+
+    def close(self):
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(10)
+        self.disconnect()
+        self.db.close()
+
+    # Queueing
+    def enqueue(self, recipients, subject, reports=(), body=None):
+        # Queue one message to every recipient with the reports attached;
+        # returns its id
+        if isinstance(recipients, str):
+            recipients = split_recipients(recipients)
+        body = body or DEFAULT_BODY.format(date=f"{datetime.now():%Y-%m-%d %H:%M:%S}")
+        attachments = [self.store_attachment(path) for path in reports]
+        with self.lock, self.db:
+            message_id = self.db.execute(
+                "INSERT INTO messages (created, recipients, subject, body) VALUES (?, ?, ?, ?)",
+                (f"{datetime.now():%Y-%m-%d %H:%M:%S}", ",".join(recipients), subject, body)).lastrowid
+            self.db.executemany(
+                "INSERT OR IGNORE INTO message_attachments (message_id, digest, position) VALUES (?, ?, ?)",
+                [(message_id, digest, position) for position, digest in enumerate(attachments)])
+        self.wake()
+        return message_id
+
+    def store_attachment(self, path):
+        # The spool keeps one copy of each distinct file, however many
+        # messages carry it
+        digest = file_digest(path)
+        with self.lock, self.db:
+            row = self.db.execute("SELECT path FROM attachments WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and os.path.exists(row["path"]):
+                # Fresh again, so clean() leaves it for this message
+                self.db.execute("UPDATE attachments SET stored = ? WHERE digest = ?", (time.time(), digest))
+                return digest
+        name = os.path.basename(path)
+        blob = os.path.join(self.blob_dir, digest + os.path.splitext(name)[1])
+        temporary = blob + ".tmp"
+        shutil.copyfile(path, temporary)
+        os.replace(temporary, blob)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO attachments (digest, name, path, stored) VALUES (?, ?, ?, ?)",
+                            (digest, plain_name(name), blob, time.time()))
+        return digest
+
+    def retry_failed(self):
+        with self.lock, self.db:
+            count = self.db.execute("UPDATE messages SET state = 'queued', attempts = 0, next_attempt = 0, "
+                                    "error = NULL WHERE state = 'failed'").rowcount
+        self.wake()
+        return count
+
+    def status(self):
+        # {"queued", "retrying", "failed", "sent", "next_attempt", "error"}
+        with self.lock:
+            db = self.db
+            counts = dict(db.execute("SELECT state, COUNT(*) FROM messages GROUP BY state").fetchall())
+            retrying = db.execute("SELECT COUNT(*), MIN(next_attempt) FROM messages "
+                                  "WHERE state = 'queued' AND (attempts > 0 OR error IS NOT NULL)").fetchone()
+            error = db.execute("SELECT error FROM messages WHERE error IS NOT NULL AND state != 'sent' "
+                               "ORDER BY id DESC LIMIT 1").fetchone()
+        return {"queued": counts.get("queued", 0), "retrying": retrying[0], "next_attempt": retrying[1],
+                "failed": counts.get("failed", 0), "sent": counts.get("sent", 0),
+                "error": error[0] if error else None}
+
+    # Sending
+    def start(self):
+        # Run the sender in a background thread until close()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="mail", daemon=True)
+            self.thread.start()
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def run(self):
+        db = self.connect()
+        try:
+            while True:
+                try:
+                    self.drain(db)
+                except (OSError, sqlite3.Error, MailError) as e:
+                    journal.log(f"Mail queue: {e}", channel="audit")
+                with self.cond:
+                    if self.closing:
+                        return
+                    self.cond.wait(self.next_wakeup(db))
+                    if self.closing:
+                        return
+        finally:
+            db.close()
+
+    def next_wakeup(self, db):
+        row = db.execute("SELECT MIN(next_attempt) FROM messages WHERE state = 'queued'").fetchone()
+        timeout = POLL_SECONDS
+        if row[0] is not None:
+            timeout = min(timeout, row[0] - time.time())
+        if self.smtp is not None:
+            timeout = min(timeout, self.last_used + IDLE_SECONDS - time.monotonic())
+        # Not less than a second, in case another process holds the spool
+        return max(1.0, timeout)
+
+    def drain(self, db=None):
+        # Send every message that is due over one SMTP session; returns
+        # (sent, failed). Another process already sending means nothing to do.
+        db = db or self.db
+        with open(os.path.join(self.spool_dir, "queue.lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0, 0
+            due = db.execute("SELECT * FROM messages WHERE state = 'queued' AND next_attempt <= ? ORDER BY id",
+                             (time.time(),)).fetchall()
+            sent = failed = 0
+            attachments = {}
+            config = load_config(self.config_path) if due else None
+            for index, row in enumerate(due):
+                start = time.monotonic()
+                try:
+                    refused = self.send(config, self.compose(db, row, config["sender"], attachments))
+                except SessionError as e:
+                    self.defer(db, due[index:], e)
+                    break
+                except (smtplib.SMTPException, OSError) as e:
+                    if self.record_failure(db, row, e, time.monotonic() - start):
+                        failed += 1
+                    if not permanent(e):
+                        # The server is unreachable or unwell; the rest can wait
+                        self.disconnect()
+                        break
+                    continue
+                self.record_sent(db, row, refused, time.monotonic() - start)
+                sent += 1
+            if self.smtp is not None and time.monotonic() - self.last_used >= IDLE_SECONDS:
+                self.disconnect()
+            self.clean(db)
+            return sent, failed
+
+    def compose(self, db, row, sender, attachments):
+        # `attachments` caches the decompressed reports for this session
+        message = EmailMessage()
+        message["From"] = sender
+        message["To"] = ", ".join(row["recipients"].split(","))
+        message["Subject"] = row["subject"]
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid()
+        message.set_content(row["body"])
+        for attachment in db.execute("SELECT a.digest, a.name, a.path FROM message_attachments m "
+                                     "JOIN attachments a USING (digest) WHERE m.message_id = ? ORDER BY m.position",
+                                     (row["id"],)):
+            text = attachments.get(attachment["digest"])
+            if text is None:
+                with open_report(attachment["path"]) as f:
+                    text = attachments[attachment["digest"]] = f.read()
+            message.add_attachment(text, filename=attachment["name"])
+        return message
+
+    def send(self, config, message):
+        # One send over the open connection, reconnecting once if the
+        # server dropped it while idle
+        for attempt in (1, 2):
+            if self.smtp is None:
+                self.smtp = self.open_connection(config)
+            try:
+                refused = self.smtp.send_message(message)
+                self.last_used = time.monotonic()
+                return refused
+            except smtplib.SMTPServerDisconnected:
+                self.disconnect()
+                if attempt == 2:
+                    raise
+
+    def open_connection(self, config):
+        # Any failure here is the session's, and raised as SessionError
+        context = ssl.create_default_context()
+        try:
+            if config["security"] == "ssl":
+                smtp = smtplib.SMTP_SSL(config["host"], config["port"], timeout=30, context=context)
+            else:
+                smtp = smtplib.SMTP(config["host"], config["port"], timeout=30)
+        except (smtplib.SMTPException, OSError) as e:
+            raise SessionError(f"cannot connect to {config['host']}:{config['port']}: {e}") from e
+        try:
+            smtp.ehlo_or_helo_if_needed()
+            if config["security"] == "starttls":
+                smtp.starttls(context=context)
+            if config["user"]:
+                smtp.login(config["user"], config["password"] or "")
+        except (smtplib.SMTPException, OSError) as e:
+            smtp.close()
+            raise SessionError(f"{config['host']}: {e}") from e
+        except BaseException:
+            smtp.close()
+            raise
+        self.session_failures = 0
+        return smtp
+
+    def disconnect(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
+
+    def record_sent(self, db, row, refused, duration):
+        error = "; ".join(f"{r}: {code} {reply.decode(errors='replace')}"
+                          for r, (code, reply) in refused.items()) or None
+        with db:
+            db.execute("UPDATE messages SET state = 'sent', sent = ?, attempts = attempts + 1, error = ? "
+                       "WHERE id = ?", (f"{datetime.now():%Y-%m-%d %H:%M:%S}", error, row["id"]))
+        journal.record("send_report", row["recipients"], "ok", f"Sent '{row['subject']}' to {row['recipients']}"
+                       + (f" (refused: {error})" if error else ""), duration, channel="audit")
+
+    def defer(self, db, rows, error):
+        # The server can't be reached or won't let us in: every due message
+        # waits for the queue's backoff and keeps its attempts
+        self.session_failures += 1
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (self.session_failures - 1))
+        with db:
+            db.executemany("UPDATE messages SET next_attempt = ?, error = ? WHERE id = ?",
+                           [(time.time() + delay, str(error), row["id"]) for row in rows])
+        journal.log(f"Mail queue: {error}; {len(rows)} messages wait {delay}s", channel="audit")
+
+    def record_failure(self, db, row, error, duration):
+        # Reschedule with backoff; returns True once the message is given up
+        attempts = row["attempts"] + 1
+        given_up = permanent(error) or attempts >= MAX_ATTEMPTS
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+        with db:
+            db.execute("UPDATE messages SET state = ?, attempts = ?, next_attempt = ?, error = ? WHERE id = ?",
+                       ("failed" if given_up else "queued", attempts, time.time() + delay, str(error), row["id"]))
+        journal.record("send_report", row["recipients"], "failed" if given_up else "retrying",
+                       f"Sending '{row['subject']}' failed: {error}", duration, attempts=attempts, channel="audit")
+        return given_up
+
+    def clean(self, db):
+        # Forget old messages, and spooled files no pending message needs
+        cutoff = f"{datetime.now() - timedelta(days=KEEP_DAYS):%Y-%m-%d %H:%M:%S}"
+        with db:
+            db.execute("DELETE FROM messages WHERE state != 'queued' AND created < ?", (cutoff,))
+            # A file stored in the last hour may belong to a message still
+            # being queued
+            unused = db.execute("SELECT digest, path FROM attachments WHERE stored < ? AND digest NOT IN "
+                                "(SELECT digest FROM message_attachments)", (time.time() - 3600,)).fetchall()
+            db.executemany("DELETE FROM attachments WHERE digest = ?", [(row["digest"],) for row in unused])
+        for row in unused:
+            try:
+                os.unlink(row["path"])
+            except OSError:
+                pass
+
+
+def describe(status):
+    # One line for the Audit tab and `status`
+    parts = []
+    if status["queued"]:
+        part = f"{status['queued']} queued"
+        if status["retrying"]:
+            wait = max(0, int(status["next_attempt"] - time.time()))
+            part += f" ({status['retrying']} retrying in {wait}s)"
+        parts.append(part)
+    if status["failed"]:
+        parts.append(f"{status['failed']} failed")
+    text = "Mail queue: " + (", ".join(parts) if parts else "empty")
+    if status["error"] and (status["queued"] or status["failed"]):
+        text += f" - {status['error']}"
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Outbound mail queue for audit reports")
+    parser.add_argument("--spool", default=SPOOL_DIR)
+    parser.add_argument("--config", default=MAIL_CONFIG)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    p = commands.add_parser("send", help="queue reports for one or more recipients")
+    p.add_argument("-s", "--subject", default="System Audit Report")
+    p.add_argument("--wait", action="store_true", help="send now instead of leaving it to the sender")
+    p.add_argument("recipients", help="addresses separated by commas")
+    p.add_argument("reports", nargs="+")
+    commands.add_parser("status", help="show what is queued")
+    commands.add_parser("flush", help="send every message that is due")
+    commands.add_parser("retry", help="queue failed messages again")
+    args = parser.parse_args(argv)
+
+    queue = MailQueue(args.spool, args.config)
+    try:
+        if args.command == "send":
+            try:
+                message_id = queue.enqueue(args.recipients, args.subject, args.reports)
+            except (MailError, OSError) as e:
+                print(f"Error: {e}")
+                return 1
+            if not args.wait:
+                print(f"Queued message {message_id} for {args.recipients}")
+                return 0
+            queue.drain()
+            row = queue.db.execute("SELECT state, error FROM messages WHERE id = ?", (message_id,)).fetchone()
+            if row["state"] == "sent":
+                print(f"SUCCESS: Report {' '.join(args.reports)} sent to {args.recipients}")
+                return 0
+            print(f"ERROR: Failed to send report to {args.recipients}: {row['error'] or 'another sender is busy'}"
+                  + (" (queued for retry)" if row["state"] == "queued" else ""))
+            return 1
+        if args.command == "flush":
+            sent, failed = queue.drain()
+            print(f"Sent {sent}, gave up on {failed}")
+        elif args.command == "retry":
+            print(f"Queued {queue.retry_failed()} failed messages again")
+        print(describe(queue.status()))
+    except MailError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
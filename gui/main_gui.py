@@ -1,10 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import subprocess
 import os
-import threading
+import queue
+import time
 from datetime import datetime
 
+import audit_scheduler
+import authlog
+import batch_ops
+import bulk_engine
+import history_index
+import journal
+import mail_queue
+import report_catalog
+import report_search
+from account_index import AccountIndex
+from account_watch import AccountWatcher, diff_users
+from login_records import LoginIndex
+from report_viewer import ReportBuffer, ReportView, ReportViewer
+from task_runner import TaskRunner
+from userctrl_client import HelperClient
+from user_details import UserDetails
+from user_list import UserBrowser
+
 # Define improved color scheme
 COLORS = {
     "primary": "#1976D2",  # Deeper blue
@@ -19,6 +37,22 @@ COLORS = {
     "accent": "#00BCD4"  # Cyan accent
 }
 
+# How often the user list checks the account databases for changes
+ACCOUNT_POLL_MS = 1000
+
+# Selection must rest this long before the slow user details are looked up
+DETAILS_DELAY_MS = 150
+DETAILS_POLL_MS = 100
+
+# Lines kept in the bulk results widget; the results file has everything
+MAX_RESULT_LINES = 5000
+
+# How often the Audit tab re-reads the mail queue's status
+MAIL_POLL_MS = 2000
+
+# How often the Schedules dialog re-reads the schedules and their runs
+SCHEDULE_POLL_MS = 2000
+
 class UserCTRLApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -49,6 +83,18 @@ class UserCTRLApp(tk.Tk):
         self.style.configure("TNotebook.Tab", padding=[10, 5], font=("Helvetica", 10))
         self.tab_control = ttk.Notebook(self.content_frame)
 
+        # Status text is shared by every tab, so create it before the tabs load
+        self.status_var = tk.StringVar()
+        self.status_var.set("Ready")
+
+        # Every slow operation runs through the task runner; its callbacks
+        # are the only code that updates widgets with the results
+        self.tasks_var = tk.StringVar()
+        self.tasks = TaskRunner(self, on_change=self.show_tasks)
+        # Account operations go to the userctrld helper (started on first use)
+        self.helper = HelperClient()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # User Management Tab
         self.user_tab = ttk.Frame(self.tab_control)
         self.tab_control.add(self.user_tab, text="User Management")
@@ -66,27 +112,54 @@ class UserCTRLApp(tk.Tk):
 
         self.tab_control.pack(expand=1, fill="both")
 
-        # Create status bar
-        self.status_var = tk.StringVar()
-        self.status_var.set("Ready")
+        # Create status bar with the running tasks indicator on the right
+        status_frame = tk.Frame(self, bd=1, relief=tk.SUNKEN, bg=COLORS["light"])
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         self.status_bar = tk.Label(
-            self,
+            status_frame,
             textvariable=self.status_var,
-            bd=1,
-            relief=tk.SUNKEN,
             anchor=tk.W,
             bg=COLORS["light"],
             padx=10,
             pady=5
         )
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_tasks_btn = ttk.Button(status_frame, text="Cancel", command=self.cancel_tasks)
+        self.tasks_label = tk.Label(status_frame, textvariable=self.tasks_var, bg=COLORS["light"],
+                                    fg=COLORS["primary"], padx=10)
+        self.tasks_label.pack(side=tk.RIGHT)
 
         # Create logs directory if it doesn't exist
-        os.makedirs("../logs", exist_ok=True)
+        os.makedirs(journal.JOURNAL_DIR, exist_ok=True)
 
         # Apply custom styling
         self.apply_custom_style()
 
+    def show_tasks(self, tasks):
+        if not tasks:
+            self.tasks_var.set("")
+            self.cancel_tasks_btn.pack_forget()
+            return
+        names = ", ".join(task.name for task in tasks[:3])
+        if len(tasks) > 3:
+            names += f" +{len(tasks) - 3} more"
+        self.tasks_var.set(f"Running ({len(tasks)}): {names}")
+        self.cancel_tasks_btn.pack(side=tk.RIGHT, padx=5)
+
+    def cancel_tasks(self):
+        if messagebox.askyesno("Cancel Tasks", "Cancel all running tasks?"):
+            self.tasks.cancel_all()
+            self.status_var.set("Cancelling...")
+
+    def on_close(self):
+        self.tasks.shutdown()
+        self.scheduler.close()
+        self.mail_queue.close()
+        self.schedule_helper.close()
+        self.helper.close()
+        self.account_watcher.close()
+        self.destroy()
+
     def apply_custom_style(self):
         style = ttk.Style()
         style.configure("TButton",
@@ -111,9 +184,9 @@ class UserCTRLApp(tk.Tk):
 
         # User list
         ttk.Label(left_frame, text="Current Users", font=("Helvetica", 12, "bold")).pack(pady=(0, 10))
-        self.user_listbox = tk.Listbox(left_frame, width=25, height=20, selectmode=tk.SINGLE)
-        self.user_listbox.pack(side="top", fill="both", expand=True)
-        self.user_listbox.bind("<<ListboxSelect>>", self.on_user_select)
+        self.user_list = UserBrowser(left_frame, lambda name: self.accounts.get(name), width=34, height=20)
+        self.user_list.pack(side="top", fill="both", expand=True)
+        self.user_list.bind("<<UserSelect>>", self.on_user_select)
 
         refresh_btn = ttk.Button(left_frame, text="Refresh Users", command=self.refresh_users)
         refresh_btn.pack(pady=10, fill="x")
@@ -149,6 +222,10 @@ class UserCTRLApp(tk.Tk):
         mod_btn = ttk.Button(btn_frame, text="Modify User", command=self.open_modify_user)
         mod_btn.grid(row=1, column=1, padx=10, pady=10, sticky="ew")
 
+        # History button
+        history_btn = ttk.Button(btn_frame, text="History", command=self.view_history)
+        history_btn.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
+
         # User details frame
         details_frame = ttk.LabelFrame(right_frame, text="User Details")
         details_frame.pack(fill="both", expand=True, pady=10, padx=5)
@@ -156,9 +233,16 @@ class UserCTRLApp(tk.Tk):
         self.details_text = tk.Text(details_frame, height=10, width=40)
         self.details_text.pack(fill="both", expand=True, pady=10, padx=10)
         self.details_text.config(state="disabled")
-
-        # Load initial user list
+        self.user_details = UserDetails()
+        self.details_job = None
+        self.after(DETAILS_POLL_MS, self.poll_user_details)
+
+        # Load initial user list and start watching for changes
+        self.accounts = AccountIndex([], [])
+        self.login_index = LoginIndex()
+        self.account_watcher = AccountWatcher()
         self.refresh_users()
+        self.after(ACCOUNT_POLL_MS, self.watch_accounts)
 
     def setup_audit_tab(self):
         # Create main frame
@@ -184,6 +268,17 @@ class UserCTRLApp(tk.Tk):
             cb = ttk.Checkbutton(section_frame, text=section.capitalize(), variable=var)
             cb.grid(row=0, column=i, padx=10)
 
+        # Unchanged blocks (os-release, sshd_config, ...) come from the cache
+        # unless this is ticked
+        self.audit_refresh_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Force refresh (ignore cached results)",
+                        variable=self.audit_refresh_var).pack(pady=(0, 5))
+
+        # Report only what changed since the previous audit's snapshot
+        self.audit_diff_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Only changes since the last audit",
+                        variable=self.audit_diff_var).pack(pady=(0, 10))
+
         # Buttons frame
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(pady=20)
@@ -212,13 +307,53 @@ class UserCTRLApp(tk.Tk):
         )
         view_btn.grid(row=0, column=2, padx=10, pady=10)
 
+        # Search Reports button
+        search_btn = ttk.Button(
+            btn_frame,
+            text="Search Reports",
+            command=self.search_reports
+        )
+        search_btn.grid(row=0, column=3, padx=10, pady=10)
+
+        # Brute-force Suspects button
+        suspects_btn = ttk.Button(
+            btn_frame,
+            text="Brute-force Suspects",
+            command=self.view_suspects
+        )
+        suspects_btn.grid(row=0, column=4, padx=10, pady=10)
+
+        # Schedules button
+        schedules_btn = ttk.Button(
+            btn_frame,
+            text="Schedules",
+            command=self.view_schedules
+        )
+        schedules_btn.grid(row=1, column=0, columnspan=5, padx=10, pady=10)
+
+        # Reports are mailed by a background sender; its queue shows here
+        mail_frame = ttk.Frame(main_frame)
+        mail_frame.pack(fill="x")
+        self.mail_status_var = tk.StringVar(value="Mail queue: empty")
+        ttk.Label(mail_frame, textvariable=self.mail_status_var).pack(side="left")
+        self.mail_retry_btn = ttk.Button(mail_frame, text="Retry Failed", command=self.retry_mail)
+        self.mail_queue = mail_queue.MailQueue()
+        self.mail_queue.start()
+        self.after(MAIL_POLL_MS, self.poll_mail_queue)
+
+        # Scheduled audits use a helper connection of their own, so a long
+        # one doesn't hold up the GUI's requests
+        self.schedule_helper = HelperClient()
+        self.scheduler = audit_scheduler.AuditScheduler(run_audit=self.scheduled_audit, mail=self.mail_queue)
+        self.scheduler.start()
+
         # Report preview frame
         preview_frame = ttk.LabelFrame(main_frame, text="Report Preview")
         preview_frame.pack(fill="both", expand=True, pady=10)
 
-        self.preview_text = tk.Text(preview_frame, wrap="word")
-        self.preview_text.pack(fill="both", expand=True, pady=10, padx=10)
-        self.preview_text.config(state="disabled")
+        # Only the visible lines of the report are ever in the widget
+        self.preview = ReportView(preview_frame, outline=False, height=12)
+        self.preview.pack(fill="both", expand=True, pady=10, padx=10)
 
     def setup_bulk_tab(self):
         # Create main frame
@@ -242,6 +377,11 @@ class UserCTRLApp(tk.Tk):
         browse_btn = ttk.Button(file_select_frame, text="Browse", command=self.browse_csv)
         browse_btn.grid(row=0, column=1)
 
+        # Continue from the checkpoint of an interrupted import of this file
+        self.resume_var = tk.BooleanVar(value=False)
+        resume_cb = ttk.Checkbutton(file_select_frame, text="Resume interrupted import", variable=self.resume_var)
+        resume_cb.grid(row=1, column=0, pady=(5, 0), sticky="w")
+
         # Buttons frame
         btn_frame = ttk.Frame(main_frame)
         btn_frame.pack(pady=20)
@@ -258,6 +398,24 @@ class UserCTRLApp(tk.Tk):
         dry_run_btn = ttk.Button(btn_frame, text="Dry Run", command=self.dry_run)
         dry_run_btn.grid(row=0, column=2, padx=10, pady=10)
 
+        # Lock/unlock/delete/modify many accounts from one file; the plan is
+        # shown and confirmed before anything is applied
+        batch_btn = ttk.Button(btn_frame, text="Batch Operations", command=self.batch_operations)
+        batch_btn.grid(row=1, column=0, padx=10, pady=10)
+
+        batch_template_btn = ttk.Button(btn_frame, text="Download Batch Template", command=self.download_batch_template)
+        batch_template_btn.grid(row=1, column=1, padx=10, pady=10)
+
+        # Progress frame
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill="x")
+
+        self.bulk_progress = ttk.Progressbar(progress_frame, mode="determinate", maximum=1)
+        self.bulk_progress.pack(fill="x")
+
+        self.bulk_stats_var = tk.StringVar()
+        ttk.Label(progress_frame, textvariable=self.bulk_stats_var).pack(anchor="w", pady=(5, 0))
+
         # Results frame
         results_frame = ttk.LabelFrame(main_frame, text="Operation Results")
         results_frame.pack(fill="both", expand=True, pady=10)
@@ -266,62 +424,76 @@ class UserCTRLApp(tk.Tk):
         self.results_text.pack(fill="both", expand=True, pady=10, padx=10)
         self.results_text.config(state="disabled")
 
+        self.bulk_job = None
+
     # User Management Functions
     def refresh_users(self):
         try:
-            # Run command with binary output instead of text
-            result = subprocess.run(["getent", "passwd"], capture_output=True, text=False)
-            
-            if result.returncode == 0:
-                self.user_listbox.delete(0, tk.END)
-                users = []
-                
-                # Decode with error handling
-                output = result.stdout.decode('utf-8', errors='replace')
-                
-                for line in output.splitlines():
-                    username = line.split(":")[0]
-                    # Filter out system users (UID < 1000 typically)
-                    try:
-                        user_info = subprocess.run(["id", "-u", username], capture_output=True, text=True)
-                        uid = int(user_info.stdout.strip())
-                        if uid >= 1000 and not username.startswith("_"):
-                            users.append(username)
-                    except:
-                        pass
-                        
-                for user in sorted(users):
-                    self.user_listbox.insert(tk.END, user)
-                    
-                self.status_var.set(f"Found {len(users)} users")
-            else:
-                messagebox.showerror("Error", "Failed to retrieve user list")
+            # One passwd/group enumeration instead of an `id -u` per account
+            self.accounts = AccountIndex.load()
+            self.user_details.invalidate()
+            users = self.accounts.regular_users()
+            self.user_list.set_users(users)
+
+            self.status_var.set(f"Found {len(users)} users")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to refresh users: {str(e)}")
+            return
+        self.load_last_logins()
 
-    def on_user_select(self, event):
-        if not self.user_listbox.curselection():
+    def load_last_logins(self):
+        # wtmp can hold millions of records: scanned on a worker, and only
+        # the records added since on later refreshes
+        if self.tasks.busy("Last logins"):
             return
+        accounts = [self.accounts.get(name) for name in self.user_list.names]
+
+        def read_last_logins(task):
+            self.login_index.refresh()
+            return {a.name: self.login_index.last_login(a.name, a.uid) for a in accounts if a is not None}
 
-        username = self.user_listbox.get(self.user_listbox.curselection())
+        self.tasks.submit("Last logins", read_last_logins, on_done=self.user_list.set_last_logins,
+                          on_error=lambda e: self.status_var.set(f"Could not read login records: {e}"))
+
+    def sync_users(self):
+        # Apply only the rows that changed since the last snapshot
+        if not self.account_watcher.changed():
+            return
         try:
-            # Get user details
-            id_result = subprocess.run(["id", username], capture_output=True, text=True)
-            finger_result = subprocess.run(["finger", username], capture_output=True, text=True)
+            new_accounts = AccountIndex.load()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refresh users: {str(e)}")
+            return
 
-            self.details_text.config(state="normal")
-            self.details_text.delete(1.0, tk.END)
-            self.details_text.insert(tk.END, f"Username: {username}\n\n")
+        added, removed, renamed, changed = diff_users(self.accounts, new_accounts)
+        self.accounts = new_accounts
+        self.user_details.invalidate()
+        if not (added or removed or renamed or changed):
+            return
+
+        # The list keeps its selection and top row by name
+        self.user_list.apply_diff(added, removed, renamed, changed)
+        self.status_var.set(f"Found {len(self.user_list.names)} users "
+                            f"(+{len(added)} -{len(removed)} ~{len(renamed)})")
+        self.load_last_logins()
+
+    def watch_accounts(self):
+        # Pick up changes made outside the GUI (shell, config management)
+        self.sync_users()
+        self.after(ACCOUNT_POLL_MS, self.watch_accounts)
 
-            if id_result.returncode == 0:
-                self.details_text.insert(tk.END, "ID Information:\n")
-                self.details_text.insert(tk.END, id_result.stdout)
-                self.details_text.insert(tk.END, "\n\n")
+    def on_user_select(self, event):
+        username = self.user_list.selected()
+        if not username:
+            return
 
-            if finger_result.returncode == 0:
-                self.details_text.insert(tk.END, "User Information:\n")
-                self.details_text.insert(tk.END, finger_result.stdout)
+        try:
+            # Cached, in-process details; no id/finger processes
+            details = self.user_details.basic(self.accounts, username)
 
+            self.details_text.config(state="normal")
+            self.details_text.delete(1.0, tk.END)
+            self.details_text.insert(tk.END, details)
             self.details_text.config(state="disabled")
         except Exception as e:
             self.details_text.config(state="normal")
@@ -329,30 +501,176 @@ class UserCTRLApp(tk.Tk):
             self.details_text.insert(tk.END, f"Error retrieving user details: {str(e)}")
             self.details_text.config(state="disabled")
 
+        # Only look up the slow extras once the selection settles
+        if self.details_job is not None:
+            self.after_cancel(self.details_job)
+        account = self.accounts.get(username)
+        if account is not None:
+            self.details_job = self.after(DETAILS_DELAY_MS, self.request_user_extras, account)
+
+    def request_user_extras(self, account):
+        self.details_job = None
+        self.user_details.request_extras(account)
+
+    def poll_user_details(self):
+        # Stream background results into the pane if that user is still shown
+        try:
+            while True:
+                username, label, value = self.user_details.results.get_nowait()
+                if username != self.user_list.selected():
+                    continue
+                self.details_text.config(state="normal")
+                if label == "Last Login":
+                    self.details_text.insert(tk.END, "\nActivity:\n")
+                self.details_text.insert(tk.END, f"  {label}: {value}\n")
+                self.details_text.config(state="disabled")
+        except queue.Empty:
+            pass
+        self.after(DETAILS_POLL_MS, self.poll_user_details)
+
     def open_add_user(self):
         self.open_dialog("add_user")
 
     def open_delete_user(self):
-        if not self.user_listbox.curselection():
+        username = self.user_list.selected()
+        if not username:
             messagebox.showinfo("Select User", "Please select a user from the list first")
             return
-        username = self.user_listbox.get(self.user_listbox.curselection())
         self.open_dialog("delete_user", username)
 
     def open_lock_user(self):
-        if not self.user_listbox.curselection():
+        username = self.user_list.selected()
+        if not username:
             messagebox.showinfo("Select User", "Please select a user from the list first")
             return
-        username = self.user_listbox.get(self.user_listbox.curselection())
         self.open_dialog("lock_user", username)
 
     def open_modify_user(self):
-        if not self.user_listbox.curselection():
+        username = self.user_list.selected()
+        if not username:
             messagebox.showinfo("Select User", "Please select a user from the list first")
             return
-        username = self.user_listbox.get(self.user_listbox.curselection())
         self.open_dialog("modify_user", username)
 
+    def view_history(self):
+        # Journaled operations, newest first, for the selected user by default
+        history_dialog = tk.Toplevel(self)
+        history_dialog.title("Operation History")
+        history_dialog.geometry("1000x500")
+        history_dialog.configure(bg=COLORS["bg"])
+
+        ttk.Label(history_dialog, text="Operation History", font=("Helvetica", 12, "bold")).pack(pady=10)
+
+        filter_frame = ttk.Frame(history_dialog)
+        filter_frame.pack(fill="x", padx=10)
+        user_var = tk.StringVar(value=self.user_list.selected() or "")
+        op_var = tk.StringVar(value="All")
+        actor_var = tk.StringVar()
+        from_var = tk.StringVar()
+        to_var = tk.StringVar()
+        ttk.Label(filter_frame, text="User:").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=user_var, width=14).pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="Operation:").pack(side="left")
+        op_box = ttk.Combobox(filter_frame, textvariable=op_var, state="readonly", width=12, values=["All"])
+        op_box.pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="By:").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=actor_var, width=10).pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="From (YYYY-MM-DD):").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=from_var, width=11).pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="To:").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=to_var, width=11).pack(side="left", padx=5)
+        count_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=count_var).pack(side="right")
+
+        tree_frame = ttk.Frame(history_dialog)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        columns = ("time", "op", "target", "actor", "result", "duration", "message")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column, heading, width in (("time", "Time", 140), ("op", "Operation", 100), ("target", "User", 100),
+                                       ("actor", "By", 80), ("result", "Result", 60), ("duration", "ms", 60),
+                                       ("message", "Message", 420)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        tree.tag_configure("failed", foreground=COLORS["danger"])
+
+        # Pages come from the history index as the list is scrolled, like
+        # the archived reports
+        index = history_index.HistoryIndex()
+        state = {"filters": {}, "last": None, "done": False, "loading": False}
+
+        def load_page():
+            state["loading"] = False
+            rows = index.page(after=state["last"], **state["filters"])
+            for row in rows:
+                duration = "" if row["duration_ms"] is None else f"{row['duration_ms']:.0f}"
+                tree.insert("", "end", values=(row["time"].replace("T", " ")[:19], row["op"], row["target"] or "",
+                                               row["actor"] or "", row["result"] or "", duration, row["message"]),
+                            tags=("failed",) if row["result"] == "failed" else ())
+            if rows:
+                state["last"] = rows[-1]
+            state["done"] = len(rows) < history_index.PAGE_SIZE
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if not state["done"] and not state["loading"] and float(last) > 0.9:
+                state["loading"] = True
+                tree.after_idle(load_page)
+
+        def reload():
+            filters = {"target": user_var.get().strip() or None, "actor": actor_var.get().strip() or None,
+                       "op": None if op_var.get() == "All" else op_var.get()}
+            for key, var in (("date_from", from_var), ("date_to", to_var)):
+                value = var.get().strip()
+                if value:
+                    try:
+                        datetime.strptime(value, "%Y-%m-%d")
+                    except ValueError:
+                        messagebox.showerror("Invalid Date", f"{value} is not a YYYY-MM-DD date",
+                                             parent=history_dialog)
+                        return
+                    filters[key] = value
+            state.update(filters=filters, last=None, done=False)
+            tree.delete(*tree.get_children())
+            count_var.set(f"{index.count(**filters)} operations")
+            op_box.configure(values=["All"] + index.operations())
+            load_page()
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=on_scroll)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        def close_dialog():
+            index.close()
+            history_dialog.destroy()
+
+        history_dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+
+        # Index what the journal gained since the last look, then show it
+        def update_index(task):
+            background = history_index.HistoryIndex()
+            try:
+                return background.update()
+            finally:
+                background.close()
+
+        def updated(added):
+            if history_dialog.winfo_exists():
+                reload()
+
+        def failed(e):
+            # Whatever was indexed before is still worth showing
+            self.status_var.set(f"Operation history: {e}")
+            updated(0)
+
+        count_var.set("Indexing the journal...")
+        self.tasks.submit("Operation history", update_index, on_done=updated, on_error=failed)
+
+        btn_frame = ttk.Frame(history_dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Apply Filters", command=reload).grid(row=0, column=0, padx=10)
+        ttk.Button(btn_frame, text="Close", command=close_dialog).grid(row=0, column=1, padx=10)
+
     # Audit Functions
     def generate_audit(self):
         # Get selected sections
@@ -365,57 +683,50 @@ class UserCTRLApp(tk.Tk):
             messagebox.showinfo("No Sections", "Please select at least one audit section")
             return
 
-        self.status_var.set("Generating audit report...")
-
-        # Run in a separate thread to avoid freezing the UI
-        def run_audit():
-            try:
-                cmd = ["bash", "./scripts/generate_audit.sh"]
-                # Add include sections parameter
-                if len(sections) < 5:  # Not all sections selected
-                    cmd.extend(["-i", ",".join(sections)])
-
-                result = subprocess.run(cmd, capture_output=True, text=True)
-
-                if result.returncode == 0:
-                    # Find the generated report file
-                    report_files = [f for f in os.listdir("./") if f.startswith("audit_report_")]
-                    if report_files:
-                        latest_report = max(report_files)
-                        # Show preview
-                        with open(latest_report, "r") as f:
-                            report_content = f.read()
-
-                        self.preview_text.config(state="normal")
-                        self.preview_text.delete(1.0, tk.END)
-                        self.preview_text.insert(tk.END, report_content)
-                        self.preview_text.config(state="disabled")
-
-                        self.status_var.set(f"Audit report generated: {latest_report}")
-                    else:
-                        messagebox.showerror("Error", "Report file not found after generation")
-                else:
-                    messagebox.showerror("Error", f"Failed to generate audit report:\n{result.stderr}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to generate audit: {str(e)}")
+        if self.tasks.busy("Audit report"):
+            messagebox.showinfo("Busy", "An audit report is already being generated")
+            return
 
+        self.status_var.set("Generating audit report...")
+        refresh = self.audit_refresh_var.get()
+        diff = self.audit_diff_var.get()
+
+        def run_audit(task):
+            # Not all sections selected: pass the include list
+            result = self.helper.call("audit", sections=sections if len(sections) < 5 else None,
+                                      refresh=refresh, diff=diff)
+            task.check()
+            # Map and index the report here rather than on the Tk thread
+            return ReportBuffer(result["report"])
+
+        def show_report(buffer):
+            self.preview.load(buffer)
+            self.status_var.set(f"Audit report generated: {os.path.basename(buffer.path)}")
+
+        def show_error(e):
+            messagebox.showerror("Error", str(e))
             self.status_var.set("Ready")
 
-        threading.Thread(target=run_audit).start()
+        self.tasks.submit("Audit report", run_audit, on_done=show_report, on_error=show_error,
+                          on_cancel=lambda: self.status_var.set("Audit report cancelled"))
 
     def send_report(self):
-        # Find the latest audit report
-        report_files = [f for f in os.listdir("./") if f.startswith("audit_report_")]
-        if not report_files:
+        # Find the latest archived audit report
+        catalog = report_catalog.ReportCatalog()
+        try:
+            latest = catalog.latest()
+        finally:
+            catalog.close()
+        if latest is None:
             messagebox.showinfo("No Reports", "No audit reports found. Generate a report first.")
             return
 
-        latest_report = max(report_files)
+        latest_report = latest["path"]
 
         # Create dialog to get email
         email_dialog = tk.Toplevel(self)
         email_dialog.title("Send Report")
-        email_dialog.geometry("400x200")
+        email_dialog.geometry("480x200")
         email_dialog.configure(bg=COLORS["bg"])
 
         # Make dialog modal
@@ -423,12 +734,12 @@ class UserCTRLApp(tk.Tk):
         email_dialog.grab_set()
 
         ttk.Label(email_dialog, text="Send Audit Report", font=("Helvetica", 12, "bold")).pack(pady=10)
-        ttk.Label(email_dialog, text=f"Report: {latest_report}").pack(pady=5)
+        ttk.Label(email_dialog, text=f"Report: {os.path.basename(latest_report)}").pack(pady=5)
 
         email_frame = ttk.Frame(email_dialog)
         email_frame.pack(pady=10)
 
-        ttk.Label(email_frame, text="Recipient Email:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        ttk.Label(email_frame, text="Recipients (comma-separated):").grid(row=0, column=0, padx=5, pady=5, sticky="e")
         email_entry = ttk.Entry(email_frame, width=30)
         email_entry.grid(row=0, column=1, padx=5, pady=5)
 
@@ -438,7 +749,7 @@ class UserCTRLApp(tk.Tk):
         subject_entry.insert(0, f"System Audit Report - {datetime.now().strftime('%Y-%m-%d')}")
 
         def send():
-            email = email_entry.get()
+            email = email_entry.get().strip()
             subject = subject_entry.get()
 
             if not email:
@@ -449,34 +760,219 @@ class UserCTRLApp(tk.Tk):
                 subject = "System Audit Report"
 
             try:
-                self.status_var.set(f"Sending report to {email}...")
-                cmd = ["bash", "./scripts/send_report.sh"]
-                if subject != "System Audit Report":
-                    cmd.extend(["-s", subject])
-                cmd.extend([email, latest_report])
-
-                result = subprocess.run(cmd, capture_output=True, text=True)
+                recipients = mail_queue.split_recipients(email)
+            except mail_queue.MailError as e:
+                messagebox.showerror("Error", str(e), parent=email_dialog)
+                return
 
-                if "SUCCESS" in result.stdout:
-                    messagebox.showinfo("Success", f"Report sent to {email}")
+            def queued(message_id):
+                if email_dialog.winfo_exists():
                     email_dialog.destroy()
-                    self.status_var.set(f"Report sent to {email}")
-                else:
-                    messagebox.showerror("Error", f"Failed to send report:\n{result.stderr}")
-                    self.status_var.set("Ready")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to send report: {str(e)}")
+                self.status_var.set(f"Report queued for {', '.join(recipients)}")
+                self.poll_mail_queue(reschedule=False)
+
+            def failed(e):
+                messagebox.showerror("Error", f"Failed to queue report: {str(e)}")
                 self.status_var.set("Ready")
 
+            # Hashing and spooling a big report stays off the Tk thread; the
+            # sender thread does the rest
+            self.tasks.submit(f"Queue report for {email}",
+                              lambda task: self.mail_queue.enqueue(recipients, subject, [latest_report]),
+                              on_done=queued, on_error=failed)
+
         btn_frame = ttk.Frame(email_dialog)
         btn_frame.pack(pady=10)
 
         ttk.Button(btn_frame, text="Send", command=send).grid(row=0, column=0, padx=10)
         ttk.Button(btn_frame, text="Cancel", command=email_dialog.destroy).grid(row=0, column=1, padx=10)
 
+    def poll_mail_queue(self, reschedule=True):
+        try:
+            status = self.mail_queue.status()
+        except Exception as e:
+            self.mail_status_var.set(f"Mail queue: {e}")
+        else:
+            self.mail_status_var.set(mail_queue.describe(status))
+            if status["failed"]:
+                self.mail_retry_btn.pack(side="left", padx=10)
+            else:
+                self.mail_retry_btn.pack_forget()
+        if reschedule:
+            self.after(MAIL_POLL_MS, self.poll_mail_queue)
+
+    def retry_mail(self):
+        count = self.mail_queue.retry_failed()
+        self.status_var.set(f"Retrying {count} messages")
+        self.poll_mail_queue(reschedule=False)
+
+    def scheduled_audit(self, sections, diff, archive):
+        # Runs on a scheduler thread
+        return self.schedule_helper.call("audit", sections=sections, diff=diff, prune=archive)
+
+    def view_schedules(self):
+        # Audit schedules with their last runs, and the slowest collectors
+        schedule_dialog = tk.Toplevel(self)
+        schedule_dialog.title("Audit Schedules")
+        schedule_dialog.geometry("1000x600")
+        schedule_dialog.configure(bg=COLORS["bg"])
+
+        ttk.Label(schedule_dialog, text="Audit Schedules", font=("Helvetica", 12, "bold")).pack(pady=10)
+
+        tree_frame = ttk.Frame(schedule_dialog)
+        tree_frame.pack(fill="both", expand=True, padx=10)
+        columns = ("name", "cron", "sections", "next", "last", "duration", "result")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse", height=8)
+        for column, heading, width in (("name", "Name", 120), ("cron", "Schedule", 110),
+                                       ("sections", "Sections", 180), ("next", "Next Run", 130),
+                                       ("last", "Last Run", 130), ("duration", "Took", 70),
+                                       ("result", "Result", 220)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        tree.tag_configure("failed", foreground=COLORS["danger"])
+        tree.tag_configure("disabled", foreground="gray")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # New schedule; an existing name is replaced
+        form_frame = ttk.LabelFrame(schedule_dialog, text="Add Schedule")
+        form_frame.pack(fill="x", padx=10, pady=10)
+        name_var = tk.StringVar()
+        cron_var = tk.StringVar(value="0 2 * * *")
+        sections_var = tk.StringVar(value=",".join(s for s, var in self.audit_sections.items() if var.get()))
+        jitter_var = tk.IntVar(value=0)
+        send_var = tk.StringVar()
+        archive_var = tk.BooleanVar(value=True)
+        diff_var = tk.BooleanVar(value=False)
+        for column, (label, widget) in enumerate((
+                ("Name:", ttk.Entry(form_frame, textvariable=name_var, width=14)),
+                ("Cron:", ttk.Entry(form_frame, textvariable=cron_var, width=14)),
+                ("Sections:", ttk.Entry(form_frame, textvariable=sections_var, width=30)),
+                ("Jitter (s):", ttk.Spinbox(form_frame, from_=0, to=3600, textvariable=jitter_var, width=6)))):
+            ttk.Label(form_frame, text=label).grid(row=0, column=column * 2, padx=5, pady=5, sticky="e")
+            widget.grid(row=0, column=column * 2 + 1, padx=5, pady=5, sticky="w")
+        ttk.Label(form_frame, text="Mail to:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+        ttk.Entry(form_frame, textvariable=send_var, width=40).grid(row=1, column=1, columnspan=3, padx=5,
+                                                                     pady=5, sticky="w")
+        ttk.Checkbutton(form_frame, text="Apply archive retention",
+                        variable=archive_var).grid(row=1, column=4, columnspan=2, padx=5, sticky="w")
+        ttk.Checkbutton(form_frame, text="Only changes",
+                        variable=diff_var).grid(row=1, column=6, padx=5, sticky="w")
+
+        slow_frame = ttk.LabelFrame(schedule_dialog, text="Slowest Collectors (last 7 days)")
+        slow_frame.pack(fill="x", padx=10)
+        slow_tree = ttk.Treeview(slow_frame, columns=("collector", "average", "slowest", "runs", "timeouts"),
+                                 show="headings", height=5)
+        for column, heading, width in (("collector", "Collector", 250), ("average", "Average", 100),
+                                       ("slowest", "Slowest", 100), ("runs", "Runs", 80),
+                                       ("timeouts", "Timed Out", 80)):
+            slow_tree.heading(column, text=heading)
+            slow_tree.column(column, width=width)
+        slow_tree.pack(fill="x", padx=5, pady=5)
+
+        def seconds(value):
+            return f"{value:.2f}s" if value is not None else "-"
+
+        def refresh():
+            if not schedule_dialog.winfo_exists():
+                return
+            try:
+                schedules = self.scheduler.schedules()
+                slow = self.scheduler.slow_collectors()
+            except Exception as e:
+                self.status_var.set(f"Schedules: {e}")
+                return
+            selected = tree.selection()
+            tree.delete(*tree.get_children())
+            for row in schedules:
+                if row["status"] == "running":
+                    result = "running" + (f" ({row['coalesced']} merged)" if row["coalesced"] else "")
+                else:
+                    result = row["error"] or row["status"] or ""
+                tags = ("failed",) if row["status"] == "failed" else ()
+                if not row["enabled"]:
+                    tags = ("disabled",)
+                tree.insert("", "end", iid=row["name"], tags=tags,
+                            values=(row["name"], row["cron"], row["sections"],
+                                    audit_scheduler.when(row["next_run"]) if row["enabled"] else "disabled",
+                                    audit_scheduler.when(row["started"]),
+                                    f"{row['duration']:.1f}s" if row["duration"] is not None else "", result))
+            if selected and tree.exists(selected[0]):
+                tree.selection_set(selected[0])
+            slow_tree.delete(*slow_tree.get_children())
+            for row in slow:
+                slow_tree.insert("", "end", values=(row["collector"], seconds(row["average"]),
+                                                    seconds(row["slowest"]), row["runs"], row["timeouts"]))
+
+        def poll():
+            if schedule_dialog.winfo_exists():
+                refresh()
+                schedule_dialog.after(SCHEDULE_POLL_MS, poll)
+
+        def selected_name():
+            selection = tree.selection()
+            if not selection:
+                messagebox.showinfo("No Selection", "Please select a schedule", parent=schedule_dialog)
+                return None
+            return selection[0]
+
+        def add():
+            try:
+                jitter = jitter_var.get()
+            except tk.TclError:
+                jitter = -1
+            sections = [s.strip() for s in sections_var.get().split(",") if s.strip()]
+            try:
+                first = self.scheduler.add(name_var.get().strip(), cron_var.get(), sections, jitter,
+                                           send_var.get().strip() or None, archive_var.get(), diff_var.get())
+            except audit_scheduler.SchedulerError as e:
+                messagebox.showerror("Invalid Schedule", str(e), parent=schedule_dialog)
+                return
+            self.status_var.set(f"Schedule {name_var.get().strip()} added; first run "
+                                f"{audit_scheduler.when(first)}")
+            refresh()
+
+        def remove():
+            name = selected_name()
+            if name and messagebox.askyesno("Remove Schedule", f"Remove schedule {name}?", parent=schedule_dialog):
+                self.scheduler.remove(name)
+                refresh()
+
+        def toggle():
+            name = selected_name()
+            if name:
+                self.scheduler.set_enabled(name, not self.scheduler.schedule(name)["enabled"])
+                refresh()
+
+        def run_now():
+            name = selected_name()
+            if not name:
+                return
+
+            def done(run_id):
+                self.status_var.set(f"Scheduled audit {name} finished" if run_id is not None
+                                    else f"Schedule {name} is already running; merged into that run")
+                refresh()
+
+            self.status_var.set(f"Running scheduled audit {name}...")
+            self.tasks.submit(f"Scheduled audit {name}", lambda task: self.scheduler.trigger(name),
+                              on_done=done, on_error=lambda e: self.status_var.set(f"Scheduled audit {name}: {e}"))
+            schedule_dialog.after(200, refresh)
+
+        btn_frame = ttk.Frame(schedule_dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Add", command=add).grid(row=0, column=0, padx=10)
+        ttk.Button(btn_frame, text="Run Now", command=run_now).grid(row=0, column=1, padx=10)
+        ttk.Button(btn_frame, text="Enable/Disable", command=toggle).grid(row=0, column=2, padx=10)
+        ttk.Button(btn_frame, text="Remove", command=remove).grid(row=0, column=3, padx=10)
+        ttk.Button(btn_frame, text="Close", command=schedule_dialog.destroy).grid(row=0, column=4, padx=10)
+        poll()
+
     def view_reports(self):
         # Check if archive directory exists
-        archive_dir = "./archive/reports"
+        archive_dir = report_catalog.ARCHIVE_DIR
         if not os.path.exists(archive_dir):
             messagebox.showinfo("No Archives", "No archived reports found.")
             return
@@ -484,50 +980,121 @@ class UserCTRLApp(tk.Tk):
         # Create dialog to browse reports
         reports_dialog = tk.Toplevel(self)
         reports_dialog.title("Archived Reports")
-        reports_dialog.geometry("600x400")
+        reports_dialog.geometry("900x500")
         reports_dialog.configure(bg=COLORS["bg"])
 
         ttk.Label(reports_dialog, text="Archived Reports", font=("Helvetica", 12, "bold")).pack(pady=10)
 
+        # Filters: date range and section
+        filter_frame = ttk.Frame(reports_dialog)
+        filter_frame.pack(fill="x", padx=10)
+        from_var = tk.StringVar()
+        to_var = tk.StringVar()
+        section_var = tk.StringVar(value="All")
+        ttk.Label(filter_frame, text="From (YYYY-MM-DD):").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=from_var, width=12).pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="To:").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=to_var, width=12).pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="Section:").pack(side="left")
+        ttk.Combobox(filter_frame, textvariable=section_var, state="readonly", width=10,
+                     values=["All"] + list(self.audit_sections)).pack(side="left", padx=5)
+        count_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=count_var).pack(side="right")
+
         # Create a frame for the treeview
         tree_frame = ttk.Frame(reports_dialog)
         tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
         # Create treeview with scrollbar
-        columns = ("date", "time", "size")
+        columns = ("date", "time", "host", "sections", "size", "summary")
         tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
-        tree.heading("date", text="Date")
-        tree.heading("time", text="Time")
-        tree.heading("size", text="Size")
-        tree.column("date", width=150)
-        tree.column("time", width=100)
-        tree.column("size", width=100)
+        for column, heading, width in (("date", "Date", 90), ("time", "Time", 70), ("host", "Host", 100),
+                                       ("sections", "Sections", 170), ("size", "Size", 70),
+                                       ("summary", "Summary", 300)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+
+        # Rows come from the report catalog a page at a time, fetching the
+        # next page when the list is scrolled near its end
+        catalog = report_catalog.ReportCatalog(archive_dir=archive_dir)
+        state = {"sort": "date", "descending": True, "filters": {}, "last": None, "done": False,
+                 "loading": False}
+
+        def load_page():
+            state["loading"] = False
+            rows = catalog.page(sort=state["sort"], descending=state["descending"], after=state["last"],
+                                **state["filters"])
+            for row in rows:
+                day, _, clock = row["created"].partition(" ")
+                tree.insert("", "end", values=(day, clock, row["host"], row["sections"].replace(",", ", "),
+                                               f"{row['size'] / 1024:.1f} KB", row["summary"]),
+                            tags=(row["path"],))
+            if rows:
+                state["last"] = rows[-1]
+            state["done"] = len(rows) < report_catalog.PAGE_SIZE
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if not state["done"] and not state["loading"] and float(last) > 0.9:
+                state["loading"] = True
+                tree.after_idle(load_page)
+
+        def reload():
+            filters = {}
+            for key, var in (("date_from", from_var), ("date_to", to_var)):
+                value = var.get().strip()
+                if value:
+                    try:
+                        datetime.strptime(value, "%Y-%m-%d")
+                    except ValueError:
+                        messagebox.showerror("Invalid Date", f"{value} is not a YYYY-MM-DD date",
+                                             parent=reports_dialog)
+                        return
+                    filters[key] = value
+            if section_var.get() != "All":
+                filters["section"] = section_var.get()
+            state.update(filters=filters, last=None, done=False)
+            tree.delete(*tree.get_children())
+            count_var.set(f"{catalog.count(**filters)} reports")
+            load_page()
+
+        def sort_by(column):
+            # Clicking the sorted column again reverses the order
+            key = {"date": "date", "time": "date", "host": "host", "size": "size"}[column]
+            state["descending"] = not state["descending"] if state["sort"] == key else key != "host"
+            state["sort"] = key
+            reload()
+
+        for column in ("date", "time", "host", "size"):
+            tree.heading(column, command=lambda c=column: sort_by(c))
 
         scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        tree.configure(yscrollcommand=on_scroll)
         tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        # Populate treeview with reports
-        reports = []
-        for root, dirs, files in os.walk(archive_dir):
-            for file in files:
-                if file.endswith(".txt"):
-                    file_path = os.path.join(root, file)
-                    file_stat = os.stat(file_path)
-                    file_time = datetime.fromtimestamp(file_stat.st_mtime)
-                    reports.append({
-                        "path": file_path,
-                        "date": file_time.strftime("%Y-%m-%d"),
-                        "time": file_time.strftime("%H:%M:%S"),
-                        "size": f"{file_stat.st_size / 1024:.1f} KB"
-                    })
-
-        # Sort reports by date and time (newest first)
-        reports.sort(key=lambda x: x["path"], reverse=True)
-
-        for report in reports:
-            tree.insert("", "end", values=(report["date"], report["time"], report["size"]), tags=(report["path"],))
+        def close_dialog():
+            catalog.close()
+            reports_dialog.destroy()
+
+        reports_dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+        reload()
+
+        # Catalog reports archived outside the helper (legacy script, copies)
+        # in the background, then refresh if anything changed
+        def sync_catalog(task):
+            background = report_catalog.ReportCatalog(archive_dir=archive_dir)
+            try:
+                return background.sync()
+            finally:
+                background.close()
+
+        def synced(result):
+            if any(result) and reports_dialog.winfo_exists():
+                reload()
+
+        self.tasks.submit("Report catalog", sync_catalog, on_done=synced,
+                          on_error=lambda e: self.status_var.set(f"Report catalog: {e}"))
 
         # Function to view selected report
         def view_report():
@@ -536,41 +1103,200 @@ class UserCTRLApp(tk.Tk):
                 messagebox.showinfo("Select Report", "Please select a report to view")
                 return
 
-            item = tree.item(selection[0])
             file_path = tree.item(selection[0], "tags")[0]
 
-            try:
-                with open(file_path, "r") as f:
-                    report_content = f.read()
-
-                # Create a new window to display the report
-                view_window = tk.Toplevel(reports_dialog)
-                view_window.title(f"Report: {os.path.basename(file_path)}")
-                view_window.geometry("700x500")
-
-                text_widget = tk.Text(view_window, wrap="word")
-                text_widget.pack(fill="both", expand=True, padx=10, pady=10)
-                text_widget.insert(tk.END, report_content)
-                text_widget.config(state="disabled")
-            except Exception as e:
+            def failed(e):
                 messagebox.showerror("Error", f"Failed to open report: {str(e)}")
+                self.status_var.set("Ready")
+
+            def opened(buffer):
+                ReportViewer(reports_dialog if reports_dialog.winfo_exists() else self, buffer)
+                self.status_var.set("Ready")
+
+            # Mapping and indexing a big report happens off the Tk thread
+            self.status_var.set(f"Opening {os.path.basename(file_path)}...")
+            self.tasks.submit(f"Open {file_path}", lambda task: ReportBuffer(file_path),
+                              on_done=opened, on_error=failed)
 
         btn_frame = ttk.Frame(reports_dialog)
         btn_frame.pack(pady=10)
 
-        ttk.Button(btn_frame, text="View Report", command=view_report).grid(row=0, column=0, padx=10)
-        ttk.Button(btn_frame, text="Close", command=reports_dialog.destroy).grid(row=0, column=1, padx=10)
+        ttk.Button(btn_frame, text="Apply Filters", command=reload).grid(row=0, column=0, padx=10)
+        ttk.Button(btn_frame, text="View Report", command=view_report).grid(row=0, column=1, padx=10)
+        ttk.Button(btn_frame, text="Close", command=close_dialog).grid(row=0, column=2, padx=10)
+
+    def search_reports(self):
+        # Full-text search over every archived report
+        search_dialog = tk.Toplevel(self)
+        search_dialog.title("Search Reports")
+        search_dialog.geometry("900x500")
+        search_dialog.configure(bg=COLORS["bg"])
+
+        query_frame = ttk.Frame(search_dialog)
+        query_frame.pack(fill="x", padx=10, pady=10)
+        ttk.Label(query_frame, text="Find lines containing:").pack(side="left")
+        query_var = tk.StringVar()
+        entry = ttk.Entry(query_frame, textvariable=query_var, width=40)
+        entry.pack(side="left", padx=5)
+        oldest_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(query_frame, text="Oldest first", variable=oldest_var).pack(side="left", padx=5)
+        result_var = tk.StringVar()
+        ttk.Label(query_frame, textvariable=result_var).pack(side="right")
+
+        tree_frame = ttk.Frame(search_dialog)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        columns = ("date", "host", "line", "text")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column, heading, width in (("date", "Date", 140), ("host", "Host", 100), ("line", "Line", 60),
+                                       ("text", "Text", 560)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # item id -> (report path, line number)
+        matches = {}
+
+        def run_search(task, query, oldest):
+            # Its own connection: sqlite objects stay on their thread
+            catalog = report_catalog.ReportCatalog()
+            try:
+                return report_search.search(catalog, query, oldest_first=oldest)
+            finally:
+                catalog.close()
+
+        def show_results(results):
+            if not search_dialog.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            matches.clear()
+            for row, lines in results:
+                for number, text in lines:
+                    item = tree.insert("", "end", values=(row["created"], row["host"], number + 1, text.strip()))
+                    matches[item] = (row["path"], number)
+            result_var.set(f"{len(results)} reports" if results else "No matches")
+
+        def search():
+            query = query_var.get().strip()
+            if not query:
+                return
+            result_var.set("Searching...")
+            self.tasks.submit("Search reports", run_search, query, oldest_var.get(), on_done=show_results,
+                              on_error=lambda e: result_var.set(f"Search failed: {e}"))
+
+        def open_match(event=None):
+            selection = tree.selection()
+            if not selection:
+                return
+            path, number = matches[selection[0]]
+            # Highlight the first word; the viewer's find is a plain substring
+            words = query_var.get().split()
+            query = words[0] if words else None
+
+            def opened(buffer):
+                ReportViewer(search_dialog if search_dialog.winfo_exists() else self, buffer, number, query)
+
+            self.tasks.submit(f"Open {path}", lambda task: ReportBuffer(path), on_done=opened,
+                              on_error=lambda e: messagebox.showerror("Error", f"Failed to open report: {e}"))
+
+        entry.bind("<Return>", lambda e: search())
+        tree.bind("<Double-1>", open_match)
+        entry.focus_set()
+
+        btn_frame = ttk.Frame(search_dialog)
+        btn_frame.pack(pady=(0, 10))
+        ttk.Button(btn_frame, text="Search", command=search).grid(row=0, column=0, padx=10)
+        ttk.Button(btn_frame, text="Open Report", command=open_match).grid(row=0, column=1, padx=10)
+        ttk.Button(btn_frame, text="Close", command=search_dialog.destroy).grid(row=0, column=2, padx=10)
+
+    def view_suspects(self):
+        # Sources with many failed SSH logins, from the helper's auth log store
+        suspects_dialog = tk.Toplevel(self)
+        suspects_dialog.title("Brute-force Suspects")
+        suspects_dialog.geometry("900x500")
+        suspects_dialog.configure(bg=COLORS["bg"])
+
+        ttk.Label(suspects_dialog, text="Brute-force Suspects", font=("Helvetica", 12, "bold")).pack(pady=10)
+
+        filter_frame = ttk.Frame(suspects_dialog)
+        filter_frame.pack(fill="x", padx=10)
+        min_var = tk.IntVar(value=authlog.SUSPECT_FAILURES)
+        since_var = tk.StringVar()
+        ttk.Label(filter_frame, text="At least").pack(side="left")
+        ttk.Spinbox(filter_frame, from_=1, to=100000, textvariable=min_var, width=7).pack(side="left", padx=5)
+        ttk.Label(filter_frame, text="failures, last seen since (YYYY-MM-DD):").pack(side="left")
+        ttk.Entry(filter_frame, textvariable=since_var, width=12).pack(side="left", padx=5)
+        hourly_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=hourly_var).pack(side="right")
+
+        tree_frame = ttk.Frame(suspects_dialog)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        columns = ("source", "failures", "users", "first", "last", "login")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        for column, heading, width in (("source", "Source", 200), ("failures", "Failures", 80),
+                                       ("users", "Users Tried", 80), ("first", "First Seen", 150),
+                                       ("last", "Last Seen", 150), ("login", "Logged In", 150)):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width)
+        # A source that got in after failing is the one to look at first
+        tree.tag_configure("compromised", foreground=COLORS["danger"])
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        def show(result):
+            if not suspects_dialog.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for row in result["suspects"]:
+                tree.insert("", "end", values=(row["source"], row["failures"], row["users"], row["first"],
+                                               row["last"], row["last_accepted"] if row["compromised"] else ""),
+                            tags=("compromised",) if row["compromised"] else ())
+            hourly_var.set(f"{sum(count for _, count in result['hourly'])} failures in the last 24 hours")
+
+        def refresh():
+            since = since_var.get().strip()
+            if since:
+                try:
+                    datetime.strptime(since, "%Y-%m-%d")
+                except ValueError:
+                    messagebox.showerror("Invalid Date", f"{since} is not a YYYY-MM-DD date", parent=suspects_dialog)
+                    return
+            try:
+                min_failures = min_var.get()
+            except tk.TclError:
+                min_failures = authlog.SUSPECT_FAILURES
+            hourly_var.set("Reading the auth log...")
+            self.tasks.submit("Brute-force suspects",
+                              lambda task: self.helper.call("auth_suspects", min_failures=min_failures,
+                                                            since=since or None),
+                              on_done=show, on_error=lambda e: hourly_var.set(f"Failed: {e}"))
+
+        btn_frame = ttk.Frame(suspects_dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Refresh", command=refresh).grid(row=0, column=0, padx=10)
+        ttk.Button(btn_frame, text="Close", command=suspects_dialog.destroy).grid(row=0, column=1, padx=10)
+        refresh()
 
     # Bulk Operations Functions
     def browse_csv(self):
         file_path = filedialog.askopenfilename(
             title="Select CSV File",
-            filetypes=[("CSV Files", "*.csv"), ("All Files", "*.*")]
+            filetypes=[("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl"), ("All Files", "*.*")]
         )
         if file_path:
             self.csv_path_var.set(file_path)
 
     def bulk_add(self):
+        self.start_bulk_job(dry_run=False)
+
+    def batch_operations(self):
+        self.start_bulk_job(dry_run=True, kind="batch")
+
+    def start_bulk_job(self, dry_run, kind="add"):
         csv_path = self.csv_path_var.get()
         if not csv_path:
             messagebox.showinfo("No File", "Please select a CSV file first")
@@ -580,33 +1306,140 @@ class UserCTRLApp(tk.Tk):
             messagebox.showerror("Error", "Selected file does not exist")
             return
 
-        self.status_var.set("Adding users from CSV...")
+        if self.bulk_job is not None:
+            messagebox.showinfo("Busy", "A bulk operation is already running")
+            return
 
-        # Run in a separate thread to avoid freezing the UI
-        def run_bulk_add():
-            try:
-                cmd = ["bash", "./scripts/bulk_add.sh", "-f", csv_path]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-
-                self.results_text.config(state="normal")
-                self.results_text.delete(1.0, tk.END)
-                self.results_text.insert(tk.END, result.stdout)
-                if result.stderr:
-                    self.results_text.insert(tk.END, "\nErrors:\n" + result.stderr)
-                self.results_text.config(state="disabled")
-
-                if result.returncode == 0:
-                    self.status_var.set("Users added successfully from CSV")
+        os.makedirs(journal.JOURNAL_DIR, exist_ok=True)
+        results_file = os.path.join(journal.JOURNAL_DIR, f"bulk_results_{datetime.now():%Y%m%d_%H%M%S}.txt")
+        resume = self.resume_var.get() and not dry_run and kind == "add"
+        self.bulk_job = {
+            "dry_run": dry_run,
+            "kind": kind,
+            "results_file": results_file,
+            "started": time.monotonic(),
+        }
+
+        self.results_text.config(state="normal")
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.config(state="disabled")
+        self.bulk_progress.config(value=0, maximum=1)
+        self.bulk_stats_var.set("Starting...")
+        if kind == "batch":
+            self.status_var.set("Planning batch operations..." if dry_run else "Applying batch operations...")
+        else:
+            self.status_var.set("Performing dry run..." if dry_run else "Adding users from CSV...")
+
+        # The worker only writes to the results file and posts events;
+        # the widgets are updated by the callbacks on the main loop
+        def run_bulk_job(task):
+            with open(results_file, "w") as spill:
+                def out(line):
+                    spill.write(line + "\n")
+                    task.post("line", line)
+
+                def on_progress(done, total, counts):
+                    if dry_run:
+                        task.check()
+                    task.post("progress", done, total, counts)
+
+                if kind == "batch":
+                    result = batch_ops.run(csv_path, dry_run=dry_run, out=out, on_progress=on_progress,
+                                           cancelled=lambda: task.cancelled)
                 else:
-                    self.status_var.set("Failed to add users from CSV")
-
-                # Refresh user list
-                self.refresh_users()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to add users: {str(e)}")
-                self.status_var.set("Ready")
+                    result = bulk_engine.run(csv_path, dry_run=dry_run, out=out, on_progress=on_progress,
+                                             resume=resume, cancelled=lambda: task.cancelled)
+            return result + (task.cancelled,)
+
+        if kind == "batch":
+            name = "Batch plan" if dry_run else "Batch operations"
+        else:
+            name = "Dry run" if dry_run else "Bulk add"
+        self.tasks.submit(name, run_bulk_job, on_events=self.show_bulk_events,
+                          on_done=self.finish_bulk_job, on_error=self.fail_bulk_job,
+                          on_cancel=self.cancel_bulk_job)
+
+    def show_bulk_events(self, events):
+        job = self.bulk_job
+        lines = []
+        progress = None
+        for event in events:
+            if event[0] == "line":
+                lines.append(event[1])
+            else:
+                progress = event[1:]
+
+        if lines:
+            self.append_results("\n".join(lines) + "\n")
+
+        if progress is not None:
+            done, total, counts = progress
+            elapsed = max(time.monotonic() - job["started"], 1e-6)
+            rate = done / elapsed
+            eta = (total - done) / rate if rate and total > done else 0
+            self.bulk_progress.config(maximum=max(total, 1), value=done)
+            self.bulk_stats_var.set(
+                f"{done}/{total} rows  |  {rate:.0f} rows/s  |  ETA {int(eta) // 60}:{int(eta) % 60:02d}  |  "
+                f"OK {counts['SUCCESS']}  Skipped {counts['SKIPPED']}  Failed {counts['FAILED']}")
+
+    def fail_bulk_job(self, e):
+        self.bulk_job = None
+        messagebox.showerror("Error", f"Bulk operation failed: {str(e)}")
+        self.status_var.set("Ready")
 
-        threading.Thread(target=run_bulk_add).start()
+    def cancel_bulk_job(self):
+        job = self.bulk_job
+        self.bulk_job = None
+        self.status_var.set("Bulk operation cancelled")
+        self.bulk_stats_var.set(f"Cancelled  |  Partial results: {job['results_file']}")
+        if not job["dry_run"]:
+            self.sync_users()
+
+    def finish_bulk_job(self, result):
+        job = self.bulk_job
+        self.bulk_job = None
+        success, failed, cancelled = result
+        self.bulk_stats_var.set(self.bulk_stats_var.get() + f"  |  Full results: {job['results_file']}")
+        if cancelled:
+            self.status_var.set(f"Bulk operation cancelled after {success} users")
+            if not job["dry_run"]:
+                self.sync_users()
+            return
+        if job["kind"] == "batch":
+            if job["dry_run"]:
+                self.status_var.set("Batch plan ready")
+                if success and messagebox.askyesno(
+                        "Apply Batch",
+                        f"Apply the changes shown for {success} users?"
+                        + (f"\n{failed} rows with errors will be skipped." if failed else "")):
+                    self.start_bulk_job(dry_run=False, kind="batch")
+                return
+            self.status_var.set(f"Batch operations applied: {success} users changed, {failed} skipped or failed")
+            # One list refresh for the whole batch
+            self.sync_users()
+            return
+        if job["dry_run"]:
+            self.status_var.set("Dry run completed")
+            return
+        if success and not failed:
+            self.status_var.set("Users added successfully from CSV")
+        elif success:
+            self.status_var.set(f"Added {success} users from CSV, {failed} failed")
+        else:
+            self.status_var.set("Failed to add users from CSV")
+
+        # Refresh user list
+        self.sync_users()
+
+    def append_results(self, text):
+        # Keep only the newest lines in the widget; the file has everything
+        self.results_text.config(state="normal")
+        self.results_text.insert(tk.END, text)
+        line_count = int(self.results_text.index("end-1c").split(".")[0])
+        if line_count > MAX_RESULT_LINES:
+            self.results_text.delete("1.0", f"{line_count - MAX_RESULT_LINES + 1}.0")
+        self.results_text.see(tk.END)
+        self.results_text.config(state="disabled")
 
     def download_template(self):
         save_path = filedialog.asksaveasfilename(
@@ -625,45 +1458,33 @@ class UserCTRLApp(tk.Tk):
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save template: {str(e)}")
 
-    def dry_run(self):
-        csv_path = self.csv_path_var.get()
-        if not csv_path:
-            messagebox.showinfo("No File", "Please select a CSV file first")
-            return
-
-        if not os.path.exists(csv_path):
-            messagebox.showerror("Error", "Selected file does not exist")
-            return
-
-        self.status_var.set("Performing dry run...")
-
-        # Run in a separate thread to avoid freezing the UI
-        def run_dry_run():
+    def download_batch_template(self):
+        save_path = filedialog.asksaveasfilename(
+            title="Save Batch Template",
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if save_path:
             try:
-                cmd = ["bash", "./scripts/bulk_add.sh", "-f", csv_path, "-d"]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-
-                self.results_text.config(state="normal")
-                self.results_text.delete(1.0, tk.END)
-                self.results_text.insert(tk.END, "DRY RUN RESULTS:\n\n")
-                self.results_text.insert(tk.END, result.stdout)
-                if result.stderr:
-                    self.results_text.insert(tk.END, "\nErrors:\n" + result.stderr)
-                self.results_text.config(state="disabled")
-
-                self.status_var.set("Dry run completed")
+                with open(save_path, "w") as f:
+                    f.write("action,username,reason,expire_days,keep_home,shell,home,move_home,groups,append_groups,role\n")
+                    f.write("lock,jdoe,Semester ended,30,,,,,,,\n")
+                    f.write("unlock,asmith,,,,,,,,,\n")
+                    f.write("delete,bwilson,,,y,,,,,,\n")
+                    f.write("modify,asmith,,,,/bin/zsh,,,audio,y,admin\n")
+                messagebox.showinfo("Template Saved", f"Batch template saved to {save_path}")
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to perform dry run: {str(e)}")
-                self.status_var.set("Ready")
+                messagebox.showerror("Error", f"Failed to save template: {str(e)}")
 
-        threading.Thread(target=run_dry_run).start()
+    def dry_run(self):
+        self.start_bulk_job(dry_run=True)
 
     # Helper Functions
     def open_dialog(self, script_name, preselected_username=None):
         dialog = UserDialog(self, script_name, preselected_username)
         self.wait_window(dialog)
         # Refresh user list after dialog closes
-        self.refresh_users()
+        self.sync_users()
 
 class UserDialog(tk.Toplevel):
     def __init__(self, parent, script_type, preselected_username=None):
@@ -903,43 +1724,17 @@ class UserDialog(tk.Toplevel):
             messagebox.showerror("Error", "Role is required")
             return
 
-        # Create a temporary file with inputs
-        with open("temp_input.txt", "w") as f:
-            f.write(f"{username}\n{role}\n{password}\n{password}\n")
-
-        try:
-            # Run the bash script directly (assuming proper permissions)
-            cmd = ["bash", "./scripts/add_user.sh"]
-            process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            # Send the input file content
-            with open("temp_input.txt", "r") as f:
-                input_content = f.read()
-            stdout, stderr = process.communicate(input=input_content)
-
-            if "successfully" in stdout:
-                messagebox.showinfo("Success", f"User {username} added successfully with role {role}")
-                self.parent.status_var.set(f"User {username} added successfully")
-                self.destroy()
-            else:
-                error_msg = stderr if stderr else stdout
-                messagebox.showerror("Error", f"Failed to add user:\n{error_msg}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to add user: {str(e)}")
-        finally:
-            # Clean up
-            if os.path.exists("temp_input.txt"):
-                os.remove("temp_input.txt")
+        self.run_request(
+            f"Add user {username}",
+            "add_user",
+            {"username": username, "password": password, "role": role, "shell": shell, "fullname": fullname},
+            f"User {username} added successfully with role {role}",
+            f"User {username} added successfully",
+            "Failed to add user"
+        )
 
     def execute_delete_user(self):
         username = self.username.get()
-        keep_home = "y" if self.keep_home.get() else "n"
 
         if not username:
             messagebox.showerror("Error", "Username is required")
@@ -953,39 +1748,14 @@ class UserDialog(tk.Toplevel):
         if not confirm:
             return
 
-        # Create a temporary file with inputs
-        with open("temp_input.txt", "w") as f:
-            f.write(f"{username}\ny\n{keep_home}\n")
-
-        try:
-            # Run the bash script directly
-            cmd = ["bash", "./scripts/delete_user.sh"]
-            process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            # Send the input file content
-            with open("temp_input.txt", "r") as f:
-                input_content = f.read()
-            stdout, stderr = process.communicate(input=input_content)
-
-            if "successfully" in stdout:
-                messagebox.showinfo("Success", f"User {username} deleted successfully")
-                self.parent.status_var.set(f"User {username} deleted successfully")
-                self.destroy()
-            else:
-                error_msg = stderr if stderr else stdout
-                messagebox.showerror("Error", f"Failed to delete user:\n{error_msg}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to delete user: {str(e)}")
-        finally:
-            # Clean up
-            if os.path.exists("temp_input.txt"):
-                os.remove("temp_input.txt")
+        self.run_request(
+            f"Delete user {username}",
+            "delete_user",
+            {"username": username, "remove_home": not self.keep_home.get()},
+            f"User {username} deleted successfully",
+            f"User {username} deleted successfully",
+            "Failed to delete user"
+        )
 
     def execute_lock_user(self):
         username = self.username.get()
@@ -997,47 +1767,25 @@ class UserDialog(tk.Toplevel):
             messagebox.showerror("Error", "Username is required")
             return
 
-        # Build command
-        cmd = ["bash", "./scripts/lock_user.sh"]
         if action == "unlock":
-            cmd.extend(["-u"])
-        if reason:
-            cmd.extend(["-r", reason])
-        if expire_days and expire_days != "0":
-            cmd.extend(["-e", expire_days])
-
-        # Create a temporary file with inputs
-        with open("temp_input.txt", "w") as f:
-            f.write(f"{username}\n{reason}\n")
-
-        try:
-            process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            # Send the input file content
-            with open("temp_input.txt", "r") as f:
-                input_content = f.read()
-            stdout, stderr = process.communicate(input=input_content)
-
-            if "successfully" in stdout:
-                action_text = "unlocked" if action == "unlock" else "locked"
-                messagebox.showinfo("Success", f"User {username} {action_text} successfully")
-                self.parent.status_var.set(f"User {username} {action_text} successfully")
-                self.destroy()
-            else:
-                error_msg = stderr if stderr else stdout
-                messagebox.showerror("Error", f"Failed to {action} user:\n{error_msg}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to {action} user: {str(e)}")
-        finally:
-            # Clean up
-            if os.path.exists("temp_input.txt"):
-                os.remove("temp_input.txt")
+            op, args = "unlock_user", {"username": username}
+        else:
+            try:
+                days = int(expire_days or 0)
+            except ValueError:
+                messagebox.showerror("Error", "Expire After must be a number of days")
+                return
+            op, args = "lock_user", {"username": username, "reason": reason, "expire_days": days}
+
+        action_text = "unlocked" if action == "unlock" else "locked"
+        self.run_request(
+            f"{action.capitalize()} user {username}",
+            op,
+            args,
+            f"User {username} {action_text} successfully",
+            f"User {username} {action_text} successfully",
+            f"Failed to {action} user"
+        )
 
     def execute_modify_user(self):
         username = self.username.get()
@@ -1057,43 +1805,56 @@ class UserDialog(tk.Toplevel):
             messagebox.showinfo("No Changes", "No modifications specified")
             return
 
-        # Build command
-        cmd = ["bash", "./scripts/modify_user.sh", "-u", username]
-        if new_username:
-            cmd.extend(["-n", new_username])
-        if shell:
-            cmd.extend(["-s", shell])
-        if home_dir:
-            cmd.extend(["-d", home_dir])
-        if move_home:
-            cmd.extend(["-m"])
-        if groups:
-            cmd.extend(["-a", "-G", groups])
-        
-        # Add role parameter if specified
-        if new_role:
-            cmd.extend(["-r", new_role])
+        args = {
+            "username": username,
+            "new_username": new_username,
+            "shell": shell,
+            "home": home_dir,
+            "move_home": move_home,
+            "groups": groups,
+            "append_groups": True,
+            "role": new_role,
+        }
+        self.run_request(
+            f"Modify user {username}",
+            "modify_user",
+            args,
+            f"User {username} modified successfully",
+            f"User {username} modified successfully",
+            "Failed to modify user"
+        )
 
-        try:
-            process = subprocess.Popen(
-                cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            stdout, stderr = process.communicate()
-
-            if "successfully" in stdout:
-                messagebox.showinfo("Success", f"User {username} modified successfully")
-                self.parent.status_var.set(f"User {username} modified successfully")
+    def run_request(self, name, op, args, success_message, status_message, failure_message):
+        # Sent to the userctrld helper from the app's task runner so the
+        # window keeps repainting; the dialog closes itself on success
+        tasks = self.parent.tasks
+        if tasks.busy(name):
+            return
+        self.parent.status_var.set(f"{name}...")
+        self.config(cursor="watch")
+
+        def done(result):
+            if self.winfo_exists():
+                self.config(cursor="")
+            messagebox.showinfo("Success", success_message)
+            self.parent.status_var.set(status_message)
+            if self.winfo_exists():
                 self.destroy()
-            else:
-                error_msg = stderr if stderr else stdout
-                messagebox.showerror("Error", f"Failed to modify user:\n{error_msg}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to modify user: {str(e)}")
+            self.parent.sync_users()
+
+        def failed(e):
+            if self.winfo_exists():
+                self.config(cursor="")
+            messagebox.showerror("Error", f"{failure_message}:\n{str(e)}")
+            self.parent.status_var.set("Ready")
+
+        def cancelled():
+            if self.winfo_exists():
+                self.config(cursor="")
+            self.parent.status_var.set(f"{name} cancelled")
+
+        tasks.submit(name, lambda task: self.parent.helper.call(op, **args),
+                     on_done=done, on_error=failed, on_cancel=cancelled)
 
 if __name__ == "__main__":
     app = UserCTRLApp()
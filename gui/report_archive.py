@@ -0,0 +1,262 @@
+# report_archive.py - Compressed, date-partitioned storage for audit reports
+# Reports are stored as archive/reports/YYYY/MM/DD/<name>.txt.gz (or .xz)
+# and read back through open_report(), which decompresses as it streams, so
+# nothing is expanded to a temporary file. prune() thins the archive by age:
+# everything is kept for a week, then the newest report of each day, then
+# the newest of each month.
+#
+# Usage: python3 gui/report_archive.py store REPORT...
+#        python3 gui/report_archive.py prune [--keep-all-days N] [--daily-days N] [--dry-run]
+#        python3 gui/report_archive.py cat REPORT
+
+import argparse
+import gzip
+import lzma
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Everything the GUI, helper, CLI, scheduler and scripts keep (reports,
+# catalog, snapshots, caches, mail spool) lives under one directory:
+# <repo>/archive, or $USERCTRL_ARCHIVE_DIR, whatever the current directory
+ARCHIVE_ROOT = os.environ.get("USERCTRL_ARCHIVE_DIR") or os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "archive"))
+ARCHIVE_DIR = os.path.join(ARCHIVE_ROOT, "reports")
+SNAPSHOT_DIR = os.path.join(ARCHIVE_ROOT, "snapshots")
+
+# gz is quick to write and read; xz is about a third smaller and slower
+COMPRESSION = "gz"
+OPENERS = {".gz": gzip.open, ".xz": lzma.open}
+
+# Retention tiers: keep everything this many days, then one report per day
+# until DAILY_DAYS, then one per month
+KEEP_ALL_DAYS = 7
+DAILY_DAYS = 90
+
+STAMP = re.compile(r"_(\d{8})_(\d{6})")
+
+
+def is_report(name):
+    return name.endswith((".txt", ".txt.gz", ".txt.xz"))
+
+
+def plain_name(name):
+    # audit_report_X.txt.gz -> audit_report_X.txt
+    for suffix in OPENERS:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def report_time(path):
+    # The timestamp in the file name, else the modification time
+    match = STAMP.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime.strptime("".join(match.groups()), "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.stat(path).st_mtime)
+
+
+def open_report(path, mode="rt"):
+    # Readable stream of a report, whichever way it is stored
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+    if "b" in mode:
+        return opener(path, mode)
+    return opener(path, mode, encoding="utf-8", errors="replace")
+
+
+def partition(archive_dir, when):
+    return os.path.join(archive_dir, f"{when:%Y}", f"{when:%m}", f"{when:%d}")
+
+
+def store_text(text, name, when=None, archive_dir=ARCHIVE_DIR, compression=COMPRESSION):
+    # Compress a report straight into its date partition; returns the path
+    when = when or datetime.now()
+    directory = partition(archive_dir, when)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{plain_name(name)}.{compression}")
+    # A second report within the same second gets a name of its own
+    base, ext = os.path.splitext(plain_name(name))
+    copy = 2
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base}_{copy}{ext}.{compression}")
+        copy += 1
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        with OPENERS["." + compression](tmp, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def store_file(source, archive_dir=ARCHIVE_DIR, compression=COMPRESSION, when=None):
+    # Compress an existing report into the archive a block at a time
+    when = when or report_time(source)
+    directory = partition(archive_dir, when)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{plain_name(os.path.basename(source))}.{compression}")
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        with open_report(source, "rb") as src, OPENERS["." + compression](tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def migrate(archive_dir=ARCHIVE_DIR, compression=COMPRESSION, catalog=None):
+    # Compress and partition reports stored the old way (flat, plain .txt);
+    # returns [(old path, new path)]. The catalog swaps the old file for
+    # the new one before the old one is deleted.
+    moved = []
+    for root, dirs, files in os.walk(archive_dir):
+        for name in sorted(files):
+            if name.endswith(".txt"):
+                old = os.path.join(root, name)
+                new = store_file(old, archive_dir, compression)
+                if catalog is not None:
+                    catalog.forget([old])
+                    catalog.add(new)
+                os.unlink(old)
+                moved.append((old, new))
+    return moved
+
+
+def expired(entries, now, keep_all_days=KEEP_ALL_DAYS, daily_days=DAILY_DAYS):
+    # entries: [(time, group, path)], where group separates kinds of report
+    # (a diff report never stands in for a full one). Returns the paths
+    # the retention tiers drop.
+    keep_all = now - timedelta(days=keep_all_days)
+    daily = now - timedelta(days=daily_days)
+    kept = set()
+    drop = []
+    # Newest first, so the first report seen in a bucket is the one kept
+    for when, group, path in sorted(entries, reverse=True):
+        if when >= keep_all:
+            continue
+        bucket = (group, f"{when:%Y-%m-%d}" if when >= daily else f"{when:%Y-%m}")
+        if bucket in kept:
+            drop.append(path)
+        else:
+            kept.add(bucket)
+    return drop
+
+
+def report_group(name):
+    return "diff" if re.search(r"_diff(_\d+)?\.txt$", plain_name(name)) else "full"
+
+
+def remove_empty_dirs(top):
+    for root, dirs, files in os.walk(top, topdown=False):
+        if root != top and not os.listdir(root):
+            os.rmdir(root)
+
+
+def prune(archive_dir=ARCHIVE_DIR, snapshot_dir=SNAPSHOT_DIR, keep_all_days=KEEP_ALL_DAYS,
+          daily_days=DAILY_DAYS, now=None, dry_run=False, catalog=None):
+    # Apply the retention tiers to reports and snapshots; returns the
+    # removed paths. The catalog forgets reports before they are deleted.
+    now = now or datetime.now()
+    reports = []
+    for root, dirs, files in os.walk(archive_dir):
+        for name in files:
+            if is_report(name):
+                path = os.path.join(root, name)
+                reports.append((report_time(path), report_group(name), path))
+    snapshots = []
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        for name in os.listdir(snapshot_dir):
+            if name.endswith(".json.gz"):
+                path = os.path.join(snapshot_dir, name)
+                snapshots.append((report_time(path), "snapshot", path))
+
+    removed = expired(reports, now, keep_all_days, daily_days)
+    removed_snapshots = expired(snapshots, now, keep_all_days, daily_days)
+    if not dry_run:
+        if catalog is not None:
+            catalog.forget(removed)
+        for path in removed + removed_snapshots:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        remove_empty_dirs(archive_dir)
+    return removed, removed_snapshots
+
+
+def prune_archive(archive_dir=ARCHIVE_DIR, snapshot_dir=SNAPSHOT_DIR, keep_all_days=KEEP_ALL_DAYS,
+                  daily_days=DAILY_DAYS, dry_run=False, log=None):
+    # migrate + prune + catalog upkeep, for the daemon's background thread
+    # and the CLI
+    import report_catalog
+
+    if dry_run:
+        moved = []
+        removed, removed_snapshots = prune(archive_dir, snapshot_dir, keep_all_days, daily_days, dry_run=True)
+    else:
+        catalog = report_catalog.ReportCatalog(archive_dir=archive_dir)
+        try:
+            moved = migrate(archive_dir, catalog=catalog)
+            removed, removed_snapshots = prune(archive_dir, snapshot_dir, keep_all_days, daily_days,
+                                               catalog=catalog)
+        finally:
+            catalog.close()
+    if log:
+        log(f"Archive pruned: {len(removed)} reports and {len(removed_snapshots)} snapshots removed, "
+            f"{len(moved)} reports compressed")
+    return moved, removed, removed_snapshots
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed audit report archive")
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    p = commands.add_parser("store", help="compress reports into the archive and catalog them")
+    p.add_argument("reports", nargs="+")
+    p.add_argument("--compression", choices=["gz", "xz"], default=COMPRESSION)
+    p = commands.add_parser("prune", help="apply the retention tiers")
+    p.add_argument("--keep-all-days", type=int, default=KEEP_ALL_DAYS)
+    p.add_argument("--daily-days", type=int, default=DAILY_DAYS)
+    p.add_argument("--snapshots", default=SNAPSHOT_DIR, help="snapshot directory to prune as well")
+    p.add_argument("-n", "--dry-run", action="store_true", help="list what would be removed")
+    p = commands.add_parser("cat", help="print a report, decompressing it")
+    p.add_argument("report")
+    args = parser.parse_args(argv)
+
+    if args.command == "store":
+        import report_catalog
+        catalog = report_catalog.ReportCatalog(archive_dir=args.archive)
+        try:
+            for source in args.reports:
+                path = store_file(source, args.archive, args.compression)
+                catalog.add(path)
+                print(path)
+        finally:
+            catalog.close()
+    elif args.command == "prune":
+        moved, removed, removed_snapshots = prune_archive(args.archive, args.snapshots, args.keep_all_days,
+                                                          args.daily_days, args.dry_run)
+        for path in removed + removed_snapshots:
+            print(("would remove " if args.dry_run else "removed ") + path)
+        print(f"{len(removed)} reports, {len(removed_snapshots)} snapshots, {len(moved)} compressed")
+    else:
+        with open_report(args.report, "rb") as f:
+            shutil.copyfileobj(f, sys.stdout.buffer)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+# report_catalog.py - SQLite catalog of archived audit reports
+# One row per archived report (time, host, sections, kind, size, summary),
+# written when a report is archived, so browsing the archive is an indexed
+# query for one page of rows instead of a walk and stat of every file.
+# sync() picks up reports archived by other means (the legacy script, a
+# copy from another host) and forgets files that were deleted. Each report's
+# lines are also indexed for full-text search (see report_search.py).
+#
+# Usage: python3 gui/report_catalog.py add REPORT...
+#        python3 gui/report_catalog.py sync
+#        python3 gui/report_catalog.py list [--from DATE] [--to DATE] [--section NAME] [--limit N]
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+import report_search
+from report_archive import ARCHIVE_DIR, ARCHIVE_ROOT, is_report, open_report, report_group
+
+CATALOG_PATH = os.path.join(ARCHIVE_ROOT, "catalog.db")
+PAGE_SIZE = 200
+
+SECTION_HEADINGS = {
+    "SYSTEM INFORMATION": "system",
+    "MEMORY INFORMATION": "memory",
+    "NETWORK INFORMATION": "network",
+    "USER INFORMATION": "users",
+    "SECURITY INFORMATION": "security",
+}
+
+# Sortable columns; every sort also orders by id so pages never overlap
+SORT_COLUMNS = {"date": "created", "host": "host", "size": "size"}
+
+# AUTOINCREMENT: a search posting left by a report deleted behind our back
+# must never match a later report that reuses its id
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    created TEXT NOT NULL,
+    host TEXT NOT NULL DEFAULT '',
+    sections TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL DEFAULT 'full',
+    size INTEGER NOT NULL DEFAULT 0,
+    summary TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created, id);
+CREATE INDEX IF NOT EXISTS reports_host ON reports (host, id);
+CREATE INDEX IF NOT EXISTS reports_size ON reports (size, id);
+CREATE TABLE IF NOT EXISTS report_sections (
+    section TEXT NOT NULL,
+    report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+    PRIMARY KEY (section, report_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS report_sections_report ON report_sections (report_id);
+"""
+
+DATE_LINE = re.compile(r"^Date: (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)")
+
+
+def read_header(path):
+    # Time, host, sections and kind from the report text itself
+    created = host = None
+    sections = []
+    kind = report_group(os.path.basename(path))
+    with open_report(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if created is None:
+                match = DATE_LINE.match(line)
+                if match:
+                    created = match.group(1)
+                    continue
+            if host is None and line.startswith("Hostname: "):
+                host = line[len("Hostname: "):]
+            elif line.startswith("  ") and line.strip() in SECTION_HEADINGS:
+                section = SECTION_HEADINGS[line.strip()]
+                if section not in sections:
+                    sections.append(section)
+    if created is None:
+        created = f"{datetime.fromtimestamp(os.stat(path).st_mtime):%Y-%m-%d %H:%M:%S}"
+    return created, host or "", sections, kind
+
+
+class ReportCatalog:
+    def __init__(self, path=CATALOG_PATH, archive_dir=ARCHIVE_DIR):
+        self.path = path
+        self.archive_dir = archive_dir
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The GUI reads while userctrld writes, so wait for locks and use WAL
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self.db.executescript(report_search.SCHEMA)
+        # Catalogs made before ids were AUTOINCREMENT can hand a dropped id out again
+        table = self.db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'reports'").fetchone()[0]
+        self.reuses_ids = "AUTOINCREMENT" not in table.upper()
+
+    def close(self):
+        self.db.close()
+
+    def relative(self, path):
+        return os.path.relpath(path, self.archive_dir)
+
+    def add(self, path, created=None, host=None, sections=None, kind=None, summary=""):
+        # Record (or update) an archived report. Anything not given is read
+        # from the report's header.
+        if created is None or host is None or sections is None or kind is None:
+            h_created, h_host, h_sections, h_kind = read_header(path)
+            created = created or h_created
+            host = h_host if host is None else host
+            sections = h_sections if sections is None else sections
+            kind = kind or h_kind
+        if isinstance(created, datetime):
+            created = f"{created:%Y-%m-%d %H:%M:%S}"
+        size = os.stat(path).st_size
+        with self.db:
+            known = self.db.execute("SELECT 1 FROM reports WHERE path = ?", (self.relative(path),)).fetchone()
+            report_id = self.db.execute(
+                "INSERT INTO reports (path, created, host, sections, kind, size, summary) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET created=excluded.created, host=excluded.host, "
+                "sections=excluded.sections, kind=excluded.kind, size=excluded.size, summary=excluded.summary "
+                "RETURNING id",
+                (self.relative(path), created, host, ",".join(sections), kind, size, summary)).fetchone()[0]
+            self.db.execute("DELETE FROM report_sections WHERE report_id = ?", (report_id,))
+            self.db.executemany("INSERT INTO report_sections (section, report_id) VALUES (?, ?)",
+                                [(section, report_id) for section in sections])
+            # Archived reports don't change, so a known one keeps its lines
+            if not known:
+                report_search.index_report(self.db, report_id, path)
+        return report_id
+
+    def get(self, report_id):
+        row = self.db.execute("SELECT id, path, created, host, sections, kind, size, summary FROM reports "
+                              "WHERE id = ?", (report_id,)).fetchone()
+        return self.record(row) if row else None
+
+    def record(self, row):
+        record = dict(zip(("id", "path", "created", "host", "sections", "kind", "size", "summary"), row))
+        record["path"] = os.path.join(self.archive_dir, record["path"])
+        return record
+
+    def sync(self):
+        # Catalog reports that were archived without us and drop rows whose
+        # file is gone. Only new files are opened.
+        on_disk = set()
+        for root, dirs, files in os.walk(self.archive_dir):
+            for name in files:
+                if is_report(name):
+                    on_disk.add(self.relative(os.path.join(root, name)))
+        known = {row[0] for row in self.db.execute("SELECT path FROM reports")}
+        added = 0
+        for relative in sorted(on_disk - known):
+            try:
+                self.add(os.path.join(self.archive_dir, relative))
+                added += 1
+            except OSError:
+                continue
+        gone = known - on_disk
+        if gone:
+            # Their lines can't be unindexed without the file; search skips
+            # them and reindex() drops them
+            with self.db:
+                self.db.executemany("DELETE FROM reports WHERE path = ?", [(p,) for p in gone])
+            if self.reuses_ids:
+                self.reindex()
+        # Reports cataloged before the search index existed
+        missing = self.db.execute("SELECT id, path FROM reports WHERE id NOT IN (SELECT report_id FROM report_index)")
+        for report_id, relative in missing.fetchall():
+            try:
+                with self.db:
+                    report_search.index_report(self.db, report_id, os.path.join(self.archive_dir, relative))
+            except OSError:
+                continue
+        return added, len(gone)
+
+    def forget(self, paths):
+        # Call before deleting the files: unindexing reads them
+        with self.db:
+            for path in paths:
+                row = self.db.execute("SELECT id, id IN (SELECT report_id FROM report_index) FROM reports "
+                                      "WHERE path = ?", (self.relative(path),)).fetchone()
+                if row is None:
+                    continue
+                if row[1]:
+                    try:
+                        report_search.unindex_report(self.db, row[0], path)
+                    except OSError:
+                        pass
+                self.db.execute("DELETE FROM reports WHERE id = ?", (row[0],))
+
+    def reindex(self):
+        # Rebuild the search index from the files, dropping lines of
+        # reports deleted behind the catalog's back
+        with self.db:
+            self.db.execute("INSERT INTO report_lines (report_lines) VALUES ('delete-all')")
+            self.db.execute("DELETE FROM report_index")
+        count = 0
+        for report_id, relative in self.db.execute("SELECT id, path FROM reports").fetchall():
+            try:
+                with self.db:
+                    report_search.index_report(self.db, report_id, os.path.join(self.archive_dir, relative))
+                count += 1
+            except OSError:
+                continue
+        with self.db:
+            self.db.execute("INSERT INTO report_lines (report_lines) VALUES ('optimize')")
+        return count
+
+    def latest(self, **filters):
+        rows = self.page(limit=1, **filters)
+        return rows[0] if rows else None
+
+    def where(self, date_from=None, date_to=None, section=None, host=None, kind=None):
+        clauses, params = [], []
+        if date_from:
+            clauses.append("created >= ?")
+            params.append(date_from)
+        if date_to:
+            # A bare date includes that whole day
+            clauses.append("created <= ?")
+            params.append(date_to + " 23:59:59" if len(date_to) == 10 else date_to)
+        if section:
+            # A primary-key probe per row keeps the sort index usable
+            clauses.append("EXISTS (SELECT 1 FROM report_sections WHERE section = ? AND report_id = reports.id)")
+            params.append(section)
+        if host:
+            clauses.append("host = ?")
+            params.append(host)
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        return clauses, params
+
+    def count(self, **filters):
+        clauses, params = self.where(**filters)
+        sql = "SELECT COUNT(*) FROM reports" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        return self.db.execute(sql, params).fetchone()[0]
+
+    def page(self, sort="date", descending=True, after=None, limit=PAGE_SIZE, **filters):
+        # One page of rows as dicts. `after` is the last row of the previous
+        # page; keyset paging keeps late pages as cheap as the first one.
+        column = SORT_COLUMNS[sort]
+        clauses, params = self.where(**filters)
+        if after is not None:
+            clauses.append(f"({column}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend([after[column], after["id"]])
+        order = "DESC" if descending else "ASC"
+        sql = ("SELECT id, path, created, host, sections, kind, size, summary FROM reports"
+               + (" WHERE " + " AND ".join(clauses) if clauses else "")
+               + f" ORDER BY {column} {order}, id {order} LIMIT ?")
+        params.append(limit)
+        return [self.record(row) for row in self.db.execute(sql, params)]
+
+    def hosts(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT host FROM reports ORDER BY host")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catalog of archived audit reports")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    p = commands.add_parser("add", help="catalog archived reports")
+    p.add_argument("reports", nargs="+")
+    commands.add_parser("sync", help="catalog new reports and forget deleted ones")
+    p = commands.add_parser("list", help="list cataloged reports, newest first")
+    p.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+    p.add_argument("--section")
+    p.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    catalog = ReportCatalog(args.catalog, args.archive)
+    try:
+        if args.command == "add":
+            for path in args.reports:
+                catalog.add(path)
+        elif args.command == "sync":
+            added, removed = catalog.sync()
+            print(f"Cataloged {added} new reports, removed {removed} missing ones")
+        else:
+            for row in catalog.page(limit=args.limit, date_from=args.date_from, date_to=args.date_to,
+                                    section=args.section):
+                print(f"{row['created']}  {row['host']:<16} {row['kind']:<5} {row['size']:>8}  "
+                      f"{row['path']}  {row['summary']}")
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
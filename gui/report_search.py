@@ -0,0 +1,155 @@
+# report_search.py - Full-text search over archived audit reports
+# Every line of every cataloged report goes into a contentless FTS5 table in
+# the catalog database, so only the token index is stored, not a second copy
+# of the text. A row's id encodes where the line came from:
+#
+#   rowid = report_id << LINE_BITS | line number
+#
+# so a match leads straight to the catalog row and the line, and matching
+# snippets are read back from the (compressed) report itself.
+#
+# Usage: python3 gui/report_search.py search WORD... [--oldest] [--limit N]
+#        python3 gui/report_search.py reindex
+
+import argparse
+import itertools
+import sys
+
+from report_archive import open_report
+
+LINE_BITS = 20
+LINE_MASK = (1 << LINE_BITS) - 1
+
+# report_index lists the reports whose lines are in report_lines, so sync()
+# can index reports cataloged before the index existed
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS report_lines USING fts5(text, content='', tokenize='unicode61');
+CREATE TABLE IF NOT EXISTS report_index (
+    report_id INTEGER PRIMARY KEY REFERENCES reports (id) ON DELETE CASCADE
+);
+"""
+
+# Lines on each result shown as snippets
+LINES_PER_REPORT = 3
+
+
+def report_lines(path):
+    # (line number, text) for the lines worth indexing; the rules and
+    # banner lines are the same in every report
+    with open_report(path) as f:
+        for number, line in enumerate(itertools.islice(f, LINE_MASK + 1)):
+            line = line.strip()
+            if line and line.strip("=-") and line != "SYSTEM AUDIT REPORT":
+                yield number, line
+
+
+def index_report(db, report_id, path):
+    base = report_id << LINE_BITS
+    db.executemany("INSERT INTO report_lines (rowid, text) VALUES (?, ?)",
+                   ((base | number, line) for number, line in report_lines(path)))
+    db.execute("INSERT OR IGNORE INTO report_index (report_id) VALUES (?)", (report_id,))
+
+
+def unindex_report(db, report_id, path):
+    # A contentless table deletes by replaying the original text, so this
+    # needs the report file as it was indexed
+    base = report_id << LINE_BITS
+    db.executemany("INSERT INTO report_lines (report_lines, rowid, text) VALUES ('delete', ?, ?)",
+                   ((base | number, line) for number, line in report_lines(path)))
+    db.execute("DELETE FROM report_index WHERE report_id = ?", (report_id,))
+
+
+def match_expression(query):
+    # Each word must appear on the line; a word with punctuation in it
+    # (0.0.0.0:5432, www-data) must appear as written
+    terms = query.split()
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def read_lines(path, numbers):
+    wanted = set(numbers)
+    found = {}
+    last = max(wanted)
+    with open_report(path) as f:
+        for number, line in enumerate(f):
+            if number in wanted:
+                found[number] = line.rstrip("\n")
+            if number >= last:
+                break
+    return [(n, found.get(n, "")) for n in sorted(wanted)]
+
+
+def search(catalog, query, limit=50, oldest_first=False):
+    # [(report row, [(line number, text)])] for up to `limit` reports,
+    # newest first (by catalog id) unless oldest_first
+    expression = match_expression(query)
+    if not expression:
+        return []
+    order = "ASC" if oldest_first else "DESC"
+    cursor = catalog.db.execute(f"SELECT rowid FROM report_lines WHERE report_lines MATCH ? ORDER BY rowid {order}",
+                                (expression,))
+    groups = []
+    current_id = None
+    current = None
+    for (rowid,) in cursor:
+        report_id, number = rowid >> LINE_BITS, rowid & LINE_MASK
+        if report_id != current_id:
+            current_id = report_id
+            row = catalog.get(report_id)
+            # Rows of reports that were deleted without being unindexed
+            if row is None:
+                current = None
+                continue
+            if len(groups) >= limit:
+                break
+            current = (row, [])
+            groups.append(current)
+        if current is not None and len(current[1]) < LINES_PER_REPORT:
+            current[1].append(number)
+    cursor.close()
+
+    results = []
+    for row, numbers in groups:
+        try:
+            lines = read_lines(row["path"], numbers)
+        except OSError:
+            lines = [(n, "") for n in sorted(numbers)]
+        results.append((row, lines))
+    return results
+
+
+def main(argv=None):
+    import report_catalog
+
+    parser = argparse.ArgumentParser(description="Search archived audit reports")
+    parser.add_argument("--catalog", default=report_catalog.CATALOG_PATH)
+    parser.add_argument("--archive", default=report_catalog.ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+    p = commands.add_parser("search", help="reports with a line containing every word")
+    p.add_argument("words", nargs="+")
+    p.add_argument("--oldest", action="store_true", help="oldest reports first")
+    p.add_argument("--limit", type=int, default=20, help="reports to show")
+    commands.add_parser("reindex", help="rebuild the index from the archived reports")
+    args = parser.parse_args(argv)
+
+    catalog = report_catalog.ReportCatalog(args.catalog, args.archive)
+    try:
+        if args.command == "reindex":
+            print(f"Indexed {catalog.reindex()} reports")
+            return 0
+        results = search(catalog, " ".join(args.words), args.limit, args.oldest)
+        for row, lines in results:
+            print(f"{row['created']}  {row['host']}  {row['path']}")
+            for number, text in lines:
+                print(f"  {number + 1:>6}: {text}")
+        if not results:
+            print("No matches")
+            return 1
+    finally:
+        catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# report_viewer.py - Windowed viewer for audit reports of any size
+# The report is memory-mapped (compressed ones are decompressed once into
+# anonymous memory) and indexed by line start offsets, and the Text widget
+# only ever holds the lines on screen. Search runs over the mapped bytes and
+# the outline jumps to each section and block heading.
+
+import array
+import bisect
+import gzip
+import lzma
+import mmap
+import os
+import re
+import struct
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+# Spelled out as literals so the regex engine can skip ahead with a fast
+# substring search instead of trying every line start
+RULE = b"-" * 55
+SECTION_RE = re.compile(b"\n" + RULE + rb"\n  ([^\n]+)\n" + RULE + b"\n")
+BLOCK_RE = re.compile(rb"\n-- ([^\n]+) --\n")
+
+CHUNK = 1 << 20
+
+
+def gzip_size(path):
+    # Uncompressed size from the gzip trailer (modulo 4 GiB)
+    with open(path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+def map_report(path):
+    # Bytes-like view of the report: the file itself when uncompressed,
+    # otherwise anonymous memory filled a chunk at a time
+    if path.endswith(".gz"):
+        size = gzip_size(path)
+        if size:
+            buffer = mmap.mmap(-1, size)
+            view = memoryview(buffer)
+            filled = 0
+            with gzip.open(path, "rb") as f:
+                while filled < size:
+                    count = f.readinto(view[filled:filled + CHUNK])
+                    if not count:
+                        break
+                    filled += count
+                extra = f.read(1)
+            view.release()
+            if filled == size and not extra:
+                return buffer
+            buffer.close()
+        # Multi-member or > 4 GiB: fall back to reading it whole
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    if path.endswith(".xz"):
+        with lzma.open(path, "rb") as f:
+            return f.read()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ReportBuffer:
+    # Line-addressable report. Building it scans the whole report once, so
+    # do that off the Tk thread for big ones.
+    def __init__(self, path):
+        self.path = path
+        self.data = map_report(path)
+        offsets = array.array("Q", [0])
+        find = self.data.find
+        position = find(b"\n")
+        while position != -1:
+            offsets.append(position + 1)
+            position = find(b"\n", position + 1)
+        # A trailing newline doesn't start another line
+        if len(offsets) > 1 and offsets[-1] == len(self.data):
+            offsets.pop()
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) if self.data else 0
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def line_end(self, line):
+        return self.offsets[line + 1] if line + 1 < len(self.offsets) else len(self.data)
+
+    def text(self, first, last):
+        # Lines [first, last) as one string
+        last = min(last, len(self))
+        if first >= last:
+            return ""
+        return self.data[self.offsets[first]:self.line_end(last - 1)].decode("utf-8", errors="replace")
+
+    def line_of(self, offset):
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+    def column_of(self, offset):
+        # Character column of a byte offset
+        line = self.line_of(offset)
+        return len(self.data[self.offsets[line]:offset].decode("utf-8", errors="replace"))
+
+    def outline(self):
+        # [(level, title, line)]: section headers and the "-- title --" blocks
+        entries = [(0, m.group(1).decode(errors="replace").strip(), self.line_of(m.start() + 1))
+                   for m in SECTION_RE.finditer(self.data)]
+        entries += [(1, m.group(1).decode(errors="replace"), self.line_of(m.start() + 1))
+                    for m in BLOCK_RE.finditer(self.data)]
+        return sorted(entries, key=lambda e: e[2])
+
+    def find(self, query, start=0, backwards=False, ignore_case=True):
+        # (start, end) byte offsets of the next match, wrapping around
+        pattern = re.compile(re.escape(query.encode()), re.I if ignore_case else 0)
+        if backwards:
+            # Last match before `start`; scan forward from the beginning
+            last = None
+            for m in pattern.finditer(self.data, 0, start):
+                last = m
+            if last is None:
+                for m in pattern.finditer(self.data, start):
+                    last = m
+            return (last.start(), last.end()) if last else None
+        m = pattern.search(self.data, start) or pattern.search(self.data, 0, start)
+        return (m.start(), m.end()) if m else None
+
+
+class ReportView(ttk.Frame):
+    # Text widget showing only the visible window of a ReportBuffer, with a
+    # search bar and an optional outline. The scrollbar is driven by hand.
+    def __init__(self, parent, outline=True, height=20):
+        super().__init__(parent)
+        self.buffer = None
+        self.top = 0
+        self.match = None
+        self.match_offsets = None
+
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(search_frame, text="Find:").pack(side="left")
+        self.query_var = tk.StringVar()
+        entry = ttk.Entry(search_frame, textvariable=self.query_var, width=30)
+        entry.pack(side="left", padx=5)
+        entry.bind("<Return>", lambda e: self.search())
+        entry.bind("<Shift-Return>", lambda e: self.search(backwards=True))
+        ttk.Button(search_frame, text="Next", command=self.search).pack(side="left")
+        ttk.Button(search_frame, text="Previous", command=lambda: self.search(backwards=True)).pack(side="left", padx=5)
+        self.status_var = tk.StringVar()
+        ttk.Label(search_frame, textvariable=self.status_var).pack(side="right")
+
+        body = ttk.Frame(self)
+        body.pack(fill="both", expand=True)
+        self.outline_list = None
+        self.outline_lines = []
+        if outline:
+            self.outline_list = tk.Listbox(body, width=28, exportselection=False, activestyle="none")
+            self.outline_list.pack(side="left", fill="y", padx=(0, 5))
+            self.outline_list.bind("<<ListboxSelect>>", self.on_outline)
+
+        text_frame = ttk.Frame(body)
+        text_frame.pack(side="left", fill="both", expand=True)
+        self.text = tk.Text(text_frame, wrap="none", height=height)
+        self.scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=self.on_scrollbar)
+        xscroll = ttk.Scrollbar(text_frame, orient="horizontal", command=self.text.xview)
+        self.text.configure(xscrollcommand=xscroll.set)
+        self.scrollbar.pack(side="right", fill="y")
+        xscroll.pack(side="bottom", fill="x")
+        self.text.pack(side="left", fill="both", expand=True)
+        self.text.tag_configure("match", background="yellow")
+        self.text.config(state="disabled")
+        self.font = tkfont.Font(font=self.text.cget("font"))
+
+        self.text.bind("<Configure>", lambda e: self.render())
+        self.text.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.text.bind("<Button-5>", lambda e: self.scroll(3))
+        self.text.bind("<Up>", lambda e: self.scroll(-1))
+        self.text.bind("<Down>", lambda e: self.scroll(1))
+        self.text.bind("<Prior>", lambda e: self.scroll(-self.page_size()))
+        self.text.bind("<Next>", lambda e: self.scroll(self.page_size()))
+        self.text.bind("<Control-Home>", lambda e: self.scroll(-len(self.buffer or ())))
+        self.text.bind("<Control-End>", lambda e: self.scroll(len(self.buffer or ())))
+        self.text.bind("<Control-f>", lambda e: entry.focus_set())
+
+    def page_size(self):
+        # Lines that fit in the Text widget
+        inset = 2 * (int(self.text.cget("borderwidth")) + int(self.text.cget("highlightthickness"))
+                     + int(self.text.cget("pady")))
+        height = self.text.winfo_height() - inset
+        if height <= 1:
+            return int(self.text.cget("height"))
+        return max(1, height // self.font.metrics("linespace"))
+
+    def load(self, buffer):
+        # Show a ReportBuffer; the view owns it from now on
+        self.close()
+        self.buffer = buffer
+        self.top = 0
+        self.match = None
+        self.status_var.set(f"{len(buffer)} lines")
+        if self.outline_list is not None:
+            self.outline_list.delete(0, tk.END)
+            entries = buffer.outline()
+            self.outline_lines = [line for _, _, line in entries]
+            if entries:
+                self.outline_list.insert(0, *(("    " if level else "") + title for level, title, _ in entries))
+        self.render()
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+    def destroy(self):
+        self.close()
+        super().destroy()
+
+    def render(self):
+        rows = self.page_size()
+        count = len(self.buffer) if self.buffer is not None else 0
+        self.top = max(0, min(self.top, count - rows))
+
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        if count:
+            self.text.insert("1.0", self.buffer.text(self.top, self.top + rows))
+            if self.match is not None:
+                (line, column), (end_line, end_column) = self.match
+                if self.top <= line < self.top + rows:
+                    self.text.tag_add("match", f"{line - self.top + 1}.{column}",
+                                      f"{end_line - self.top + 1}.{end_column}")
+        self.text.config(state="disabled")
+
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+        return "break"
+
+    def scroll_to(self, line):
+        # Put `line` a third of the way down the window
+        self.top = line - self.page_size() // 3
+        self.render()
+
+    def show(self, line, query=None):
+        # Jump to `line`, highlighting the first match of `query` from there
+        self.top = line
+        self.match = None
+        if query:
+            self.query_var.set(query)
+            self.search()
+        else:
+            self.scroll_to(line)
+
+    def on_scrollbar(self, action, value, unit=None):
+        count = len(self.buffer) if self.buffer is not None else 0
+        if action == "moveto":
+            self.top = int(float(value) * count)
+        elif unit == "pages":
+            self.top += int(value) * self.page_size()
+        else:
+            self.top += int(value)
+        self.render()
+
+    def on_outline(self, event):
+        selection = self.outline_list.curselection()
+        if selection:
+            self.top = self.outline_lines[selection[0]]
+            self.render()
+
+    def search(self, backwards=False):
+        query = self.query_var.get()
+        if not query or self.buffer is None:
+            return
+        # Continue from the current match, or from the top of the window
+        if self.match is not None:
+            start = self.match_offsets[0] if backwards else self.match_offsets[1]
+        else:
+            start = self.buffer.offsets[self.top] if len(self.buffer) else 0
+        found = self.buffer.find(query, start, backwards)
+        if found is None:
+            self.match = None
+            self.status_var.set(f"'{query}' not found")
+            self.render()
+            return
+        self.match_offsets = found
+        buffer = self.buffer
+        self.match = ((buffer.line_of(found[0]), buffer.column_of(found[0])),
+                      (buffer.line_of(found[1]), buffer.column_of(found[1])))
+        self.status_var.set(f"line {self.match[0][0] + 1} of {len(buffer)}")
+        self.scroll_to(self.match[0][0])
+
+
+class ReportViewer(tk.Toplevel):
+    # Stand-alone window around a ReportView, optionally opened at a line
+    def __init__(self, parent, buffer, line=None, query=None):
+        super().__init__(parent)
+        self.title(f"Report: {os.path.basename(buffer.path)}")
+        self.geometry("900x600")
+        self.view = ReportView(self)
+        self.view.pack(fill="both", expand=True, padx=10, pady=10)
+        self.view.load(buffer)
+        if line is not None:
+            self.view.show(line, query)
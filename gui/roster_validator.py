@@ -0,0 +1,183 @@
+# roster_validator.py - Streaming validation of bulk-add CSV rosters
+# Reads the CSV one row at a time and checks each row with hash lookups
+# against the account index, the usernames seen earlier in the file and
+# /etc/shells. Errors are grouped by type with their row numbers; only a
+# bounded sample of rows is kept per type, so memory stays flat.
+
+import csv
+import io
+import os
+import re
+from collections import namedtuple
+
+from shadow_tools import ROLE_GROUP
+
+DEFAULT_SHELL = "/bin/bash"
+DEFAULT_ROLE = "student"
+USERNAME_RE = re.compile(r"^[a-z_][a-z0-9_-]*[$]?$")
+MAX_USERNAME = 32
+MIN_COLUMNS = 3
+MAX_COLUMNS = 5
+
+# Rows listed per error type in the report; the counts are always exact
+MAX_LISTED = 1000
+
+# Error types in the order the report shows them
+ERROR_TYPES = {
+    "malformed_row": "Malformed rows",
+    "missing_username": "Missing username",
+    "missing_password": "Missing password",
+    "invalid_username": "Invalid username",
+    "invalid_characters": "Fields containing ':' or line breaks",
+    "duplicate_in_file": "Duplicate usernames in file",
+    "already_exists": "Users that already exist",
+    "invalid_shell": "Shells not in /etc/shells",
+    "invalid_role": "Unknown roles",
+}
+
+# `line` is the row's (last) line number, `offset` the byte just past it and
+# `columns` the number of fields the row actually had
+Row = namedtuple("Row", ["line", "offset", "columns", "username", "fullname", "password", "shell", "role"])
+
+
+class LineReader:
+    # Feeds decoded lines to csv.reader while tracking the byte offset and
+    # line number, which csv.reader and text-mode tell() can't provide
+    def __init__(self, f, offset=0, line=0):
+        self.f = f
+        self.offset = offset
+        self.line = line
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self.f.readline()
+        if not data:
+            raise StopIteration
+        self.offset += len(data)
+        self.line += 1
+        return data.decode("utf-8", errors="replace")
+
+
+def read_rows(path, offset=0, line=1, track_offsets=True):
+    # Start after the header, or at `offset` (just past line `line`).
+    # Without track_offsets, rows carry offset 0 but parsing is much faster.
+    with open(path, "rb") as f:
+        if offset:
+            f.seek(offset)
+        if track_offsets:
+            lines = LineReader(f, offset, line if offset else 0)
+            reader = csv.reader(lines)
+        else:
+            lines = None
+            reader = csv.reader(io.TextIOWrapper(f, encoding="utf-8", errors="replace", newline=""))
+            base = line if offset else 0
+        if not offset:
+            next(reader, None)
+        padding = [""] * MAX_COLUMNS
+        make_row = Row._make
+        for row in reader:
+            if not "".join(row).strip():
+                continue
+            fields = [field.strip() for field in row] + padding
+            if lines is not None:
+                position = lines.line, lines.offset
+            else:
+                position = base + reader.line_num, 0
+            yield make_row((position[0], position[1], len(row), fields[0], fields[1], fields[2],
+                            fields[3] or DEFAULT_SHELL, fields[4] or DEFAULT_ROLE))
+
+
+def load_shells(root=None):
+    # None when there is no /etc/shells to check against
+    path = os.path.join(root or "/", "etc", "shells")
+    try:
+        with open(path, "r") as f:
+            return {line.strip() for line in f if line.strip() and not line.startswith("#")}
+    except OSError:
+        return None
+
+
+class RosterValidator:
+    def __init__(self, accounts, shells=None):
+        self.accounts = accounts
+        self.shells = shells
+        self.seen = {}
+
+    def check(self, row):
+        # None if the row can be created, otherwise (error type, message)
+        username = row.username
+        if not MIN_COLUMNS <= row.columns <= MAX_COLUMNS:
+            return "malformed_row", f"Expected {MIN_COLUMNS}-{MAX_COLUMNS} fields, found {row.columns}"
+        if not username:
+            return "missing_username", "Username is required"
+        if not row.password:
+            return "missing_password", f"Password is required for {username}"
+        if len(username) > MAX_USERNAME or not USERNAME_RE.match(username):
+            return "invalid_username", f"Invalid username {username}"
+        text = row.fullname + row.password + row.shell
+        if ":" in text or "\n" in text:
+            return "invalid_characters", f"Fields for {username} may not contain ':' or line breaks"
+        first = self.seen.get(username)
+        if first is not None:
+            return "duplicate_in_file", f"User {username} already appears on line {first}"
+        if username in self.accounts:
+            return "already_exists", f"User {username} already exists"
+        if self.shells is not None and row.shell not in self.shells:
+            return "invalid_shell", f"Shell {row.shell} is not listed in /etc/shells"
+        if row.role not in ROLE_GROUP:
+            return "invalid_role", f"Unknown role {row.role}"
+        self.seen[username] = row.line
+        return None
+
+
+class ValidationReport:
+    def __init__(self):
+        self.rows = 0
+        self.valid = 0
+        self.errors = {}
+
+    def add(self, row, error):
+        self.rows += 1
+        if error is None:
+            self.valid += 1
+            return
+        key, message = error
+        entry = self.errors.get(key)
+        if entry is None:
+            entry = self.errors[key] = [0, []]
+        entry[0] += 1
+        if len(entry[1]) < MAX_LISTED:
+            entry[1].append((row.line, message))
+
+    @property
+    def invalid(self):
+        return self.rows - self.valid
+
+    def lines(self):
+        yield f"Rows checked: {self.rows}"
+        yield f"Valid rows: {self.valid}"
+        yield f"Rows with errors: {self.invalid}"
+        for key, label in ERROR_TYPES.items():
+            entry = self.errors.get(key)
+            if entry is None:
+                continue
+            count, listed = entry
+            yield ""
+            yield f"{label} ({count}):"
+            for line, message in listed:
+                yield f"  line {line}: {message}"
+            if count > len(listed):
+                yield f"  ... and {count - len(listed)} more"
+
+
+def validate_file(path, accounts, root=None, on_progress=None):
+    # on_progress(rows_checked) is called every 10,000 rows
+    validator = RosterValidator(accounts, load_shells(root))
+    report = ValidationReport()
+    for row in read_rows(path, track_offsets=False):
+        report.add(row, validator.check(row))
+        if on_progress and report.rows % 10000 == 0:
+            on_progress(report.rows)
+    return report
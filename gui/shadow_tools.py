@@ -0,0 +1,118 @@
+# shadow_tools.py - Thin wrappers around the shadow-utils commands
+# Every account database write goes through these so that batched callers
+# can feed one process per operation type instead of one per user. The
+# files themselves are only ever written by the tools, which take the
+# shadow locks, keep SELinux labels and flush the nscd/sssd caches.
+
+import os
+import subprocess
+
+# Group each role is added to when an account is provisioned
+# (same mapping as add_user.sh and bulk_add.sh)
+ROLE_GROUP = {
+    "admin": "sudo",
+    "student": "student",
+    "guest": "guest",
+}
+
+# Longest member list passed to gpasswd -M, under the kernel's 128 KiB
+# limit on a single argument
+MAX_MEMBER_ARG = 96 * 1024
+
+
+class ToolError(Exception):
+    pass
+
+
+def run_tool(args, input_text=None, root=None, check=True):
+    # All shadow-utils tools accept --root to operate on another tree
+    if root:
+        args = [args[0], "--root", root] + list(args[1:])
+    result = subprocess.run(args, input=input_text, capture_output=True, text=True)
+    if check and result.returncode != 0:
+        message = (result.stderr or result.stdout).strip() or f"exit status {result.returncode}"
+        raise ToolError(f"{args[0]}: {message}")
+    return result
+
+
+def login_defs(key, default=None, root=None):
+    path = os.path.join(root or "/", "etc", "login.defs")
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == key:
+                    return fields[1]
+    except OSError:
+        pass
+    return default
+
+
+def add_groups(names, root=None):
+    for name in names:
+        run_tool(["groupadd", name], root=root)
+
+
+def group_members(name, root=None):
+    path = os.path.join(root or "/", "etc", "group")
+    with open(path, "r") as f:
+        for line in f:
+            fields = line.rstrip("\n").split(":")
+            if fields[0] == name and len(fields) > 3:
+                return [m for m in fields[3].split(",") if m]
+    raise ToolError(f"gpasswd: group '{name}' does not exist")
+
+
+def update_group_members(changes, root=None):
+    # changes: {group: (names to add, names to remove)}. Normally one
+    # gpasswd -M per group rewrites group and gshadow together. A single
+    # argument is capped at 128 KiB (about 14k members), so a longer list
+    # is changed one member at a time with gpasswd -a/-d instead.
+    for group, (added, removed) in changes.items():
+        current = group_members(group, root)
+        present = set(current)
+        removed = set(removed) & present
+        added = [m for m in dict.fromkeys(added) if m not in present]
+        if not added and not removed:
+            continue
+        members = [m for m in current if m not in removed] + added
+        listing = ",".join(members)
+        if len(listing) < MAX_MEMBER_ARG:
+            run_tool(["gpasswd", "-M", listing, group], root=root)
+            continue
+        for name in sorted(removed):
+            remove_group_member(name, group, root=root)
+        for name in added:
+            add_group_member(name, group, root=root)
+
+
+def new_users(entries, root=None, check=True):
+    # entries: (name, password, gecos, home, shell). newusers checks every
+    # line before writing passwd/shadow/group once for the whole batch.
+    lines = "".join(f"{name}:{password}:::{gecos}:{home}:{shell}\n"
+                    for name, password, gecos, home, shell in entries)
+    return run_tool(["newusers"], input_text=lines, root=root, check=check)
+
+
+def change_passwords(pairs, root=None, crypt_method=None):
+    args = ["chpasswd"]
+    if crypt_method:
+        args.extend(["-c", crypt_method])
+    run_tool(args, input_text="".join(f"{name}:{password}\n" for name, password in pairs), root=root)
+
+
+def modify_user(name, options, root=None):
+    # One usermod carrying every attribute change for the account
+    run_tool(["usermod"] + list(options) + [name], root=root)
+
+
+def delete_user(name, remove_home=False, root=None):
+    run_tool(["userdel", "-r", name] if remove_home else ["userdel", name], root=root)
+
+
+def add_group_member(name, group, root=None):
+    run_tool(["gpasswd", "-a", name, group], root=root)
+
+
+def remove_group_member(name, group, root=None):
+    run_tool(["gpasswd", "-d", name, group], root=root)
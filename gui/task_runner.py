@@ -0,0 +1,173 @@
+# task_runner.py - Background tasks for the Tk GUI
+# Tk widgets may only be touched from the main loop, so work runs on a
+# small worker pool and everything it reports (progress events, results,
+# errors) goes through one bounded queue that the main loop drains with
+# after(). Callbacks therefore always run on the Tk thread.
+
+import itertools
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 4
+QUEUE_SIZE = 5000
+POLL_MS = 100
+
+# Events handled per poll, so a chatty task can't starve the UI
+BATCH_SIZE = 2000
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    # Handed to the work function as its first argument
+    def __init__(self, runner, task_id, name):
+        self.runner = runner
+        self.id = task_id
+        self.name = name
+        self.started = None
+        self.cancel_event = threading.Event()
+        self.process = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def check(self):
+        # Call between steps; stops the task if it was cancelled
+        if self.cancel_event.is_set():
+            raise TaskCancelled(f"{self.name} was cancelled")
+
+    def post(self, *event):
+        # Send an event to the task's on_events callback on the main loop.
+        # Blocks while the queue is full, which throttles the worker.
+        self.runner.results.put(("event", self, event))
+
+    def run_process(self, args, input_text=None):
+        # subprocess.run that is killed when the task is cancelled
+        self.check()
+        process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, text=True)
+        self.process = process
+        try:
+            stdout, stderr = process.communicate(input_text)
+        finally:
+            self.process = None
+        self.check()
+        return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+class TaskRunner:
+    def __init__(self, widget, max_workers=MAX_WORKERS, on_change=None):
+        # on_change(tasks) is called on the main loop whenever the set of
+        # pending or running tasks changes
+        self.widget = widget
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task")
+        self.results = queue.Queue(maxsize=QUEUE_SIZE)
+        self.tasks = {}
+        self.callbacks = {}
+        self.on_change = on_change
+        self.ids = itertools.count(1)
+        self.polling = False
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_events=None, on_cancel=None):
+        # func(task, *args) runs on a worker. on_done(result), on_error(exc),
+        # on_cancel() and on_events(list of posted events) run on the main loop.
+        task = Task(self, next(self.ids), name)
+        self.tasks[task.id] = task
+        self.callbacks[task.id] = (on_done, on_error, on_events, on_cancel)
+        self.pool.submit(self.work, task, func, args)
+        self.changed()
+        self.schedule()
+        return task
+
+    def work(self, task, func, args):
+        task.started = time.monotonic()
+        try:
+            if task.cancelled:
+                raise TaskCancelled(f"{task.name} was cancelled")
+            result = func(task, *args)
+        except TaskCancelled:
+            self.results.put(("cancelled", task, None))
+        except Exception as e:
+            self.results.put(("error", task, e))
+        else:
+            self.results.put(("done", task, result))
+
+    def running(self):
+        return list(self.tasks.values())
+
+    def busy(self, name):
+        return any(task.name == name for task in self.tasks.values())
+
+    def cancel(self, task):
+        task.cancel()
+
+    def cancel_all(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+
+    def changed(self):
+        if self.on_change:
+            self.on_change(self.running())
+
+    def schedule(self):
+        if not self.polling:
+            self.polling = True
+            self.widget.after(POLL_MS, self.poll)
+
+    def poll(self):
+        # Group consecutive events per task so on_events gets one list
+        self.polling = False
+        pending = {}
+        finished = []
+        for _ in range(BATCH_SIZE):
+            try:
+                kind, task, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "event":
+                pending.setdefault(task.id, (task, []))[1].append(value)
+            else:
+                finished.append((kind, task, value))
+
+        for task, events in pending.values():
+            on_events = self.callbacks.get(task.id, (None,) * 4)[2]
+            if on_events:
+                self.dispatch(on_events, events)
+
+        for kind, task, value in finished:
+            self.tasks.pop(task.id, None)
+            on_done, on_error, on_events, on_cancel = self.callbacks.pop(task.id)
+            if kind == "done" and on_done:
+                self.dispatch(on_done, value)
+            elif kind == "error" and on_error:
+                self.dispatch(on_error, value)
+            elif kind == "cancelled" and on_cancel:
+                self.dispatch(on_cancel)
+        if finished:
+            self.changed()
+
+        if self.tasks or not self.results.empty():
+            self.schedule()
+
+    def dispatch(self, callback, *args):
+        # A failing callback must not stop the poll loop
+        try:
+            callback(*args)
+        except Exception as e:
+            self.widget.report_callback_exception(type(e), e, e.__traceback__)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,183 @@
+# user_details.py - Fork-free data source for the "User Details" pane
+# Basic details come from the account index and /etc/shadow and are kept in
+# an LRU cache; slow extras (last login, home size, process count) are
+# computed on a background thread and handed back through a queue.
+
+import os
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from account_watch import file_signature
+from login_records import LASTLOG_PATH, LASTLOG_RECORD
+
+CACHE_SIZE = 512
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def read_shadow(path="/etc/shadow"):
+    # name -> (password hash, last change, expire) for every shadow entry
+    entries = {}
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.rstrip("\n").split(":")
+                if len(fields) < 8:
+                    continue
+                entries[fields[0]] = (fields[1], fields[2], fields[7])
+    except OSError:
+        pass
+    return entries
+
+
+def shadow_day(value):
+    # Shadow dates are days since the epoch; empty means "not set"
+    if not value or not value.lstrip("-").isdigit():
+        return None
+    return (EPOCH + timedelta(days=int(value))).strftime("%Y-%m-%d")
+
+
+def last_login(uid, path=LASTLOG_PATH):
+    # lastlog is a sparse file indexed by UID, so one seek and read suffices
+    try:
+        with open(path, "rb") as f:
+            f.seek(uid * LASTLOG_RECORD.size)
+            record = f.read(LASTLOG_RECORD.size)
+    except OSError:
+        return None
+    if len(record) < LASTLOG_RECORD.size:
+        return None
+    when, tty, host = LASTLOG_RECORD.unpack(record)
+    if not when:
+        return "Never logged in"
+    text = datetime.fromtimestamp(when, timezone.utc).astimezone().strftime("%Y-%m-%d %H:%M:%S")
+    tty = tty.rstrip(b"\0").decode(errors="replace")
+    host = host.rstrip(b"\0").decode(errors="replace")
+    if tty:
+        text += f" on {tty}"
+    if host:
+        text += f" from {host}"
+    return text
+
+
+def home_size(path):
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_blocks * 512
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+
+def process_count(uid):
+    count = 0
+    for pid in os.listdir("/proc"):
+        if pid.isdigit():
+            try:
+                if os.stat(f"/proc/{pid}").st_uid == uid:
+                    count += 1
+            except OSError:
+                pass
+    return count
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class UserDetails:
+    def __init__(self, shadow_path="/etc/shadow"):
+        self.shadow_path = shadow_path
+        self.shadow = None
+        self.shadow_signature = None
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = None
+        threading.Thread(target=self.worker, daemon=True).start()
+
+    def invalidate(self):
+        # Called when the account databases change
+        with self.lock:
+            self.cache.clear()
+            self.shadow = None
+
+    def shadow_entry(self, name):
+        signature = file_signature(self.shadow_path)
+        if self.shadow is None or signature != self.shadow_signature:
+            self.shadow = read_shadow(self.shadow_path)
+            self.shadow_signature = signature
+        return self.shadow.get(name)
+
+    def basic(self, accounts, name):
+        with self.lock:
+            text = self.cache.get(name)
+            if text is not None:
+                self.cache.move_to_end(name)
+                return text
+
+        account = accounts.get(name)
+        if account is None:
+            return f"Username: {name}\n\nUser no longer exists\n"
+
+        lines = [f"Username: {name}", "", "ID Information:", accounts.id_string(name), "",
+                 "User Information:",
+                 f"  Full Name: {account.gecos.split(',')[0]}",
+                 f"  Home: {account.home}",
+                 f"  Shell: {account.shell}"]
+        shadow = self.shadow_entry(name)
+        if shadow is not None:
+            password, changed, expire = shadow
+            locked = password.startswith("!") or password.startswith("*")
+            lines.append(f"  Password: {'locked' if locked else 'active'}")
+            if shadow_day(changed):
+                lines.append(f"  Password Changed: {shadow_day(changed)}")
+            lines.append(f"  Account Expires: {shadow_day(expire) or 'never'}")
+        text = "\n".join(lines) + "\n"
+
+        with self.lock:
+            self.cache[name] = text
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return text
+
+    def request_extras(self, account):
+        # Only the most recent request matters while the user is scrolling
+        self.pending = account.name
+        self.requests.put(account)
+
+    def worker(self):
+        while True:
+            account = self.requests.get()
+            if account.name != self.pending:
+                continue
+            extras = [
+                ("Last Login", lambda: last_login(account.uid) or "unknown"),
+                ("Processes", lambda: str(process_count(account.uid))),
+                ("Home Size", lambda: format_size(home_size(account.home))),
+            ]
+            for label, compute in extras:
+                if account.name != self.pending:
+                    break
+                try:
+                    value = compute()
+                except Exception as e:
+                    value = f"unavailable ({e})"
+                self.results.put((account.name, label, value))
@@ -0,0 +1,392 @@
+# user_list.py - Virtualized, searchable "Current Users" list
+# Only the rows that fit on screen are ever inserted into the Tk listbox,
+# so filling, scrolling and filtering stay fast with 100k+ accounts.
+
+import bisect
+import time
+from collections import Counter
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+from account_index import ROLE_GROUPS, has_role
+
+ALL = "All"
+
+
+def remove_sorted(names, name):
+    # Returns whether the name was there
+    i = bisect.bisect_left(names, name)
+    if i < len(names) and names[i] == name:
+        del names[i]
+        return True
+    return False
+
+
+def search_keys(name):
+    keys = set(name)
+    keys.update(name[i:i + 2] for i in range(len(name) - 1))
+    return keys
+
+
+class UserSearchIndex:
+    # Prefix search is a bisect over the sorted names. Substring search uses
+    # per-character and per-bigram postings (the names holding each, sorted),
+    # built the first time it is needed: a one or two character query is a
+    # single posting list, longer queries only re-check the names of their
+    # rarest bigram. insert() and remove() keep both up to date, so a change
+    # to a few accounts costs a few bisects per character of their names.
+    def __init__(self, names):
+        self.names = names
+        self.postings = None
+
+    def build_postings(self):
+        postings = {}
+        for name in self.names:
+            for key in search_keys(name):
+                posting = postings.get(key)
+                if posting is None:
+                    posting = postings[key] = []
+                posting.append(name)
+        self.postings = postings
+
+    def insert(self, name):
+        bisect.insort(self.names, name)
+        if self.postings is not None:
+            for key in search_keys(name):
+                bisect.insort(self.postings.setdefault(key, []), name)
+
+    def remove(self, name):
+        if not remove_sorted(self.names, name) or self.postings is None:
+            return
+        for key in search_keys(name):
+            posting = self.postings[key]
+            remove_sorted(posting, name)
+            if not posting:
+                del self.postings[key]
+
+    def prefix(self, query):
+        lo = bisect.bisect_left(self.names, query)
+        hi = bisect.bisect_left(self.names, query + "\uffff", lo)
+        return self.names[lo:hi]
+
+    def substring(self, query):
+        if self.postings is None:
+            self.build_postings()
+        if len(query) <= 2:
+            return self.postings.get(query, [])
+
+        empty = ()
+        candidates = min((self.postings.get(query[i:i + 2], empty) for i in range(len(query) - 1)), key=len)
+        return [name for name in candidates if query in name]
+
+    def search(self, query, contains=False):
+        if not query:
+            return self.names
+        return self.substring(query) if contains else self.prefix(query)
+
+
+class VirtualUserList(ttk.Frame):
+    # A listbox that only ever holds the visible window of `items`. The
+    # scrollbar is driven by hand from the window position.
+    def __init__(self, parent, width=25, height=20):
+        super().__init__(parent)
+        self.items = []
+        self.top = 0
+        self.selected_name = None
+        # Optional name -> row text, for extra columns
+        self.describe = None
+
+        self.listbox = tk.Listbox(self, width=width, height=height, selectmode=tk.SINGLE,
+                                  exportselection=False, activestyle="none")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.font = tkfont.Font(font=self.listbox.cget("font"))
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.listbox.bind("<<ListboxSelect>>", self.on_click)
+        self.listbox.bind("<Configure>", lambda e: self.render())
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(3))
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+        self.listbox.bind("<Prior>", lambda e: self.move_selection(-self.page_size()))
+        self.listbox.bind("<Next>", lambda e: self.move_selection(self.page_size()))
+        self.listbox.bind("<Home>", lambda e: self.move_selection(-len(self.items)))
+        self.listbox.bind("<End>", lambda e: self.move_selection(len(self.items)))
+
+    def page_size(self):
+        # Rows that fit in the listbox, using Tk's own line height formula
+        font = self.font
+        select_border = int(self.listbox.cget("selectborderwidth"))
+        line_height = font.metrics("linespace") + 1 + 2 * select_border
+        inset = 2 * (int(self.listbox.cget("borderwidth")) + int(self.listbox.cget("highlightthickness")))
+        height = self.listbox.winfo_height() - inset
+        if height <= 1:
+            return int(self.listbox.cget("height"))
+        return max(1, height // line_height)
+
+    def set_items(self, items):
+        # Keep the selection and the top row by name across a new item list
+        top_name = self.items[self.top] if self.top < len(self.items) else None
+        self.items = items
+        self.top = self.index_of(top_name, exact=False) if top_name is not None else 0
+        self.render()
+
+    def index_of(self, name, exact=True):
+        i = bisect.bisect_left(self.items, name)
+        if exact and (i >= len(self.items) or self.items[i] != name):
+            return None
+        return i
+
+    def render(self):
+        rows = self.page_size()
+        count = len(self.items)
+        self.top = max(0, min(self.top, count - rows))
+        window = self.items[self.top:self.top + rows]
+
+        self.listbox.delete(0, tk.END)
+        if window:
+            if self.describe is not None:
+                window = [self.describe(name) for name in window]
+            self.listbox.insert(0, *window)
+        if self.selected_name is not None:
+            i = self.index_of(self.selected_name)
+            if i is not None and self.top <= i < self.top + rows:
+                self.listbox.selection_set(i - self.top)
+
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+        return "break"
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.top = int(float(value) * len(self.items))
+        elif unit == "pages":
+            self.top += int(value) * self.page_size()
+        else:
+            self.top += int(value)
+        self.render()
+
+    def on_click(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        self.select(self.top + selection[0])
+
+    def move_selection(self, delta):
+        if not self.items:
+            return "break"
+        current = self.index_of(self.selected_name) if self.selected_name is not None else None
+        if current is None:
+            current = self.top - 1 if delta > 0 else self.top + 1
+        self.select(max(0, min(len(self.items) - 1, current + delta)))
+        return "break"
+
+    def select(self, index):
+        self.selected_name = self.items[index]
+        rows = self.page_size()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self.render()
+        self.event_generate("<<UserSelect>>")
+
+    def selected(self):
+        if self.selected_name is not None and self.index_of(self.selected_name) is not None:
+            return self.selected_name
+        return None
+
+
+class UserBrowser(ttk.Frame):
+    # Search box and role/shell/UID/inactivity filters on top of a
+    # VirtualUserList. `lookup` maps a username to its Account for the
+    # filters.
+    def __init__(self, parent, lookup, width=25, height=20, inactive_days=90):
+        super().__init__(parent)
+        self.lookup = lookup
+        self.names = []
+        self.filtered = []
+        self.search_index = UserSearchIndex([])
+        # name -> shell and how many users have each, so a diff can update
+        # the shell choices without looking at every account
+        self.shells = {}
+        self.shell_counts = Counter()
+        self.inactive_days = inactive_days
+        # username -> last login time (None: never), once it has been read
+        self.last_logins = None
+
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill="x", pady=(0, 5))
+        self.query_var = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=self.query_var).pack(side="left", fill="x", expand=True)
+        self.contains_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Contains", variable=self.contains_var,
+                        command=self.apply_search).pack(side="left", padx=(5, 0))
+        self.query_var.trace_add("write", lambda *args: self.apply_search())
+
+        filter_frame = ttk.Frame(self)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        self.role_var = tk.StringVar(value=ALL)
+        role_box = ttk.Combobox(filter_frame, textvariable=self.role_var, state="readonly",
+                                values=[ALL] + list(ROLE_GROUPS), width=8)
+        role_box.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        self.shell_var = tk.StringVar(value=ALL)
+        self.shell_box = ttk.Combobox(filter_frame, textvariable=self.shell_var, state="readonly",
+                                      values=[ALL], width=12)
+        self.shell_box.grid(row=0, column=1, sticky="ew")
+        ttk.Label(filter_frame, text="UID:").grid(row=1, column=0, pady=(5, 0), sticky="w")
+        uid_frame = ttk.Frame(filter_frame)
+        uid_frame.grid(row=1, column=1, pady=(5, 0), sticky="ew")
+        self.min_uid_var = tk.StringVar()
+        self.max_uid_var = tk.StringVar()
+        ttk.Entry(uid_frame, textvariable=self.min_uid_var, width=7).pack(side="left")
+        ttk.Label(uid_frame, text="-").pack(side="left", padx=2)
+        ttk.Entry(uid_frame, textvariable=self.max_uid_var, width=7).pack(side="left")
+        self.inactive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text=f"No login in {inactive_days}+ days",
+                        variable=self.inactive_var).grid(row=2, column=0, columnspan=2, pady=(5, 0), sticky="w")
+        for var in (self.role_var, self.shell_var, self.min_uid_var, self.max_uid_var, self.inactive_var):
+            var.trace_add("write", lambda *args: self.apply_filters())
+
+        self.list = VirtualUserList(self, width=width, height=height)
+        self.list.pack(side="top", fill="both", expand=True)
+        self.list.bind("<<UserSelect>>", lambda e: self.event_generate("<<UserSelect>>"))
+
+        self.count_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.count_var).pack(anchor="w", pady=(5, 0))
+
+    def selected(self):
+        return self.list.selected()
+
+    def set_users(self, names):
+        # `names` must be sorted; it is the full, unfiltered list
+        self.names = names
+        self.update_shells()
+        self.apply_filters()
+
+    def apply_diff(self, added, removed, renamed, changed=()):
+        # Only the changed names are looked at: the full list, the filtered
+        # view (a separate list while a filter is active, and the list the
+        # search index is over) and the shells. `changed` are accounts whose
+        # shell, UID or groups changed, which may move them in or out of the
+        # filtered view.
+        renames = dict(renamed)
+        gone = removed + list(renames)
+        new = added + list(renames.values())
+        index = self.search_index
+        separate = self.filtered is not self.names
+        criteria = self.filter_criteria() if separate else None
+        for name in gone:
+            index.remove(name)
+            if separate:
+                remove_sorted(self.names, name)
+        for name in new:
+            if separate:
+                bisect.insort(self.names, name)
+            if not separate or self.matches(name, criteria):
+                index.insert(name)
+        if separate:
+            for name in changed:
+                index.remove(name)
+                if self.matches(name, criteria):
+                    index.insert(name)
+        if self.list.selected_name in renames:
+            self.list.selected_name = renames[self.list.selected_name]
+
+        choices = set(self.shell_counts)
+        for name in gone + list(changed):
+            self.forget_shell(name)
+        for name in new + list(changed):
+            self.add_shell(name)
+        if set(self.shell_counts) != choices:
+            self.shell_box.configure(values=[ALL] + sorted(self.shell_counts))
+        self.apply_search()
+
+    def set_last_logins(self, last_logins):
+        # Adds a last-login column and enables the inactivity filter
+        self.last_logins = last_logins
+        self.list.describe = self.describe
+        self.apply_filters()
+
+    def describe(self, name):
+        if name not in self.last_logins:
+            return name
+        seconds = self.last_logins[name]
+        return f"{name:<16} {time.strftime('%Y-%m-%d', time.localtime(seconds)) if seconds else 'never'}"
+
+    def update_shells(self):
+        self.shells = {}
+        self.shell_counts = Counter()
+        for name in self.names:
+            self.add_shell(name)
+        self.shell_box.configure(values=[ALL] + sorted(self.shell_counts))
+
+    def add_shell(self, name):
+        account = self.lookup(name)
+        if account is not None:
+            self.shells[name] = account.shell
+            self.shell_counts[account.shell] += 1
+
+    def forget_shell(self, name):
+        shell = self.shells.pop(name, None)
+        if shell is not None:
+            self.shell_counts[shell] -= 1
+            if not self.shell_counts[shell]:
+                del self.shell_counts[shell]
+
+    def filter_active(self):
+        return (self.role_var.get() != ALL or self.shell_var.get() != ALL
+                or self.min_uid_var.get().strip() or self.max_uid_var.get().strip()
+                or (self.inactive_var.get() and self.last_logins is not None))
+
+    def filter_criteria(self):
+        cutoff = None
+        if self.inactive_var.get() and self.last_logins is not None:
+            cutoff = time.time() - self.inactive_days * 86400
+        return (self.role_var.get(), self.shell_var.get(), self.parse_uid(self.min_uid_var.get()),
+                self.parse_uid(self.max_uid_var.get()), cutoff)
+
+    def matches(self, name, criteria):
+        role, shell, min_uid, max_uid, cutoff = criteria
+        account = self.lookup(name)
+        if account is None:
+            return False
+        if role != ALL and not has_role(account, role):
+            return False
+        if shell != ALL and account.shell != shell:
+            return False
+        if min_uid is not None and account.uid < min_uid:
+            return False
+        if max_uid is not None and account.uid > max_uid:
+            return False
+        if cutoff is not None and (self.last_logins.get(name) or 0) >= cutoff:
+            return False
+        return True
+
+    def apply_filters(self):
+        if not self.filter_active():
+            self.filtered = self.names
+        else:
+            criteria = self.filter_criteria()
+            self.filtered = [name for name in self.names if self.matches(name, criteria)]
+        self.search_index = UserSearchIndex(self.filtered)
+        self.apply_search()
+
+    def apply_search(self):
+        items = self.search_index.search(self.query_var.get(), self.contains_var.get())
+        self.list.set_items(items)
+        self.count_var.set(f"{len(items)} of {len(self.names)} users")
+
+    @staticmethod
+    def parse_uid(text):
+        text = text.strip()
+        return int(text) if text.isdigit() else None
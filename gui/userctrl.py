@@ -0,0 +1,439 @@
+# userctrl.py - Headless command-line interface to UserCTRL Pro
+# Same account logic as the GUI and userctrld (account_index, account_ops,
+# bulk_engine, batch_ops) without Tk. Modules are imported by the command
+# that needs them, so `userctrl list` only loads the account index.
+#
+# Usage: userctrl COMMAND [options]   (see userctrl --help)
+#
+# Every command accepts --json (one document) or --jsonl (one object per
+# line) and --root DIR. Exit codes:
+#   0  success
+#   1  the operation failed
+#   2  usage error
+#   3  a batch, import or apply finished with some failed items
+#   4  the user does not exist
+
+import argparse
+import os
+import sys
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+EXIT_NOT_FOUND = 4
+
+# Short command names accepted in batch input
+OP_NAMES = {
+    "add": "add_user",
+    "delete": "delete_user",
+    "lock": "lock_user",
+    "unlock": "unlock_user",
+    "modify": "modify_user",
+}
+
+
+def write_json(args, records):
+    import json
+    if args.jsonl:
+        for record in records:
+            sys.stdout.write(json.dumps(record) + "\n")
+    else:
+        sys.stdout.write(json.dumps(records, indent=2) + "\n")
+
+
+def json_output(args):
+    return args.json or args.jsonl
+
+
+def account_record(account):
+    return account._asdict() | {"groups": list(account.groups)}
+
+
+# Read-only commands
+def cmd_list(args):
+    from account_index import AccountIndex, has_role, is_regular
+
+    accounts = AccountIndex.load(args.root)
+    selected = accounts.filter(min_uid=args.min_uid, max_uid=args.max_uid, shell=args.shell,
+                               group=args.group, regular=None if args.all else True,
+                               predicate=(lambda a: has_role(a, args.role)) if args.role else None)
+    selected = accounts.sort(selected, key=args.sort)
+    if json_output(args):
+        write_json(args, [account_record(a) for a in selected])
+    else:
+        for account in selected:
+            sys.stdout.write(f"{account.name}\n")
+    return EXIT_OK
+
+
+def cmd_show(args):
+    from account_index import AccountIndex
+
+    accounts = AccountIndex.load(args.root)
+    account = accounts.get(args.username)
+    if account is None:
+        return fail(args, f"User {args.username} does not exist", EXIT_NOT_FOUND)
+
+    from user_details import read_shadow, shadow_day
+    record = account_record(account)
+    record["id"] = accounts.id_string(account.name)
+    shadow = read_shadow(os.path.join(args.root or "/", "etc", "shadow")).get(account.name)
+    if shadow is not None:
+        password, changed, expire = shadow
+        record["locked"] = password.startswith(("!", "*"))
+        record["password_changed"] = shadow_day(changed)
+        record["expires"] = shadow_day(expire)
+
+    if json_output(args):
+        write_json(args, [record] if args.jsonl else record)
+    else:
+        for key, value in record.items():
+            if isinstance(value, list):
+                value = ",".join(value)
+            sys.stdout.write(f"{key}: {'' if value is None else value}\n")
+    return EXIT_OK
+
+
+def cmd_inactive(args):
+    import time
+    from account_index import AccountIndex
+    from login_records import LoginIndex
+
+    accounts = AccountIndex.load(args.root)
+    selected = accounts.filter(regular=None if args.all else True, predicate=lambda a: a.name != "nobody")
+    log_dir = os.path.join(args.root or "/", "var", "log")
+    logins = LoginIndex(os.path.join(log_dir, "wtmp"), os.path.join(log_dir, "btmp"),
+                        os.path.join(log_dir, "lastlog")).refresh()
+    now = time.time()
+    records = []
+    for account, seconds in logins.inactive(selected, args.days, now):
+        records.append({"name": account.name, "uid": account.uid,
+                        "last_login": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(seconds)) if seconds else None,
+                        "days": int((now - seconds) // 86400) if seconds else None})
+    if json_output(args):
+        write_json(args, records)
+    else:
+        for record in records:
+            last = record["last_login"].replace("T", " ") if record["last_login"] else "never"
+            line = f"{record['name']:<16} {record['uid']:>6}  {last:<19}  {'' if record['days'] is None else record['days']}"
+            sys.stdout.write(line.rstrip() + "\n")
+    return EXIT_OK
+
+
+def cmd_history(args):
+    from history_index import HistoryIndex
+
+    index = HistoryIndex()
+    try:
+        index.update()
+        filters = {"target": args.username, "op": OP_NAMES.get(args.op, args.op), "actor": args.actor,
+                   "date_from": args.since, "date_to": args.until}
+        after = None
+        if args.before:
+            # The cursor printed after the previous page
+            time_part, _, row_id = args.before.rpartition("/")
+            after = {"time": time_part, "id": int(row_id)}
+        records = index.page(after=after, limit=args.limit, **filters)
+    finally:
+        index.close()
+    if json_output(args):
+        write_json(args, records)
+    else:
+        for record in records:
+            line = (f"{record['time'].replace('T', ' ')[:19]}  {record['op']:<12} {record['target'] or '-':<16} "
+                    f"{record['actor'] or '-':<10} {record['result'] or '':<7} {record['message']}")
+            sys.stdout.write(line.rstrip() + "\n")
+        if len(records) == args.limit:
+            sys.stderr.write(f"More: --before {records[-1]['time']}/{records[-1]['id']}\n")
+    return EXIT_OK
+
+
+# Account operations, run in-process or sent to a running userctrld
+def make_backend(args):
+    if args.daemon:
+        from userctrl_client import HelperClient, HelperError
+
+        client = HelperClient(autostart=False, root=args.root)
+
+        def handle(request):
+            try:
+                ok, value = client.call_many([(request["op"], request.get("args") or {})])[0]
+            except HelperError as e:
+                return {"ok": False, "error": str(e)}
+            return {"ok": True, "result": value} if ok else {"ok": False, "error": value}
+        return handle
+
+    from userctrld import Helper
+    return Helper(args.root).handle
+
+
+def report_result(args, op, username, response):
+    if json_output(args):
+        record = {"op": op, "username": username, "ok": response["ok"]}
+        record["message" if response["ok"] else "error"] = response.get("result") or response.get("error")
+        write_json(args, [record] if args.jsonl else record)
+    elif response["ok"]:
+        sys.stdout.write(f"{response['result']}\n")
+    else:
+        sys.stderr.write(f"Error: {response['error']}\n")
+    if response["ok"]:
+        return EXIT_OK
+    return EXIT_NOT_FOUND if "does not exist" in response["error"] else EXIT_FAILED
+
+
+def run_op(args, op, op_args):
+    response = make_backend(args)({"op": op, "args": op_args})
+    return report_result(args, op, op_args.get("username"), response)
+
+
+def cmd_add(args):
+    if not args.password_stdin:
+        return fail(args, "Pass the password on stdin with --password-stdin", EXIT_USAGE)
+    password = sys.stdin.readline().rstrip("\n")
+    return run_op(args, "add_user", {"username": args.username, "password": password, "role": args.role,
+                                     "shell": args.shell, "fullname": args.fullname})
+
+
+def cmd_delete(args):
+    return run_op(args, "delete_user", {"username": args.username, "remove_home": not args.keep_home})
+
+
+def cmd_lock(args):
+    return run_op(args, "lock_user", {"username": args.username, "reason": args.reason,
+                                      "expire_days": args.expire_days})
+
+
+def cmd_unlock(args):
+    return run_op(args, "unlock_user", {"username": args.username})
+
+
+def cmd_modify(args):
+    return run_op(args, "modify_user", {
+        "username": args.username,
+        "new_username": args.new_username,
+        "shell": args.shell,
+        "home": args.home,
+        "move_home": args.move_home,
+        "groups": args.groups,
+        "append_groups": not args.replace_groups,
+        "role": args.role,
+    })
+
+
+def cmd_batch(args):
+    # One JSON object per input line, e.g. {"op": "lock", "username": "jdoe"};
+    # one result object per line out, in the same order
+    import json
+
+    handle = make_backend(args)
+    source = open(args.file, "r") if args.file else sys.stdin
+    failed = 0
+    try:
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("expected an object")
+            except ValueError as e:
+                response, op, username = {"ok": False, "error": f"Invalid JSON: {e}"}, None, None
+            else:
+                op = request.pop("op", "")
+                op = OP_NAMES.get(op, op)
+                username = request.get("username")
+                response = handle({"op": op, "args": request})
+            if not response["ok"]:
+                failed += 1
+            record = {"line": line_number, "op": op, "username": username, "ok": response["ok"]}
+            record["message" if response["ok"] else "error"] = response.get("result") or response.get("error")
+            # Results stream as they happen, so --json also writes JSON lines
+            if json_output(args):
+                sys.stdout.write(json.dumps(record) + "\n")
+            else:
+                status = "ok" if response["ok"] else "FAILED"
+                sys.stdout.write(f"line {line_number}: {status}: {record.get('message') or record.get('error')}\n")
+            sys.stdout.flush()
+    finally:
+        if args.file:
+            source.close()
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+def run_report(args, run, **kwargs):
+    # bulk_engine.run and batch_ops.run share a contract: report lines to
+    # `out`, (succeeded, failed) back. JSON mode keeps only the summary.
+    lines = []
+    out = lines.append if json_output(args) else print
+    success, failed = run(out=out, root=args.root, **kwargs)
+    if json_output(args):
+        record = {"succeeded": success, "failed": failed, "dry_run": kwargs.get("dry_run", False),
+                  "report": lines}
+        write_json(args, [record] if args.jsonl else record)
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+def cmd_import(args):
+    if not os.path.isfile(args.file):
+        return fail(args, f"CSV file {args.file} does not exist", EXIT_FAILED)
+    import bulk_engine
+    from bulk_checkpoint import CheckpointError
+    try:
+        return run_report(args, bulk_engine.run, path=args.file, dry_run=args.dry_run, resume=args.resume)
+    except CheckpointError as e:
+        return fail(args, str(e), EXIT_FAILED)
+
+
+def cmd_apply(args):
+    if not os.path.isfile(args.file):
+        return fail(args, f"Operations file {args.file} does not exist", EXIT_FAILED)
+    import batch_ops
+    return run_report(args, batch_ops.run, path=args.file, dry_run=args.dry_run)
+
+
+def cmd_audit(args):
+    import audit_engine
+    sections = args.include.split(",")
+    unknown = [s for s in sections if s not in audit_engine.SECTIONS]
+    if unknown:
+        return fail(args, f"Unknown audit section: {', '.join(unknown)}", EXIT_USAGE)
+    try:
+        path = audit_engine.generate(sections, args.output, refresh=args.refresh,
+                                     diff=args.diff or bool(args.baseline), baseline=args.baseline)
+    except audit_engine.audit_snapshot.SnapshotError as e:
+        return fail(args, str(e), EXIT_FAILED)
+    if json_output(args):
+        record = {"report": path, "sections": sections}
+        write_json(args, [record] if args.jsonl else record)
+    else:
+        sys.stdout.write(f"Audit report generated: {path}\n")
+    return EXIT_OK
+
+
+def fail(args, message, code):
+    if json_output(args):
+        import json
+        sys.stdout.write(json.dumps({"ok": False, "error": message}) + "\n")
+    else:
+        sys.stderr.write(f"Error: {message}\n")
+    return code
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    output = common.add_mutually_exclusive_group()
+    output.add_argument("--json", action="store_true", help="print one JSON document")
+    output.add_argument("--jsonl", action="store_true", help="print one JSON object per line")
+    common.add_argument("--root", help="operate on the account databases under this directory")
+
+    ops = argparse.ArgumentParser(add_help=False, parents=[common])
+    ops.add_argument("--daemon", action="store_true", help="send the request to a running userctrld")
+
+    parser = argparse.ArgumentParser(prog="userctrl", description="UserCTRL Pro command-line interface")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    p = commands.add_parser("list", parents=[common], help="list accounts")
+    p.add_argument("--role", help="only accounts with this role")
+    p.add_argument("--shell", help="only accounts with this login shell")
+    p.add_argument("--group", help="only members of this group")
+    p.add_argument("--min-uid", type=int)
+    p.add_argument("--max-uid", type=int)
+    p.add_argument("--all", action="store_true", help="include system accounts")
+    p.add_argument("--sort", default="name", choices=["name", "uid", "gid", "home", "shell"])
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser("show", parents=[common], help="show one account")
+    p.add_argument("username")
+    p.set_defaults(func=cmd_show)
+
+    p = commands.add_parser("inactive", parents=[common], help="list accounts with no recent login")
+    p.add_argument("--days", type=int, default=90, help="no login for this many days (default 90)")
+    p.add_argument("--all", action="store_true", help="include system accounts")
+    p.set_defaults(func=cmd_inactive)
+
+    p = commands.add_parser("history", parents=[common], help="list journaled operations, newest first")
+    p.add_argument("username", nargs="?", help="only operations on this account")
+    p.add_argument("--op", help="only this operation (lock, lock_user, bulk_add, ...)")
+    p.add_argument("--actor", help="only operations run by this user")
+    p.add_argument("--since", help="from this date (YYYY-MM-DD)")
+    p.add_argument("--until", help="up to and including this date (YYYY-MM-DD)")
+    p.add_argument("--limit", type=int, default=50, help="records per page (default 50)")
+    p.add_argument("--before", metavar="CURSOR", help="the next page, as printed after the previous one")
+    p.set_defaults(func=cmd_history)
+
+    p = commands.add_parser("add", parents=[ops], help="add an account")
+    p.add_argument("username")
+    p.add_argument("--password-stdin", action="store_true", help="read the password from the first line of stdin")
+    p.add_argument("--role", default="", choices=["", "admin", "student", "guest"])
+    p.add_argument("--shell", default="/bin/bash")
+    p.add_argument("--fullname", default="")
+    p.set_defaults(func=cmd_add)
+
+    p = commands.add_parser("delete", parents=[ops], help="delete an account")
+    p.add_argument("username")
+    p.add_argument("--keep-home", action="store_true")
+    p.set_defaults(func=cmd_delete)
+
+    p = commands.add_parser("lock", parents=[ops], help="lock an account")
+    p.add_argument("username")
+    p.add_argument("--reason", default="")
+    p.add_argument("--expire-days", type=int, default=0)
+    p.set_defaults(func=cmd_lock)
+
+    p = commands.add_parser("unlock", parents=[ops], help="unlock an account")
+    p.add_argument("username")
+    p.set_defaults(func=cmd_unlock)
+
+    p = commands.add_parser("modify", parents=[ops], help="change account attributes")
+    p.add_argument("username")
+    p.add_argument("--new-username", default="")
+    p.add_argument("--shell", default="")
+    p.add_argument("--home", default="")
+    p.add_argument("--move-home", action="store_true")
+    p.add_argument("--groups", default="", help="comma-separated supplementary groups")
+    p.add_argument("--replace-groups", action="store_true", help="set the groups instead of adding to them")
+    p.add_argument("--role", default="", choices=["", "admin", "student", "guest"])
+    p.set_defaults(func=cmd_modify)
+
+    p = commands.add_parser("batch", parents=[ops], help="run JSON-lines requests from stdin or a file")
+    p.add_argument("-f", "--file", help="read requests from this file instead of stdin")
+    p.set_defaults(func=cmd_batch)
+
+    p = commands.add_parser("import", parents=[common], help="add accounts from a CSV roster")
+    p.add_argument("file")
+    p.add_argument("-d", "--dry-run", action="store_true")
+    p.add_argument("--resume", action="store_true")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("apply", parents=[common], help="lock/unlock/delete/modify from a CSV or JSONL file")
+    p.add_argument("file")
+    p.add_argument("-d", "--dry-run", action="store_true")
+    p.set_defaults(func=cmd_apply)
+
+    p = commands.add_parser("audit", parents=[common], help="generate a system audit report")
+    p.add_argument("-i", "--include", default="system,memory,network,users,security",
+                   help="comma-separated sections")
+    p.add_argument("-o", "--output", help="also write the report, uncompressed, to this file")
+    p.add_argument("--refresh", action="store_true", help="recollect blocks instead of reusing cached ones")
+    p.add_argument("--diff", action="store_true", help="report only what changed since the last audit")
+    p.add_argument("--baseline", help="snapshot to compare with instead of the last one")
+    p.set_defaults(func=cmd_audit)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Output piped into head or similar
+        sys.stderr.close()
+        return EXIT_OK
+    except KeyboardInterrupt:
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
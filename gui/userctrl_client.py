@@ -0,0 +1,170 @@
+# userctrl_client.py - Client for the userctrld helper daemon
+# Starts the daemon on first use when nothing is listening, then keeps one
+# connection open. call() sends one request; call_many() pipelines a batch
+# and returns the responses in order.
+#
+# Usage: python3 gui/userctrl_client.py OP [JSON_ARGS]
+#   e.g. python3 gui/userctrl_client.py lock_user '{"username": "jdoe", "reason": "left"}'
+
+import json
+import os
+import select
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import journal
+from userctrld import socket_path
+
+DAEMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "userctrld.py")
+
+# An autostarted daemon exits after this long without clients
+AUTOSTART_IDLE_TIMEOUT = 600
+STARTUP_TIMEOUT = 5.0
+
+# Requests sent before reading their responses, so neither side's socket
+# buffer can fill up while the other is blocked writing
+PIPELINE_WINDOW = 64
+
+# Requests that change nothing, so resending them after a lost reply is safe
+READ_ONLY_OPS = {"ping", "auth_suspects"}
+
+
+class HelperError(Exception):
+    pass
+
+
+class HelperClient:
+    def __init__(self, path=None, autostart=True, root=None):
+        self.path = path or socket_path()
+        self.autostart = autostart
+        self.root = root
+        self.sock = None
+        self.reader = None
+        self.ids = 0
+        # Honoured by a root daemon, so records name the person behind sudo
+        self.actor = journal.default_actor()
+        # Worker threads share the connection one request (or batch) at a time
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.sock is not None:
+            return
+        try:
+            self.open_socket()
+        except OSError:
+            if not self.autostart:
+                raise HelperError(f"userctrld is not running on {self.path}")
+            self.start_daemon()
+
+    def open_socket(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def start_daemon(self):
+        args = [sys.executable, DAEMON, "--socket", self.path, "--idle-timeout", str(AUTOSTART_IDLE_TIMEOUT)]
+        if self.root:
+            args.extend(["--root", self.root])
+        subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                self.open_socket()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise HelperError(f"userctrld did not start on {self.path}")
+                time.sleep(0.05)
+
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+            self.sock = None
+            self.reader = None
+
+    def stale(self):
+        # An idle connection the daemon has since closed reads as EOF
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            return bool(readable) and not self.sock.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def exchange(self, requests):
+        # Send in windows and read the answers. A request is only sent again
+        # on a new connection when the daemon cannot have run it: the old
+        # connection failed before the first window was handed over, or
+        # every request is read-only.
+        read_only = all(op in READ_ONLY_OPS for op, _ in requests)
+        for attempt in (1, 2):
+            if self.sock is not None and self.stale():
+                self.close()
+            self.connect()
+            sent = False
+            responses = []
+            try:
+                for start in range(0, len(requests), PIPELINE_WINDOW):
+                    window = requests[start:start + PIPELINE_WINDOW]
+                    payload = []
+                    for op, args in window:
+                        self.ids += 1
+                        payload.append(json.dumps({"id": self.ids, "op": op, "args": args, "actor": self.actor}))
+                    self.sock.sendall(("\n".join(payload) + "\n").encode())
+                    sent = True
+                    for _ in window:
+                        line = self.reader.readline()
+                        if not line:
+                            raise ConnectionResetError("userctrld closed the connection")
+                        responses.append(json.loads(line))
+                return responses
+            except OSError:
+                self.close()
+                if sent and not read_only:
+                    raise HelperError("Lost the connection to userctrld; the request may have been applied")
+                if attempt == 2:
+                    raise HelperError("Lost the connection to userctrld")
+
+    def call(self, op, **args):
+        with self.lock:
+            response = self.exchange([(op, args)])[0]
+        if not response.get("ok"):
+            raise HelperError(response.get("error", "Unknown error"))
+        return response.get("result")
+
+    def call_many(self, requests):
+        # requests: [(op, args)]; returns [(ok, result or error)]
+        with self.lock:
+            responses = self.exchange(list(requests))
+        return [(r.get("ok", False), r.get("result") if r.get("ok") else r.get("error")) for r in responses]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: userctrl_client.py OP [JSON_ARGS]")
+        return 1
+    args = json.loads(argv[1]) if len(argv) > 1 else {}
+    client = HelperClient()
+    try:
+        result = client.call(argv[0], **args)
+    except HelperError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        client.close()
+    print(result if isinstance(result, str) else json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# userctrld.py - Long-lived helper that performs account operations
+# Listens on a Unix socket and answers newline-delimited JSON requests:
+#
+#   -> {"id": 1, "op": "lock_user", "args": {"username": "jdoe", "reason": "..."}}
+#   <- {"id": 1, "ok": true, "result": "User jdoe locked successfully"}
+#   <- {"id": 2, "ok": false, "error": "User ghost does not exist"}
+#
+# Requests on one connection are answered in order, so clients may send
+# several before reading (pipelining). The account index is kept warm and
+# only reloaded when passwd/group change, and no shell or interpreter is
+# started per request. Only root and the daemon's own user may connect.
+#
+# Usage: python3 gui/userctrld.py [--socket PATH] [--root DIR] [--idle-timeout SECONDS]
+
+import argparse
+import json
+import os
+import pwd
+import socket
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import account_ops
+import audit_engine
+import authlog
+import journal
+import report_archive
+from account_index import AccountIndex
+from account_watch import AccountWatcher
+from journal import log_message
+from shadow_tools import ToolError
+
+
+# Seconds between background archive prunes
+PRUNE_INTERVAL = 3600
+
+# Largest request line accepted, so a bad client can't exhaust memory
+MAX_REQUEST = 1 << 20
+
+# Requests that change nothing and would only flood the journal
+UNJOURNALED = {"ping", "auth_suspects"}
+
+
+def default_socket_path():
+    if os.geteuid() == 0:
+        return "/run/userctrl/userctrld.sock"
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"userctrl-{os.geteuid()}", "userctrld.sock")
+
+
+def socket_path():
+    return os.environ.get("USERCTRL_SOCKET") or default_socket_path()
+
+
+def peer_uid(conn):
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+class Helper:
+    def __init__(self, root=None):
+        self.root = root
+        self.watcher = AccountWatcher(root)
+        self.accounts = AccountIndex.load(root)
+        self.watcher.changed()
+        # Account databases are written by one request at a time
+        self.lock = threading.Lock()
+        self.pruner = None
+        self.last_prune = 0
+        self.ops = {
+            "ping": self.ping,
+            "add_user": self.account_op(account_ops.add_user),
+            "delete_user": self.account_op(account_ops.delete_user),
+            "lock_user": self.account_op(account_ops.lock_user),
+            "unlock_user": self.account_op(account_ops.unlock_user),
+            "modify_user": self.account_op(account_ops.modify_user),
+            "audit": self.audit,
+            "auth_suspects": self.auth_suspects,
+        }
+
+    def current_accounts(self):
+        # Reloaded only after a write or an outside change to passwd/group
+        if self.watcher.changed() or self.accounts is None:
+            self.accounts = AccountIndex.load(self.root)
+        return self.accounts
+
+    def account_op(self, func):
+        def op(**args):
+            with self.lock:
+                try:
+                    return func(self.current_accounts(), root=self.root, **args)
+                finally:
+                    self.accounts = None
+        return op
+
+    def ping(self):
+        return {"pid": os.getpid(), "accounts": len(self.current_accounts())}
+
+    def audit(self, sections=None, refresh=False, diff=False, prune=True):
+        timings = {}
+        try:
+            report = audit_engine.generate(sections, refresh=refresh, diff=diff, timings=timings)
+        except (OSError, audit_engine.audit_snapshot.SnapshotError) as e:
+            raise ToolError(f"Failed to generate audit report: {e}")
+        if prune:
+            self.start_prune()
+        return {"report": report, "timings": timings}
+
+    def auth_suspects(self, min_failures=authlog.SUSPECT_FAILURES, since=None):
+        # The auth log is only readable by root and adm, so the GUI asks here
+        try:
+            store = authlog.AuthLogStore()
+            try:
+                store.update()
+                return {"suspects": store.suspects(min_failures, since), "hourly": store.hourly()}
+            finally:
+                store.close()
+        except sqlite3.Error as e:
+            raise ToolError(f"Auth log store unavailable: {e}")
+
+    def start_prune(self):
+        # Apply the archive retention tiers after an audit, at most once per
+        # PRUNE_INTERVAL, on a thread so the reply isn't held up
+        if self.pruner is not None and self.pruner.is_alive():
+            return
+        if time.monotonic() - self.last_prune < PRUNE_INTERVAL and self.last_prune:
+            return
+        self.last_prune = time.monotonic()
+
+        def prune():
+            try:
+                report_archive.prune_archive(log=lambda m: log_message(m, log="audit"))
+            except Exception as e:
+                log_message(f"Archive pruning failed: {e}", log="audit")
+
+        self.pruner = threading.Thread(target=prune, daemon=True)
+        self.pruner.start()
+
+    def handle(self, request):
+        op = self.ops.get(request.get("op"))
+        if op is None:
+            return {"ok": False, "error": f"Unknown operation {request.get('op')}"}
+        args = request.get("args") or {}
+        if not isinstance(args, dict):
+            return {"ok": False, "error": "args must be an object"}
+        if request.get("op") in UNJOURNALED:
+            try:
+                return {"ok": True, "result": op(**args)}
+            except (ToolError, OSError, ValueError, TypeError) as e:
+                return {"ok": False, "error": str(e)}
+        fields = {key: value for key, value in args.items() if key != "username"}
+        try:
+            with journal.operation(request["op"], args.get("username"), **fields) as entry:
+                result = op(**args)
+                if isinstance(result, str):
+                    entry["message"] = result
+            return {"ok": True, "result": result}
+        except (ToolError, OSError, ValueError, TypeError) as e:
+            return {"ok": False, "error": str(e)}
+
+
+class HelperServer:
+    def __init__(self, helper, path, idle_timeout=0):
+        self.helper = helper
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.last_active = time.monotonic()
+        self.clients = 0
+        self.sock = None
+
+    def bind(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            # Only replace the socket if nothing is answering on it
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise OSError(f"userctrld is already running on {self.path}")
+            except ConnectionRefusedError:
+                os.unlink(self.path)
+            finally:
+                probe.close()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen(16)
+        self.sock.settimeout(1.0)
+
+    def serve_forever(self):
+        log_message(f"userctrld listening on {self.path}")
+        try:
+            while True:
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.timeout:
+                    if (self.idle_timeout and not self.clients
+                            and time.monotonic() - self.last_active > self.idle_timeout):
+                        break
+                    continue
+                uid = peer_uid(conn)
+                if uid not in (0, os.geteuid()):
+                    conn.close()
+                    continue
+                self.clients += 1
+                threading.Thread(target=self.serve_client, args=(conn, uid), daemon=True).start()
+        finally:
+            self.close()
+            log_message("userctrld stopped")
+
+    def serve_client(self, conn, uid=None):
+        # Journal records name the connecting user (or whoever ran sudo)
+        try:
+            actor = pwd.getpwuid(uid).pw_name if uid is not None else None
+        except KeyError:
+            actor = str(uid)
+        try:
+            reader = conn.makefile("rb")
+            writer = conn.makefile("wb")
+            while True:
+                line = reader.readline(MAX_REQUEST)
+                if not line:
+                    break
+                self.last_active = time.monotonic()
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be an object")
+                    with journal.acting_as(request.get("actor") if uid == 0 and request.get("actor") else actor):
+                        response = self.helper.handle(request)
+                    response["id"] = request.get("id")
+                except ValueError as e:
+                    response = {"id": None, "ok": False, "error": f"Bad request: {e}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                writer.flush()
+        except OSError:
+            pass
+        finally:
+            self.clients -= 1
+            self.last_active = time.monotonic()
+            conn.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="UserCTRL Pro account helper daemon")
+    parser.add_argument("--socket", default=socket_path(), help="Unix socket to listen on")
+    parser.add_argument("--root", help="operate on the account databases under this directory")
+    parser.add_argument("--idle-timeout", type=float, default=0,
+                        help="exit after this many seconds without clients (0 = never)")
+    args = parser.parse_args(argv)
+
+    server = HelperServer(Helper(args.root), args.socket, args.idle_timeout)
+    try:
+        server.bind()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,14 +4,7 @@
 # This script is designed to work with the UserCTRL Pro GUI
 
 # Set up logging
-LOG_DIR="../logs"
-mkdir -p "$LOG_DIR"
-LOG_FILE="$LOG_DIR/user_management_$(date +%Y%m%d).log"
-
-# Function to log messages
-log_message() {
-    echo "$(date +"%Y-%m-%d %H:%M:%S") - $1" >> "$LOG_FILE"
-}
+source "$(dirname "$(readlink -f "${BASH_SOURCE[0]}")")/journal.sh"
 
 log_message "Starting delete_user.sh script"
 
@@ -4,19 +4,15 @@
 # This script is designed to work with the UserCTRL Pro GUI
 
 # Set up logging
-LOG_DIR="../logs"
-mkdir -p "$LOG_DIR"
-LOG_FILE="$LOG_DIR/audit_$(date +%Y%m%d).log"
+JOURNAL_CHANNEL=audit
+source "$(dirname "$(readlink -f "${BASH_SOURCE[0]}")")/journal.sh"
 
-# Create archive directory if it doesn't exist
-ARCHIVE_DIR="./archive/reports"
+# Create archive directory if it doesn't exist (the same one the GUI and
+# helper use, whatever the current directory)
+ARCHIVE_ROOT="${USERCTRL_ARCHIVE_DIR:-$(dirname "$(dirname "$(readlink -f "${BASH_SOURCE[0]}")")")/archive}"
+ARCHIVE_DIR="$ARCHIVE_ROOT/reports"
 mkdir -p "$ARCHIVE_DIR"
 
-# Function to log messages
-log_message() {
-    echo "$(date +"%Y-%m-%d %H:%M:%S") - $1" >> "$LOG_FILE"
-}
-
 log_message "Starting generate_audit.sh script"
 
 # Default values
@@ -162,7 +158,14 @@ if [[ " ${SECTIONS[*]} " =~ " security " ]]; then
     
     # Failed login attempts
     echo -e "\n-- Failed Login Attempts --" >> "$OUTPUT_FILE"
-    grep "Failed password" /var/log/auth.log 2>/dev/null | tail -n 10 >> "$OUTPUT_FILE" || echo "No failed login information available" >> "$OUTPUT_FILE"
+    # authlog.py reads only what was logged since its last run (rotated logs
+    # included); grep rescans the whole log
+    AUTHLOG_TOOL="$(dirname "$(readlink -f "$0")")/../gui/authlog.py"
+    if [ -f "$AUTHLOG_TOOL" ] && FAILED=$(python3 "$AUTHLOG_TOOL" recent 2>/dev/null); then
+        [ -n "$FAILED" ] && echo "$FAILED" >> "$OUTPUT_FILE"
+    else
+        grep "Failed password" /var/log/auth.log 2>/dev/null | tail -n 10 >> "$OUTPUT_FILE" || echo "No failed login information available" >> "$OUTPUT_FILE"
+    fi
     
     # SSH configuration
     echo -e "\n-- SSH Configuration --" >> "$OUTPUT_FILE"
@@ -190,8 +193,16 @@ Date: $(date +"%Y-%m-%d %H:%M:%S")
 =======================================================
 EOF
 
-# Archive a copy of the report
-cp "$OUTPUT_FILE" "$ARCHIVE_DIR/"
+# Archive a compressed copy of the report and add it to the report catalog
+ARCHIVE_TOOL="$(dirname "$(readlink -f "$0")")/../gui/report_archive.py"
+if [ -f "$ARCHIVE_TOOL" ]; then
+    python3 "$ARCHIVE_TOOL" --archive "$ARCHIVE_DIR" store "$OUTPUT_FILE" > /dev/null 2>&1 || {
+        log_message "Could not archive $OUTPUT_FILE; storing an uncompressed copy"
+        cp "$OUTPUT_FILE" "$ARCHIVE_DIR/"
+    }
+else
+    cp "$OUTPUT_FILE" "$ARCHIVE_DIR/"
+fi
 
 echo "Audit report generated: $OUTPUT_FILE"
 log_message "Audit report generated: $OUTPUT_FILE"
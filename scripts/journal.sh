@@ -0,0 +1,57 @@
+# journal.sh - Structured journal for the shell scripts
+# Sourced by every script; appends the same JSON lines as gui/journal.py to
+# <repo>/logs/journal.jsonl (or $USERCTRL_LOG_DIR/journal.jsonl), whatever
+# the current directory. Each record is one write, so lines from concurrent
+# writers never interleave. Records are written under the same flock that
+# gui/journal.py rotates under, and the file is reopened when a rotation has
+# moved it, so long-running scripts follow the current journal.
+#
+# Usage: JOURNAL_CHANNEL=audit; source "$(dirname "${BASH_SOURCE[0]}")/journal.sh"
+#        log_message "text"
+
+LOG_DIR="${USERCTRL_LOG_DIR:-$(dirname "$(dirname "$(readlink -f "${BASH_SOURCE[0]}")")")/logs}"
+mkdir -p "$LOG_DIR"
+JOURNAL_FILE="$LOG_DIR/journal.jsonl"
+JOURNAL_SOURCE="$(basename "$0" .sh)"
+JOURNAL_ACTOR="${SUDO_USER:-$(id -un)}"
+JOURNAL_CHANNEL="${JOURNAL_CHANNEL:-user_management}"
+exec {JOURNAL_FD}>>"$JOURNAL_FILE"
+exec {JOURNAL_LOCK_FD}>>"$JOURNAL_FILE.lock"
+
+# json_quote VAR STRING: set VAR to STRING as a JSON string, without forking
+json_quote() {
+    local s="$2"
+    s="${s//\\/\\\\}"
+    s="${s//\"/\\\"}"
+    s="${s//$'\n'/\\n}"
+    s="${s//$'\r'/\\r}"
+    s="${s//$'\t'/\\t}"
+    printf -v "$1" '"%s"' "$s"
+}
+
+# journal_record OP TARGET RESULT MESSAGE
+journal_record() {
+    local now op target result message source actor channel
+    printf -v now '%(%Y-%m-%dT%H:%M:%S)T' -1
+    json_quote op "$1"
+    target=null
+    [ -n "$2" ] && json_quote target "$2"
+    json_quote result "$3"
+    json_quote message "$4"
+    json_quote source "$JOURNAL_SOURCE"
+    json_quote actor "$JOURNAL_ACTOR"
+    json_quote channel "$JOURNAL_CHANNEL"
+    flock -x "$JOURNAL_LOCK_FD"
+    # Another process may have rotated the file since our last write
+    if ! [ "$JOURNAL_FILE" -ef "/dev/fd/$JOURNAL_FD" ]; then
+        exec {JOURNAL_FD}>&-
+        exec {JOURNAL_FD}>>"$JOURNAL_FILE"
+    fi
+    printf '{"time":"%s","source":%s,"actor":%s,"pid":%d,"op":%s,"target":%s,"result":%s,"message":%s,"channel":%s}\n' \
+        "$now" "$source" "$actor" "$$" "$op" "$target" "$result" "$message" "$channel" >&"$JOURNAL_FD"
+    flock -u "$JOURNAL_LOCK_FD"
+}
+
+log_message() {
+    journal_record log "" ok "$1"
+}
@@ -0,0 +1,68 @@
+# conftest.py - Shared setup for the tests
+# The gui modules are imported from gui/ directly, and everything they log
+# or checkpoint goes to a scratch USERCTRL_LOG_DIR, never the repo's logs/.
+# Tests that run the shadow-utils tools do so inside a scratch --root tree.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(PACKAGE, "gui"))
+
+LOG_DIR = tempfile.mkdtemp(prefix="userctrl_tests_")
+os.environ["USERCTRL_LOG_DIR"] = LOG_DIR
+os.environ["USERCTRL_ARCHIVE_DIR"] = os.path.join(LOG_DIR, "archive")
+
+ETC_FILES = ("passwd", "group", "shadow", "gshadow", "login.defs", "shells")
+
+# The shadow-utils tools need root, even inside a --root tree
+needs_tools = pytest.mark.skipif(os.geteuid() != 0 or not shutil.which("newusers"),
+                                 reason="needs root and the shadow-utils tools")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    import journal
+    journal.flush()
+    shutil.rmtree(LOG_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def root(tmp_path):
+    # A copy of this host's account databases, with an empty skeleton
+    # holding one dotfile
+    tree = tmp_path / "root"
+    (tree / "etc" / "skel").mkdir(parents=True)
+    (tree / "home").mkdir()
+    for name in ETC_FILES:
+        if os.path.exists(os.path.join("/etc", name)):
+            shutil.copy(os.path.join("/etc", name), tree / "etc" / name)
+    (tree / "etc" / "skel" / ".profile").write_text("# skeleton\n")
+    return str(tree)
+
+
+def add_account(root, name, password="Old@pass1"):
+    # An account made the way an administrator would, outside any import
+    subprocess.run(["useradd", "--root", root, "-m", "-s", "/bin/bash", name], check=True, capture_output=True)
+    subprocess.run(["chpasswd", "--root", root, "-c", "SHA512"], input=f"{name}:{password}\n", text=True, check=True,
+                   capture_output=True)
+
+
+def shadow_entry(root, name):
+    with open(os.path.join(root, "etc", "shadow")) as f:
+        for line in f:
+            if line.split(":", 1)[0] == name:
+                return line
+    return None
+
+
+def write_csv(path, rows):
+    with open(path, "w") as f:
+        f.write("username,fullname,password,shell,role\n")
+        for row in rows:
+            f.write(",".join(row) + "\n")
+    return path
@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+import audit_engine
+from audit_engine import CollectorPool
+
+
+@pytest.fixture
+def hung(monkeypatch):
+    # The Disk Usage block stuck the way df is on a dead NFS mount, until
+    # the test sets the event
+    release = threading.Event()
+    calls = []
+
+    def stuck():
+        calls.append(1)
+        release.wait()
+        return "late\n"
+    title, blocks = audit_engine.SECTIONS["memory"]
+    blocks = [(name, stuck if name == "Disk Usage" else func, inputs) for name, func, inputs in blocks]
+    monkeypatch.setitem(audit_engine.SECTIONS, "memory", (title, blocks))
+    monkeypatch.setattr(audit_engine, "pool", CollectorPool())
+    yield calls, release
+    release.set()
+
+
+def disk_usage(blocks):
+    return [(text, error) for _, title, text, error in blocks if title == "Disk Usage"]
+
+
+def test_a_hung_collector_is_not_started_again(hung):
+    calls, release = hung
+    for _ in range(5):
+        blocks = audit_engine.collect(["memory", "system"], timeout=0.2)
+        assert disk_usage(blocks) == [("", "timed out after 0.2s")]
+        assert all(error is None for _, title, _, error in blocks if title != "Disk Usage")
+    assert len(calls) == 1
+    assert audit_engine.pool.workers <= audit_engine.POOL_SIZE
+
+
+def test_a_collector_runs_again_once_it_has_finished(hung):
+    calls, release = hung
+    audit_engine.collect(["memory"], timeout=0.1)
+    release.set()
+    for _ in range(500):
+        if not audit_engine.pool.running:
+            break
+        threading.Event().wait(0.01)
+    assert disk_usage(audit_engine.collect(["memory"], timeout=5)) == [("late\n", None)]
+    assert len(calls) == 2
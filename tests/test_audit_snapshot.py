@@ -0,0 +1,20 @@
+import os
+from datetime import datetime
+
+import audit_snapshot
+
+
+def test_snapshots_in_the_same_second_are_all_kept(tmp_path):
+    directory = str(tmp_path)
+    # A snapshot named the old way, to the second
+    old = os.path.join(directory, "audit_20261018_120000.json.gz")
+    audit_snapshot.save(audit_snapshot.make_snapshot([], "host", {}, datetime(2026, 10, 18, 11, 59, 59)), directory)
+    os.rename(audit_snapshot.list_snapshots(directory)[0], old)
+
+    when = datetime(2026, 10, 18, 12, 0, 0, 250000)
+    paths = [audit_snapshot.save(audit_snapshot.make_snapshot([], f"host{i}", {}, when), directory)
+             for i in range(3)]
+    assert len(set(paths)) == 3
+    assert audit_snapshot.list_snapshots(directory) == [old] + paths
+    assert audit_snapshot.load(audit_snapshot.previous_snapshot(directory))["hostname"] == "host2"
+    assert sorted(os.listdir(directory)) == sorted(os.path.basename(p) for p in [old] + paths)
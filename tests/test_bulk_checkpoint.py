@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import bulk_checkpoint
+from account_index import Account
+from bulk_checkpoint import Checkpoint, CheckpointError
+from roster_validator import Row
+
+
+def make_checkpoint(tmp_path, records, uids=(1000,)):
+    csv_path = tmp_path / "users.csv"
+    csv_path.write_text("username,fullname,password,shell,role\n" + "".join(f"u{i},U,Pass@{i}x,/bin/sh,guest\n"
+                                                                           for i in range(10)))
+    checkpoint = Checkpoint(str(csv_path), directory=str(tmp_path / "checkpoints"))
+    checkpoint.start(False, uids)
+    checkpoint.file.writelines(record + "\n" for record in records)
+    checkpoint.close()
+    return checkpoint
+
+
+def row(offset, line, username):
+    return Row(line, offset, 5, username, "U", "Pass@1x", "/bin/sh", "guest")
+
+
+def account(name, uid):
+    return Account(name, uid, uid, "U", f"/home/{name}", "/bin/sh", ())
+
+
+def test_only_attempted_rows_of_the_pending_chunk_are_finished(tmp_path):
+    checkpoint = make_checkpoint(tmp_path, [
+        "B 40 80", "A 60 3 u1", "R 60 3 SUCCESS u1", "E 80 4",
+        "R 100 5 SKIPPED u3", "B 80 140", "A 120 6 u4", "A 140 7 u5",
+    ], uids=(1000, 1001))
+    point = checkpoint.resume_point()
+    assert (point.offset, point.line, point.pending) == (80, 4, (80, 140))
+    assert point.attempted == {"u4": 120, "u5": 140}
+    assert point.created_by_import(row(120, 6, "u4"), account("u4", 1002))
+    # SKIPPED in the same byte range: never attempted
+    assert not point.created_by_import(row(100, 5, "u3"), account("u3", 1002))
+    # A UID that was in use before the import started
+    assert not point.created_by_import(row(140, 7, "u5"), account("u5", 1001))
+    assert not point.created_by_import(row(140, 7, "u5"), None)
+
+
+def test_header_records_the_uids_in_use(tmp_path):
+    checkpoint = make_checkpoint(tmp_path, [], uids={1005, 0, 1000})
+    with open(checkpoint.path) as f:
+        assert json.loads(f.readline()[2:])["uids"] == [0, 1000, 1005]
+
+
+def test_missing_and_finished_checkpoints(tmp_path):
+    checkpoint = make_checkpoint(tmp_path, ["B 40 80", "E 80 4", "D"])
+    assert checkpoint.resume_point().finished
+    os.unlink(checkpoint.path)
+    point = checkpoint.resume_point()
+    assert (point.offset, point.line, point.pending, point.finished) == (0, 1, None, False)
+
+
+def test_a_damaged_or_foreign_checkpoint_is_refused(tmp_path):
+    checkpoint = make_checkpoint(tmp_path, ["B 40 80", "E 80 4"])
+    with open(checkpoint.path, "w") as f:
+        f.write(f"H {json.dumps({'sha256': '0' * 64})}\nE 80 4\n")
+    with pytest.raises(CheckpointError, match="changed"):
+        checkpoint.resume_point()
+    with open(checkpoint.path, "w") as f:
+        f.write("E 80 4\n")
+    with pytest.raises(CheckpointError, match="damaged"):
+        checkpoint.resume_point()
+
+
+def test_committed_chunks_leave_nothing_pending(tmp_path):
+    checkpoint = make_checkpoint(tmp_path, ["B 40 80", "A 60 3 u1", "R 60 3 SUCCESS u1", "E 80 4"])
+    point = checkpoint.resume_point()
+    assert (point.offset, point.line, point.pending, point.attempted) == (80, 4, None, {})
+
+
+def test_a_long_pending_chunk_is_found_by_scanning(tmp_path, monkeypatch):
+    # More A records than the tail window holds: the whole file is scanned
+    monkeypatch.setattr(bulk_checkpoint, "TAIL_BYTES", 64)
+    attempted = [f"A {100 + i} {5 + i} n{i}" for i in range(20)]
+    checkpoint = make_checkpoint(tmp_path, ["B 40 80", "A 60 3 u1", "E 80 4", "B 80 200"] + attempted,
+                                 uids=(1000,))
+    point = checkpoint.resume_point()
+    assert (point.offset, point.line, point.pending) == (80, 4, (80, 200))
+    assert point.attempted == {f"n{i}": 100 + i for i in range(20)}
+    assert point.known_uids == {1000}
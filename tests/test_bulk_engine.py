@@ -0,0 +1,156 @@
+import os
+
+import pytest
+
+import bulk_engine
+import shadow_tools
+from bulk_checkpoint import Checkpoint
+from conftest import add_account, needs_tools, shadow_entry, write_csv
+from roster_validator import Row
+from shadow_tools import ToolError
+
+
+class Interrupted(BaseException):
+    # Stands in for the process dying mid-chunk: nothing in run() catches it
+    pass
+
+
+@needs_tools
+def test_resume_leaves_existing_accounts_alone(root, tmp_path, monkeypatch):
+    add_account(root, "existinguser")
+    home = os.path.join(root, "home", "existinguser")
+    os.chmod(home, 0o700)
+    with open(os.path.join(home, ".profile"), "w") as f:
+        f.write("# edited by existinguser\n")
+    before = shadow_entry(root, "existinguser")
+    csv_path = write_csv(str(tmp_path / "users.csv"), [
+        ("jdoe", "John Doe", "Pass@123", "/bin/bash", "student"),
+        ("existinguser", "Already Exists", "SomePass@1", "/bin/bash", "student"),
+        ("asmith", "Alice Smith", "Secret456", "/bin/bash", "student"),
+    ])
+
+    # Die after newusers has created the chunk's accounts
+    def die(changes, root=None):
+        raise Interrupted()
+    monkeypatch.setattr(bulk_engine, "update_group_members", die)
+    with pytest.raises(Interrupted):
+        bulk_engine.run(csv_path, root=root, out=lambda line: None)
+    monkeypatch.undo()
+    # The existing account was SKIPPED, so the chunk never attempted it
+    assert set(Checkpoint(csv_path).resume_point().attempted) == {"jdoe", "asmith"}
+
+    lines = []
+    success, failed = bulk_engine.run(csv_path, root=root, out=lines.append, resume=True)
+    assert (success, failed) == (2, 1)
+    assert "  - SKIPPED: User existinguser already exists" in lines
+
+    # The existing account kept its password, groups and home
+    assert shadow_entry(root, "existinguser") == before
+    members = shadow_tools.group_members("student", root)
+    assert "existinguser" not in members
+    assert os.stat(home).st_mode & 0o777 == 0o700
+    with open(os.path.join(home, ".profile")) as f:
+        assert f.read() == "# edited by existinguser\n"
+
+    # The accounts the interrupted chunk created were finished
+    for name in ("jdoe", "asmith"):
+        assert name in members
+        assert os.path.exists(os.path.join(root, "home", name, ".profile"))
+
+
+def students(count, prefix="st"):
+    return [(f"{prefix}{i:03d}", f"Student {i}", f"Pass@{i}word", "/bin/bash", "student") for i in range(count)]
+
+
+@needs_tools
+def test_run_creates_accounts_and_skips_invalid_rows(root, tmp_path):
+    add_account(root, "existinguser")
+    csv_path = write_csv(str(tmp_path / "users.csv"), students(3) + [
+        ("existinguser", "Already Exists", "SomePass@1", "/bin/bash", "guest"),
+        ("invalidshell", "Broken Shell", "BadPass@321", "/bin/invalidshell", "guest"),
+        ("boss", "The Boss", "Boss@pass1", "/bin/bash", "admin"),
+    ])
+    lines = []
+    assert bulk_engine.run(csv_path, root=root, out=lines.append) == (4, 2)
+    assert shadow_tools.group_members("student", root) == ["st000", "st001", "st002"]
+    assert "boss" in shadow_tools.group_members("sudo", root)
+    assert shadow_entry(root, "st001").split(":")[1].startswith("$")
+    home = os.path.join(root, "home", "st001")
+    assert os.stat(home).st_mode & 0o777 == 0o750
+    assert os.path.exists(os.path.join(home, ".profile"))
+    assert "  Skipped: 2" in lines
+
+    # Resuming a finished import does nothing
+    lines = []
+    assert bulk_engine.run(csv_path, root=root, out=lines.append, resume=True) == (0, 0)
+    assert lines[-1] == "This file has already been imported completely"
+
+
+@needs_tools
+def test_commit_reports_later_failures_per_row(root, monkeypatch):
+    # Once newusers has created the accounts, a failing step marks only the
+    # rows it failed for, and the remaining homes are still set up
+    real_setup_home = bulk_engine.setup_home
+
+    def setup_home(path, skel, uid, gid):
+        if path.endswith("st001"):
+            raise PermissionError(13, "Permission denied", path)
+        real_setup_home(path, skel, uid, gid)
+    monkeypatch.setattr(bulk_engine, "setup_home", setup_home)
+
+    rows = [Row(i + 2, 0, 5, *fields) for i, fields in enumerate(students(3))]
+    done = []
+    bulk_engine.commit(rows, root=root, on_done=lambda r, problem: done.append((r.username, problem)))
+    assert done == [("st000", None),
+                    ("st001", f"home directory not set up: [Errno 13] Permission denied: "
+                              f"'{os.path.join(root, 'home', 'st001')}'"),
+                    ("st002", None)]
+    assert os.path.exists(os.path.join(root, "home", "st002", ".profile"))
+    assert shadow_tools.group_members("student", root) == ["st000", "st001", "st002"]
+
+
+@needs_tools
+def test_partial_rows_count_as_created(root, tmp_path, monkeypatch):
+    def no_groups(changes, root=None):
+        raise ToolError("gpasswd: cannot lock /etc/group")
+    monkeypatch.setattr(bulk_engine, "update_group_members", no_groups)
+    csv_path = write_csv(str(tmp_path / "users.csv"), students(2))
+    lines = []
+    assert bulk_engine.run(csv_path, root=root, out=lines.append) == (2, 0)
+    assert ("  - PARTIAL: User st000 created with role student, but not added to its role group: "
+            "gpasswd: cannot lock /etc/group") in lines
+    assert "  Created with errors: 2" in lines
+
+
+@needs_tools
+def test_newusers_failure_fails_the_chunk(root, tmp_path, monkeypatch):
+    def broken(entries, root=None, check=True):
+        raise ToolError("newusers: line 1: can't create user")
+    monkeypatch.setattr(bulk_engine, "new_users", broken)
+    csv_path = write_csv(str(tmp_path / "users.csv"), students(2))
+    lines = []
+    assert bulk_engine.run(csv_path, root=root, out=lines.append) == (0, 2)
+    assert "  - FAILED: newusers: line 1: can't create user" in lines
+
+
+@needs_tools
+def test_cancel_and_resume(root, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_engine, "CHUNK_SIZE", 2)
+    csv_path = write_csv(str(tmp_path / "users.csv"), students(5))
+    chunks = []
+    real_commit = bulk_engine.commit
+
+    def commit(rows, **kwargs):
+        chunks.append([r.username for r in rows])
+        real_commit(rows, **kwargs)
+    monkeypatch.setattr(bulk_engine, "commit", commit)
+
+    lines = []
+    # Cancelled once the first chunk is in: stops at the chunk boundary
+    assert bulk_engine.run(csv_path, root=root, out=lines.append, cancelled=lambda: bool(chunks)) == (2, 0)
+    assert "Import cancelled; resume it to add the remaining users" in lines
+    lines = []
+    assert bulk_engine.run(csv_path, root=root, out=lines.append, resume=True) == (3, 0)
+    assert "Resuming after line 3" in lines
+    assert chunks == [["st000", "st001"], ["st002", "st003"], ["st004"]]
+    assert shadow_tools.group_members("student", root) == [f"st{i:03d}" for i in range(5)]
@@ -0,0 +1,25 @@
+import history_index
+from history_index import HistoryIndex
+from journal import Journal
+
+
+def test_the_journal_writer_keeps_the_index_current(tmp_path):
+    directory = str(tmp_path)
+    journal = Journal(directory)
+    journal.on_commit.append(history_index.follower(directory))
+    journal.record("lock_user", "jdoe", message="User jdoe locked successfully", sync=True)
+    # close() waits for the writer thread, and with it the update
+    journal.close()
+
+    index = HistoryIndex(str(tmp_path / "history.db"), directory)
+    rows = [index.record(row) for row in index.db.execute("SELECT * FROM operations")]
+    assert [(row["op"], row["target"]) for row in rows] == [("lock_user", "jdoe")]
+    index.close()
+
+
+def test_the_follower_gives_up_quietly(tmp_path, capsys):
+    (tmp_path / "history.db").mkdir()
+    follow = history_index.follower(str(tmp_path))
+    follow()
+    follow()
+    assert capsys.readouterr().err.count("history_index: cannot update the index") == 1
@@ -0,0 +1,129 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+import mail_queue
+from mail_queue import MailQueue
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    # Accepts everything, unless told to refuse the login (535) or one
+    # recipient (550)
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.refuse_login = False
+        self.refuse_recipient = None
+        self.messages = []
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        self.reply("220 localhost ESMTP stand-in")
+        recipients = []
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                self.reply("535 5.7.8 Authentication credentials invalid" if server.refuse_login
+                           else "235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command.split(":", 1)[1].strip(" <>")
+                if recipient == server.refuse_recipient:
+                    self.reply("550 5.1.1 No such user")
+                else:
+                    recipients.append(recipient)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 Go ahead")
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                server.messages.append(recipients)
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def server():
+    server = SMTPStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def queue(server, tmp_path):
+    config = tmp_path / "mail.conf"
+    config.write_text(f"[smtp]\nhost = 127.0.0.1\nport = {server.server_address[1]}\n"
+                      f"user = reports\npassword = secret\nsender = audit@localhost\n")
+    queue = MailQueue(str(tmp_path / "spool"), str(config))
+    yield queue
+    queue.close()
+
+
+def states(queue):
+    return [tuple(row) for row in queue.db.execute("SELECT state, attempts FROM messages ORDER BY id")]
+
+
+def test_a_refused_login_keeps_the_whole_queue(server, queue):
+    server.refuse_login = True
+    for i in range(3):
+        queue.enqueue(f"admin{i}@example.com", "System Audit Report")
+    assert queue.drain() == (0, 0)
+    assert states(queue) == [("queued", 0)] * 3
+    status = queue.status()
+    assert status["retrying"] == 3 and status["next_attempt"] > time.time()
+    assert "535" in status["error"]
+
+    # The queue backs off further while the login keeps failing
+    first = status["next_attempt"]
+    queue.db.execute("UPDATE messages SET next_attempt = 0")
+    queue.db.commit()
+    assert queue.drain() == (0, 0)
+    assert queue.status()["next_attempt"] - first >= mail_queue.RETRY_BASE - 1
+    assert states(queue) == [("queued", 0)] * 3
+
+    server.refuse_login = False
+    queue.db.execute("UPDATE messages SET next_attempt = 0")
+    queue.db.commit()
+    assert queue.drain() == (3, 0)
+    assert queue.session_failures == 0
+
+
+def test_a_refused_recipient_fails_only_its_message(server, queue):
+    server.refuse_recipient = "gone@example.com"
+    queue.enqueue("gone@example.com", "System Audit Report")
+    queue.enqueue("admin@example.com", "System Audit Report")
+    assert queue.drain() == (1, 1)
+    assert states(queue) == [("failed", 1), ("sent", 1)]
+    assert server.messages == [["admin@example.com"]]
+
+
+def test_an_unreachable_server_keeps_the_queue(queue, tmp_path):
+    config = tmp_path / "down.conf"
+    config.write_text("[smtp]\nhost = 127.0.0.1\nport = 1\n")
+    queue.config_path = str(config)
+    queue.enqueue("admin@example.com", "System Audit Report")
+    assert queue.drain() == (0, 0)
+    assert states(queue) == [("queued", 0)]
+    assert queue.status()["error"].startswith("cannot connect to 127.0.0.1:1")
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import shadow_tools
+from conftest import add_account, needs_tools
+from shadow_tools import ToolError
+
+
+def gshadow_members(root, group):
+    with open(os.path.join(root, "etc", "gshadow")) as f:
+        for line in f:
+            fields = line.rstrip("\n").split(":")
+            if fields[0] == group:
+                return [m for m in fields[3].split(",") if m]
+    return None
+
+
+def test_group_members_reads_the_group_file(tmp_path):
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "group").write_text("staff:x:50:\nstudent:x:1001:ann,bob\n")
+    assert shadow_tools.group_members("student", str(tmp_path)) == ["ann", "bob"]
+    assert shadow_tools.group_members("staff", str(tmp_path)) == []
+    with pytest.raises(ToolError, match="does not exist"):
+        shadow_tools.group_members("guest", str(tmp_path))
+
+
+@needs_tools
+@pytest.mark.parametrize("max_arg", [shadow_tools.MAX_MEMBER_ARG, 1])
+def test_update_group_members(root, monkeypatch, max_arg):
+    # With max_arg 1 every change goes member by member (gpasswd -a/-d)
+    monkeypatch.setattr(shadow_tools, "MAX_MEMBER_ARG", max_arg)
+    for name in ("ann", "bob", "cid"):
+        add_account(root, name)
+    shadow_tools.add_groups(["student"], root=root)
+
+    shadow_tools.update_group_members({"student": (["ann", "bob", "ann"], [])}, root=root)
+    assert shadow_tools.group_members("student", root) == ["ann", "bob"]
+    shadow_tools.update_group_members({"student": (["cid", "bob"], ["ann", "dan"])}, root=root)
+    assert shadow_tools.group_members("student", root) == ["bob", "cid"]
+    assert gshadow_members(root, "student") == ["bob", "cid"]
+
+
+@needs_tools
+def test_update_group_members_errors(root, monkeypatch):
+    with pytest.raises(ToolError, match="does not exist"):
+        shadow_tools.update_group_members({"nosuch": (["root"], [])}, root=root)
+    shadow_tools.add_groups(["student"], root=root)
+    with pytest.raises(ToolError):
+        shadow_tools.update_group_members({"student": (["nobody-here"], [])}, root=root)
+
+    # Nothing to change: no tool runs at all
+    monkeypatch.setattr(shadow_tools, "run_tool", None)
+    shadow_tools.update_group_members({"student": ([], ["ann"])}, root=root)
@@ -0,0 +1,76 @@
+import os
+import random
+import string
+
+import pytest
+
+from account_index import Account
+from account_watch import diff_users
+from user_list import UserSearchIndex
+
+needs_display = pytest.mark.skipif(not os.environ.get("DISPLAY"), reason="needs a display for Tk")
+
+
+def random_names(rng, count):
+    return sorted({"".join(rng.choice(string.ascii_lowercase[:6]) for _ in range(rng.randint(1, 6)))
+                   for _ in range(count)})
+
+
+def test_insert_and_remove_match_a_fresh_index():
+    rng = random.Random(3)
+    names = random_names(rng, 300)
+    index = UserSearchIndex(list(names))
+    index.search("ab", contains=True)
+    for _ in range(200):
+        name = rng.choice(names)
+        if rng.random() < 0.5:
+            index.remove(name)
+        elif name not in index.names:
+            index.insert(name)
+    rebuilt = UserSearchIndex(list(index.names))
+    for query in ("a", "b", "ab", "fa", "abc", "cdef", "fff", "zz"):
+        assert index.search(query, contains=True) == rebuilt.search(query, contains=True)
+        assert index.search(query) == rebuilt.search(query)
+
+
+def test_removing_an_unknown_name_changes_nothing():
+    index = UserSearchIndex(["ann", "bob"])
+    index.remove("cid")
+    assert index.search("b", contains=True) == ["bob"]
+    index.remove("bob")
+    assert index.names == ["ann"] and "b" not in index.postings
+
+
+def account(name, uid, shell="/bin/bash", groups=("users",)):
+    return Account(name, uid, uid, "", f"/home/{name}", shell, groups)
+
+
+def test_diff_users_reports_changed_accounts():
+    old = [account("ann", 1000), account("bob", 1001), account("cid", 1002)]
+    new = [account("ann", 1000, shell="/bin/zsh"), account("robert", 1001), account("cid", 1002),
+           account("dan", 1003)]
+    assert diff_users(old, new) == (["dan"], [], [("bob", "robert")], ["ann"])
+
+
+@needs_display
+def test_apply_diff_updates_the_filters_in_place():
+    import tkinter as tk
+    from user_list import ALL, UserBrowser
+
+    accounts = {a.name: a for a in (account("ann", 1000), account("bob", 1001), account("cid", 1002))}
+    root = tk.Tk()
+    try:
+        browser = UserBrowser(root, accounts.get)
+        browser.set_users(sorted(accounts))
+        browser.shell_var.set("/bin/bash")
+        index = browser.search_index
+
+        accounts["ann"] = account("ann", 1000, shell="/bin/zsh")
+        accounts["dan"] = accounts.pop("cid")._replace(name="dan")
+        browser.apply_diff([], [], [("cid", "dan")], ["ann"])
+        assert browser.search_index is index
+        assert browser.filtered == ["bob", "dan"]
+        assert browser.names == ["ann", "bob", "dan"]
+        assert list(browser.shell_box.cget("values")) == [ALL, "/bin/bash", "/bin/zsh"]
+    finally:
+        root.destroy()